@@ -7,7 +7,7 @@ import logging
 from flask import Flask, jsonify
 from flask_cors import CORS
 from .config import CORS_ORIGINS
-from .database import Base, engine
+from .utils.write_queue import WriteBusyError
 from .routes.requests import bp as requests_bp
 from .routes.admin import bp as admin_bp
 from .routes.auth import bp as auth_bp
@@ -15,6 +15,7 @@ from .routes.workflow import bp as workflow_bp
 from .routes.upload import bp as upload_bp
 from .routes.procurement import bp as procurement_bp
 from .routes.notifications import bp as notifications_bp
+from .routes.signatures import bp as signatures_bp
 
 logger = logging.getLogger(__name__)
 
@@ -33,47 +34,33 @@ def create_app():
     # ضمان وجود مجلد قاعدة البيانات
     os.makedirs(os.path.join(BASE_DIR, "database"), exist_ok=True)
 
-    # ─── نسخ احتياطي تلقائي قبل أي تغيير هيكلي ───
+    # ─── ترحيل المخطط: لا شيء إن كان حديثاً (schema_version) ───
+    # النسخ الاحتياطي وحماية الحالات وفحص السلامة تعمل فقط عند تطبيق ترحيل
     try:
-        from .utils.backup import backup_database
-        backup_database("startup")
-    except Exception as e:
-        logger.warning(f"فشل النسخ الاحتياطي: {e}")
-
-    # ─── حفظ snapshot للحالات قبل التعديل ───
-    status_snapshot = {}
-    try:
-        from .utils.integrity import protect_approved_requests
-        status_snapshot = protect_approved_requests()
-    except Exception as e:
-        logger.warning(f"فشل حفظ snapshot الحالات: {e}")
-
-    # إنشاء/تحديث جداول قاعدة البيانات
-    Base.metadata.create_all(bind=engine)
-
-    # تحديث قاعدة البيانات لإضافة الأعمدة المفقودة
-    try:
-        from .migrate_db import migrate_database
-        migrate_database()
+        from .migrate_db import run_migrations
+        result = run_migrations()
+        if result["applied"]:
+            logger.info(f"تم تحديث المخطط إلى {result['to']} في {result['seconds']} ث")
     except Exception as e:
         logger.warning(f"فشل تحديث قاعدة البيانات: {e}")
 
-    # ─── فحص سلامة البيانات بعد التحديث ───
+    # النسخ الاحتياطي المجدول (worker واحد فقط يشغّله)
     try:
-        from .utils.integrity import verify_data_integrity, check_status_regression
-        # التحقق من عدم تراجع الحالات
-        if status_snapshot:
-            check_status_regression(status_snapshot)
-        # فحص شامل للتناسق
-        verify_data_integrity()
+        from .utils.backup_schedule import start_backup_scheduler
+        start_backup_scheduler()
     except Exception as e:
-        logger.warning(f"فشل فحص السلامة: {e}")
+        logger.warning(f"فشل تشغيل مجدول النسخ الاحتياطي: {e}")
 
     # الصفحة الرئيسية → login.html
     @app.get("/")
     def index():
         return app.send_static_file("login.html")
 
+    # قفل الكتابة مشغول بعد كل المحاولات (utils/write_queue.py)
+    @app.errorhandler(WriteBusyError)
+    def write_busy(e):
+        return jsonify({"error": "النظام مشغول بعمليات أخرى، أعد المحاولة بعد لحظات"}), 503, {"Retry-After": "1"}
+
     # Health check
     @app.get("/api/health")
     def health():
@@ -81,7 +68,7 @@ def create_app():
 
     # تسجيل الـ blueprints
     for bp in (requests_bp, admin_bp, auth_bp, workflow_bp,
-               upload_bp, procurement_bp, notifications_bp):
+               upload_bp, procurement_bp, notifications_bp, signatures_bp):
         app.register_blueprint(bp)
 
     logger.info("تم تشغيل التطبيق بنجاح")
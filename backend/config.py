@@ -3,6 +3,7 @@
 """
 
 import os
+import tempfile
 
 # تحميل .env إذا كان موجوداً (بدون اعتماد على python-dotenv)
 _env_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
@@ -33,6 +34,34 @@ DATABASE_URL = os.environ.get(
     "DATABASE_URL",
     f"sqlite:///{os.path.join(BASE_DIR, 'database', 'purchase_requests.db')}"
 )
+# ملف القاعدة الفعلي (None لغير SQLite أو لقاعدة في الذاكرة)
+_db_path = DATABASE_URL[len("sqlite:///"):] if DATABASE_URL.startswith("sqlite:///") else ""
+DATABASE_FILE = os.path.abspath(_db_path) if _db_path and _db_path != ":memory:" else None
+
+# ملف تعريف SQLite — يُطبَّق على كل اتصال (utils/engine_profile.py)
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")       # القرّاء لا ينتظرون الكاتب
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")      # آمن مع WAL
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))   # سالب = KiB (64 MB)
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_FOREIGN_KEYS = os.environ.get("SQLITE_FOREIGN_KEYS", "ON")        # يفعّل ondelete="CASCADE"
+
+# تنسيق الكتابة (utils/write_queue.py): BEGIN IMMEDIATE + إعادة محاولة + commit جماعي
+WRITE_RETRY_ATTEMPTS = int(os.environ.get("WRITE_RETRY_ATTEMPTS", "3"))      # كل محاولة تنتظر busy_timeout
+WRITE_RETRY_BACKOFF_MS = float(os.environ.get("WRITE_RETRY_BACKOFF_MS", "50"))  # يتضاعف مع كل محاولة
+WRITE_GROUP_COMMIT_MS = float(os.environ.get("WRITE_GROUP_COMMIT_MS", "0"))    # 0 = معطّل
+WRITE_GROUP_MAX_OPS = int(os.environ.get("WRITE_GROUP_MAX_OPS", "200"))
+WRITE_GROUP_TIMEOUT_SECONDS = float(os.environ.get("WRITE_GROUP_TIMEOUT_SECONDS", "30"))
+
+# الإقلاع السريع: النسخ الاحتياطي وفحص المخطط والسلامة فقط عند تطبيق ترحيل (migrate_db.py)
+# FAST_START=0 يعيد السلوك القديم: كل ذلك عند كل إقلاع
+FAST_START = os.environ.get("FAST_START", "1").strip().lower() not in ("0", "false", "no")
+
+# فحص السلامة تزايدي (الطلبات المعدّلة منذ آخر تشغيل) مع فحص كامل كل INTEGRITY_FULL_SWEEP_DAYS يوم
+# (0 = فحص كامل في كل تشغيل)، والاحتفاظ بآخر INTEGRITY_RUNS_KEEP تشغيل في integrity_runs
+INTEGRITY_FULL_SWEEP_DAYS = float(os.environ.get("INTEGRITY_FULL_SWEEP_DAYS", "7"))
+INTEGRITY_RUNS_KEEP = int(os.environ.get("INTEGRITY_RUNS_KEEP", "100"))
 
 # ────────────────────────────────────────────
 # الأمان — JWT
@@ -55,6 +84,60 @@ DEBUG = os.environ.get("FLASK_DEBUG", "false").lower() in ("true", "1", "yes")
 
 CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "*")
 
+# ────────────────────────────────────────────
+# الإشعارات
+# ────────────────────────────────────────────
+
+# rows:   صف لكل مستلم في notifications (الافتراضي)
+# events: حدث واحد لكل تغيير + جمهور (مستخدمون/أدوار) يُحل عند القراءة
+#         التحويل من rows: python -m backend.services.notification_events migrate
+NOTIFICATIONS_MODE = os.environ.get("NOTIFICATIONS_MODE", "rows").strip().lower()
+
+# البث الحي /api/notifications/stream (SSE)
+# الإشارة بين العمليات عبر ملفات صغيرة في LIVE_SIGNAL_DIR (بجوار القاعدة افتراضياً)
+# ⚠️ كل اتصال يشغل thread طوال مدته: gunicorn --worker-class gthread --threads N
+_db_dir = os.path.dirname(DATABASE_FILE) if DATABASE_FILE else ""
+LIVE_SIGNAL_DIR = os.environ.get(
+    "LIVE_SIGNAL_DIR", _db_dir or os.path.join(tempfile.gettempdir(), "purchase_app_live")
+)
+LIVE_POLL_SECONDS = float(os.environ.get("LIVE_POLL_SECONDS", "0.5"))        # فحص ملفات الإشارة
+LIVE_HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_STREAM_SECONDS = float(os.environ.get("LIVE_STREAM_SECONDS", "300"))    # ثم يعيد المتصفح الاتصال
+# ?token= يقبل فقط توكن بث قصير العمر (POST /api/notifications/stream-token) — لا توكن الجلسة في الروابط والسجلات
+LIVE_STREAM_TOKEN_SECONDS = int(os.environ.get("LIVE_STREAM_TOKEN_SECONDS", "60"))
+# حد الاتصالات المتزامنة لكل عملية — الزائد يُرد بـ 503 فيعود المتصفح للاستطلاع الدوري.
+# أبقه أقل من --threads حتى تبقى threads لبقية الطلبات
+LIVE_MAX_STREAMS = int(os.environ.get("LIVE_MAX_STREAMS", "16"))
+
+# أرشفة الإشعارات المقروءة الأقدم من N يوم إلى notifications_archive
+#   python -m backend.services.notification_retention   (أو POST /api/admin/notifications/archive)
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "90"))
+NOTIFICATION_ARCHIVE_BATCH = int(os.environ.get("NOTIFICATION_ARCHIVE_BATCH", "500"))
+NOTIFICATION_ARCHIVE_PAUSE = float(os.environ.get("NOTIFICATION_ARCHIVE_PAUSE", "0.05"))  # ثوانٍ بين الدفعات
+
+# ────────────────────────────────────────────
+# النسخ الاحتياطي (utils/backup.py)
+# ────────────────────────────────────────────
+
+BACKUP_DIR = os.environ.get("BACKUP_DIR", os.path.join(_db_dir or os.path.join(BASE_DIR, "database"), "backups"))
+BACKUP_MAX = int(os.environ.get("BACKUP_MAX", "20"))                      # النسخ غير المجدولة (إقلاع، ترحيل...)
+BACKUP_COMPRESSION = os.environ.get("BACKUP_COMPRESSION", "gzip").strip().lower()  # none | gzip | lzma
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "1024"))  # صفحات لكل خطوة نسخ
+BACKUP_STEP_SLEEP = float(os.environ.get("BACKUP_STEP_SLEEP", "0.005"))      # ثوانٍ بين الخطوات
+BACKUP_MAX_RESTARTS = int(os.environ.get("BACKUP_MAX_RESTARTS", "3"))        # ثم لقطة بخطوة واحدة
+
+# النسخ المجدول (utils/backup_schedule.py) — 0 = معطّل (أو cron: python run.py backup)
+BACKUP_SCHEDULE_MINUTES = float(os.environ.get("BACKUP_SCHEDULE_MINUTES", "60"))
+BACKUP_KEEP_HOURLY = int(os.environ.get("BACKUP_KEEP_HOURLY", "24"))
+BACKUP_KEEP_DAILY = int(os.environ.get("BACKUP_KEEP_DAILY", "7"))
+BACKUP_KEEP_WEEKLY = int(os.environ.get("BACKUP_KEEP_WEEKLY", "4"))
+BACKUP_KEEP_MONTHLY = int(os.environ.get("BACKUP_KEEP_MONTHLY", "6"))
+# النسخ المجدولة تزايدية: الصفحات المتغيرة فقط، ولقطة كاملة جديدة كل BACKUP_DELTA_CHAIN حلقة
+BACKUP_INCREMENTAL = os.environ.get("BACKUP_INCREMENTAL", "1").strip().lower() not in ("0", "false", "no")
+BACKUP_DELTA_CHAIN = int(os.environ.get("BACKUP_DELTA_CHAIN", "24"))
+# نسخ مفتوحة للتدقيق دون استعادة (services/backup_audit.py) — LRU لكل worker
+BACKUP_AUDIT_CACHE = int(os.environ.get("BACKUP_AUDIT_CACHE", "4"))
+
 # ────────────────────────────────────────────
 # رفع الملفات
 # ────────────────────────────────────────────
@@ -5,10 +5,14 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import DATABASE_URL
+from .utils.engine_profile import apply_engine_profile
+from .utils.write_queue import install_write_coordination
 
 # لـ SQLite فقط: السماح بالاستخدام من threads مختلفة
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
 engine = create_engine(DATABASE_URL, connect_args=connect_args)
+apply_engine_profile(engine)  # WAL، busy_timeout، foreign_keys... على كل اتصال
+install_write_coordination(engine)  # BEGIN صريح، و IMMEDIATE لجلسات write_session()
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
@@ -1,6 +1,14 @@
 """
 سكربت لتحديث قاعدة البيانات وإضافة الأعمدة المفقودة
-يُستدعى تلقائياً عند بدء التطبيق عبر app.py
+يُستدعى تلقائياً عند بدء التطبيق عبر app.py → run_migrations()
+
+سجل الترحيلات (schema_version): كل خطوة في MIGRATIONS تُطبَّق مرة واحدة وتُسجَّل.
+إذا كان المخطط حديثاً فالإقلاع = استعلام واحد MAX(version) — بلا نسخ احتياطي
+ولا inspect() ولا فحص سلامة كامل؛ هذه كلها تعمل فقط عند تطبيق ترحيل فعلاً.
+تغيير هيكلي جديد = دالة جديدة في آخر MIGRATIONS برقم أكبر.
+
+    python -m backend.migrate_db            # الخطوات المعلّقة فقط
+    python -m backend.migrate_db --force    # + الفحص الكامل والنسخ الاحتياطي (كالسابق)
 
 ⚠️ قواعد أمان:
 - لا يُعدّل أي حقل status أو current_stage أو next_role
@@ -9,13 +17,46 @@
 """
 
 import logging
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl  # قفل بين العمليات (gunicorn workers) — غير متوفر على Windows
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 from sqlalchemy import text, inspect
+from sqlalchemy.exc import DBAPIError
+from . import config
 from .database import engine, SessionLocal
 
 logger = logging.getLogger(__name__)
 
 
+# الأعمدة المطلوبة في purchase_requests (فقط إضافة — لا حذف ولا تعديل)
+REQUIRED_COLUMNS = {
+    "procurement_status": "VARCHAR(50)",
+    "procurement_note": "TEXT",
+    "procurement_assigned_to": "VARCHAR(120)",
+    "procurement_completed_at": "DATETIME",
+    "procurement_updated_at": "DATETIME",
+    "rejection_note": "TEXT",
+    "version": "INTEGER NOT NULL DEFAULT 1",
+}
+
+# (جدول، اسم الفهرس، الأعمدة) — الفهارس المركبة التي ينشئها _ensure_indexes
+INDEX_DEFINITIONS = [
+    ("purchase_requests", "ix_pr_status_department", ["status", "department"]),
+    ("purchase_requests", "ix_pr_created_by", ["created_by"]),
+    ("purchase_requests", "ix_pr_status_department_updated", ["status", "department", "updated_at"]),
+    ("approval_history",  "ix_ah_actor_action", ["actor_user", "action"]),
+    ("notifications",     "ix_notif_recipient_read", ["recipient_username", "is_read"]),
+    ("work_queue",        "ix_wq_stage_department", ["stage", "department", "request_id"]),
+    ("purchase_items",    "ix_items_request_status", ["request_id", "status", "total"]),
+]
+
+
 def migrate_database():
     """إضافة الأعمدة المفقودة إلى قاعدة البيانات"""
     logger.info("بدء تحديث قاعدة البيانات...")
@@ -31,18 +72,8 @@ def migrate_database():
         existing_columns = [col["name"] for col in inspector.get_columns("purchase_requests")]
         logger.info(f"الأعمدة الموجودة: {len(existing_columns)}")
 
-        # الأعمدة المطلوبة (فقط إضافة — لا حذف ولا تعديل)
-        required_columns = {
-            "procurement_status": "VARCHAR(50)",
-            "procurement_note": "TEXT",
-            "procurement_assigned_to": "VARCHAR(120)",
-            "procurement_completed_at": "DATETIME",
-            "procurement_updated_at": "DATETIME",
-            "rejection_note": "TEXT",
-        }
-
         added_count = 0
-        for col_name, col_type in required_columns.items():
+        for col_name, col_type in REQUIRED_COLUMNS.items():
             if col_name not in existing_columns:
                 try:
                     db.execute(text(f"ALTER TABLE purchase_requests ADD COLUMN {col_name} {col_type}"))
@@ -94,6 +125,15 @@ def migrate_database():
         # ==================== إنشاء الفهارس المركبة ====================
         _ensure_indexes(db, inspector)
 
+        # ==================== تعبئة صندوق العمل (قواعد قديمة) ====================
+        _ensure_work_queue(db)
+
+        # ==================== وضع الإشعارات ====================
+        _check_notifications_mode(db)
+
+        # ==================== المفاتيح الأجنبية ====================
+        _check_foreign_keys(db)
+
         # ==================== فحص سلامة الحالات ====================
         _verify_status_consistency(db)
 
@@ -110,14 +150,7 @@ def migrate_database():
 
 def _ensure_indexes(db, inspector):
     """إنشاء الفهارس المركبة إذا لم تكن موجودة"""
-    index_definitions = [
-        ("purchase_requests", "ix_pr_status_department", ["status", "department"]),
-        ("purchase_requests", "ix_pr_created_by", ["created_by"]),
-        ("approval_history",  "ix_ah_actor_action", ["actor_user", "action"]),
-        ("notifications",     "ix_notif_recipient_read", ["recipient_username", "is_read"]),
-    ]
-
-    for table, idx_name, columns in index_definitions:
+    for table, idx_name, columns in INDEX_DEFINITIONS:
         if not inspector.has_table(table):
             continue
         existing = {idx["name"] for idx in inspector.get_indexes(table)}
@@ -133,6 +166,58 @@ def _ensure_indexes(db, inspector):
             db.rollback()
 
 
+def _ensure_work_queue(db):
+    """تعبئة work_queue و workflow_counters إذا كانا فارغين (أول تشغيل بعد إضافتهما)"""
+    try:
+        from .services.work_queue import ensure_work_queue
+        from .services.counters import ensure_counters, ensure_unread_counters
+        if ensure_work_queue(db):
+            db.commit()
+            logger.info("تم تعبئة صندوق العمل من الطلبات الحالية")
+        if ensure_counters(db):
+            db.commit()
+            logger.info("تم حساب عدّادات سير العمل من البيانات الحالية")
+        if ensure_unread_counters(db):
+            db.commit()
+    except Exception as e:
+        logger.warning(f"خطأ في تعبئة صندوق العمل: {e}")
+        db.rollback()
+
+
+def _check_foreign_keys(db):
+    """
+    foreign_keys=ON (utils/engine_profile.py) لا يتحقق من الصفوف القديمة —
+    نسجّل الصفوف اليتيمة فقط دون حذفها
+    """
+    try:
+        violations = db.execute(text("PRAGMA foreign_key_check")).fetchall()
+        if violations:
+            tables = {}
+            for row in violations:
+                tables[row[0]] = tables.get(row[0], 0) + 1
+            logger.warning(f"⚠️ صفوف تشير إلى سجلات غير موجودة: {tables}")
+    except Exception as e:
+        logger.warning(f"خطأ في فحص المفاتيح الأجنبية: {e}")
+        db.rollback()
+
+
+def _check_notifications_mode(db):
+    """تنبيه عند NOTIFICATIONS_MODE=events مع بقاء صفوف قديمة — التحويل يدوي لأنه يحذف الصفوف"""
+    from . import config
+    if config.NOTIFICATIONS_MODE != "events":
+        return
+    try:
+        legacy = db.execute(text("SELECT COUNT(*) FROM notifications")).scalar() or 0
+        if legacy:
+            logger.warning(
+                f"⚠️ يوجد {legacy} إشعار بالوضع rows لن تظهر في الوضع events — "
+                "شغّل: python -m backend.services.notification_events migrate"
+            )
+    except Exception as e:
+        logger.warning(f"خطأ في فحص جدول الإشعارات: {e}")
+        db.rollback()
+
+
 def _verify_status_consistency(db):
     """
     ⚠️ فحص أمان: التأكد من أن migration لم يغير أي حالة طلب.
@@ -188,10 +273,207 @@ def _verify_status_consistency(db):
         db.rollback()
 
 
+# ==================== سجل الترحيلات ====================
+
+def _migration_baseline():
+    """المخطط الكامل + الأعمدة والفهارس المفقودة في القواعد القديمة (فحص بـ inspect)"""
+    from .database import Base
+    from . import models  # noqa: F401 — تسجيل كل الجداول في Base.metadata
+    Base.metadata.create_all(bind=engine)
+    if not migrate_database():
+        raise RuntimeError("فشل تحديث قاعدة البيانات")
+    # migrate_database يسجّل أخطاء كل عمود/فهرس ويكمل — لا تُسجَّل النسخة والمخطط ناقص
+    missing = _missing_baseline_schema(Base.metadata)
+    if missing:
+        raise RuntimeError(f"المخطط ناقص بعد baseline: {', '.join(missing)}")
+
+
+def _missing_baseline_schema(metadata):
+    """ما يضمنه baseline ولم يوجد: الجداول، أعمدة REQUIRED_COLUMNS والتواقيع، وفهارس INDEX_DEFINITIONS"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = [table for table in metadata.tables if table not in tables]
+    required = {
+        "purchase_requests": list(REQUIRED_COLUMNS),
+        "users": ["signature"],
+        "approval_history": ["signature"],
+    }
+    for table, columns in required.items():
+        if table in tables:
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            missing += [f"{table}.{col}" for col in columns if col not in existing]
+    for table, idx_name, _ in INDEX_DEFINITIONS:
+        if table in tables and idx_name not in {idx["name"] for idx in inspector.get_indexes(table)}:
+            missing.append(idx_name)
+    return missing
+
+
+def _migration_integrity_watermark():
+    """سجل integrity_runs + فهرس updated_at لفحص السلامة التزايدي"""
+    from .models import IntegrityRun
+    IntegrityRun.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pr_updated_at ON purchase_requests (updated_at)"))
+
+
+def _migration_freeze_terminal():
+    """نسخ مجمّدة للطلبات المنتهية التي أُنهيت قبل وجود النسخ (القراءة لا تكتب)"""
+    from .services.request_details import freeze_terminal_requests
+    db = SessionLocal()
+    try:
+        frozen = freeze_terminal_requests(db)
+        db.commit()
+        if frozen:
+            logger.info(f"🧊 تجميد {frozen} طلب منتهٍ")
+    finally:
+        db.close()
+
+
+def _migration_signature_refs():
+    """
+    التواقيع المضمّنة (base64) → مراجع signature_blobs، ثم إعادة تجميد النسخ:
+    التفاصيل تحمل signature_refs فقط، والنسخ القديمة فيها صور التواقيع كاملة
+    """
+    from .services.request_details import drop_snapshots
+    from .services.signatures import migrate_signatures
+    db = SessionLocal()
+    try:
+        migrate_signatures(db)
+        drop_snapshots(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _migration_event_archive():
+    """أرشيف أحداث الإشعارات (NOTIFICATIONS_MODE=events) لأرشفة المقروء القديم"""
+    from .models import NotificationEventArchive
+    NotificationEventArchive.__table__.create(bind=engine, checkfirst=True)
+
+
+# (رقم، وصف، دالة) بترتيب تصاعدي — لا تُعدَّل خطوة طُبِّقت، بل تُضاف خطوة جديدة
+MIGRATIONS = (
+    (1, "baseline: create_all + الأعمدة والفهارس المفقودة", _migration_baseline),
+    (2, "integrity_runs + ix_pr_updated_at", _migration_integrity_watermark),
+    (3, "تجميد الطلبات المنتهية بلا نسخة", _migration_freeze_terminal),
+    (4, "مراجع التواقيع في الأعمدة والنسخ المجمّدة", _migration_signature_refs),
+    (5, "notification_events_archive", _migration_event_archive),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_schema_version():
+    """أعلى خطوة مسجّلة في schema_version (0 إن لم يوجد الجدول)"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+@contextmanager
+def _migration_lock():
+    """
+    قفل ملف بجوار القاعدة: عدة workers تقلع معاً فيطبّق واحد فقط الترحيلات
+    والبقية تنتظر ثم تجد المخطط حديثاً
+    """
+    database = engine.url.database
+    if fcntl is None or engine.dialect.name != "sqlite" or database in (None, "", ":memory:"):
+        yield
+        return
+    with open(f"{database}.migrate.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _record_migration(version, name, seconds):
+    from .models import SchemaVersion
+    db = SessionLocal()
+    try:
+        db.merge(SchemaVersion(version=version, name=name, seconds=round(seconds, 3)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_migrations(force=None):
+    """
+    تطبيق خطوات MIGRATIONS المعلّقة.
+    force (الافتراضي: FAST_START=0): نسخ احتياطي + inspect + فحص السلامة حتى لو كان المخطط حديثاً.
+    Returns:
+        {"from", "to", "applied": [...], "seconds"}
+    """
+    if force is None:
+        force = not config.FAST_START
+    start = time.perf_counter()
+
+    def _result(before, after, applied):
+        return {"from": before, "to": after, "applied": applied, "seconds": round(time.perf_counter() - start, 3)}
+
+    before = current_schema_version()
+    if before >= SCHEMA_VERSION and not force:
+        _check_notifications_mode_on_boot()
+        return _result(before, before, [])
+
+    with _migration_lock():
+        before = current_schema_version()  # ربما سبقنا worker آخر
+        pending = [m for m in MIGRATIONS if m[0] > before]
+        if not pending and not force:
+            return _result(before, before, [])
+
+        from .models import SchemaVersion
+        from .utils.backup import backup_database
+        from .utils.integrity import protect_approved_requests, check_status_regression, verify_data_integrity
+
+        logger.info(f"ترحيل المخطط: {before} → {SCHEMA_VERSION} ({len(pending)} خطوة)")
+        backup_database("migration")
+        with engine.connect() as conn:
+            has_requests = engine.dialect.has_table(conn, "purchase_requests")
+        status_snapshot = protect_approved_requests() if has_requests else {}
+        SchemaVersion.__table__.create(bind=engine, checkfirst=True)
+
+        applied = []
+        for version, name, step in pending:
+            step_start = time.perf_counter()
+            step()
+            _record_migration(version, name, time.perf_counter() - step_start)
+            applied.append(name)
+            logger.info(f"✅ ترحيل {version}: {name}")
+        if force and not pending:
+            migrate_database()  # الفحص الكامل بـ inspect كما في الإقلاع القديم
+
+        # ─── فحص سلامة البيانات بعد الترحيل ───
+        try:
+            if status_snapshot:
+                check_status_regression(status_snapshot)
+            verify_data_integrity()
+        except Exception as e:
+            logger.warning(f"فشل فحص السلامة: {e}")
+
+        return _result(before, current_schema_version(), applied)
+
+
+def _check_notifications_mode_on_boot():
+    """تحذير تغيير NOTIFICATIONS_MODE يبقى عند كل إقلاع (لا شيء في الوضع rows)"""
+    if config.NOTIFICATIONS_MODE != "events":
+        return
+    db = SessionLocal()
+    try:
+        _check_notifications_mode(db)
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
-    import sys, os
+    import sys
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
-    success = migrate_database()
-    if not success:
+    try:
+        result = run_migrations(force="--force" in sys.argv)
+    except Exception as e:
+        logger.error(f"فشل الترحيل: {e}")
         sys.exit(1)
+    print(f"المخطط: {result['from']} → {result['to']} — {len(result['applied'])} خطوة في {result['seconds']} ث")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Index, Integer, String, Float, Date, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Index, Integer, String, Float, Date, ForeignKey, DateTime, Boolean, Text, LargeBinary
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Optional
 from datetime import datetime, timezone
@@ -52,6 +52,8 @@ class PurchaseRequest(Base):
     created_by: Mapped[str] = mapped_column(String(120), nullable=True)  # اربطه بمستخدم المنشئ
     created_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # رقم النسخة: كل UPDATE عبر ORM يصبح "... WHERE id = ? AND version = ?" ويزيده 1
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
     
     # بيانات جدول الموافقات
     requester_name: Mapped[str] = mapped_column(String(255), nullable=True)
@@ -77,7 +79,12 @@ class PurchaseRequest(Base):
     __table_args__ = (
         Index("ix_pr_status_department", "status", "department"),
         Index("ix_pr_created_by", "created_by"),
+        # فهرس تغطية لمُتحقِّقات ETag: COUNT/MAX(updated_at) بلا قراءة الجدول
+        Index("ix_pr_status_department_updated", "status", "department", "updated_at"),
+        # فحص السلامة التزايدي: الطلبات المعدّلة منذ آخر تشغيل (utils/integrity.py)
+        Index("ix_pr_updated_at", "updated_at"),
     )
+    __mapper_args__ = {"version_id_col": version}
 
 class PurchaseItem(Base):
     __tablename__ = "purchase_items"
@@ -99,6 +106,11 @@ class PurchaseItem(Base):
 
     request: Mapped["PurchaseRequest"] = relationship(back_populates="items")
 
+    __table_args__ = (
+        # أصناف الطلب + فهرس تغطية لـ SUM(total) حسب الحالة (services/item_review.py)
+        Index("ix_items_request_status", "request_id", "status", "total"),
+    )
+
 class AccountType(Base):
     __tablename__ = "account_types"
     
@@ -152,3 +164,173 @@ class Notification(Base):
     __table_args__ = (
         Index("ix_notif_recipient_read", "recipient_username", "is_read"),
     )
+
+class NotificationArchive(Base):
+    """
+    إشعارات مقروءة قديمة نُقلت من notifications (services/notification_retention.py)
+    حتى يبقى جدول الإشعارات وفهرسه بحجم النافذة الحديثة. id هو رقم الإشعار الأصلي.
+    """
+    __tablename__ = "notifications_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    request_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    recipient_username: Mapped[str] = mapped_column(String(120), index=True)
+    title: Mapped[str] = mapped_column(String(255))
+    message: Mapped[str] = mapped_column(Text)
+    action_type: Mapped[str] = mapped_column(String(50))
+    actor_username: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    actor_role: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    is_read: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime)
+    archived_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class NotificationEvent(Base):
+    """
+    وضع الإشعارات "events" (NOTIFICATIONS_MODE=events): حدث واحد لكل تغيير على الطلب،
+    والمستلمون يُحلّون عند القراءة من notification_audience (مستخدمون أو أدوار)
+    بدلاً من صف لكل مستلم. انظر services/notification_events.py
+    """
+    __tablename__ = "notification_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    request_id: Mapped[Optional[int]] = mapped_column(ForeignKey("purchase_requests.id", ondelete="CASCADE"), nullable=True)
+    title: Mapped[str] = mapped_column(String(255))
+    message: Mapped[str] = mapped_column(Text)
+    action_type: Mapped[str] = mapped_column(String(50))
+    actor_username: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    actor_role: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    audience: Mapped[list["NotificationAudience"]] = relationship(cascade="all, delete-orphan")
+
+class NotificationAudience(Base):
+    """جمهور حدث إشعار: (user, <username>) أو (role, <role>)"""
+    __tablename__ = "notification_audience"
+
+    event_id: Mapped[int] = mapped_column(ForeignKey("notification_events.id", ondelete="CASCADE"), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True)  # user | role
+    value: Mapped[str] = mapped_column(String(120), primary_key=True)
+
+    __table_args__ = (
+        # صندوق المستخدم: أحدث الأحداث لكل (kind, value) من الفهرس مباشرة
+        Index("ix_naud_kind_value_event", "kind", "value", "event_id"),
+    )
+
+class NotificationReadState(Base):
+    """علامة القراءة المدمجة: كل حدث id <= watermark مقروء لهذا المستخدم"""
+    __tablename__ = "notification_read_state"
+
+    username: Mapped[str] = mapped_column(String(120), primary_key=True)
+    watermark: Mapped[int] = mapped_column(Integer, default=0)
+
+class NotificationReadMark(Base):
+    """أحداث مقروءة فردياً فوق العلامة (تُحذف عند تقدّم العلامة)"""
+    __tablename__ = "notification_read_marks"
+
+    username: Mapped[str] = mapped_column(String(120), primary_key=True)
+    event_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+class NotificationEventArchive(Base):
+    """
+    أحداث قديمة قرأها كل جمهورها، نُقلت من notification_events (services/notification_retention.py).
+    id هو رقم الحدث الأصلي، و audience نصاً: "user:<username>,role:<role>".
+    """
+    __tablename__ = "notification_events_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    request_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    title: Mapped[str] = mapped_column(String(255))
+    message: Mapped[str] = mapped_column(Text)
+    action_type: Mapped[str] = mapped_column(String(50))
+    actor_username: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    actor_role: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    audience: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[DateTime] = mapped_column(DateTime)
+    archived_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class WorkQueueEntry(Base):
+    """
+    صندوق العمل (inbox) — صف واحد لكل طلب ينتظر إجراءً.
+    يُحدَّث في نفس معاملة تغيير الحالة (انظر services/work_queue.py)،
+    فيصبح /api/my/queue قراءة مفهرسة بدلاً من مسح purchase_requests.
+    """
+    __tablename__ = "work_queue"
+
+    request_id: Mapped[int] = mapped_column(ForeignKey("purchase_requests.id", ondelete="CASCADE"), primary_key=True)
+    stage: Mapped[str] = mapped_column(String(50))  # manager | finance | disbursement | procurement
+    department: Mapped[str] = mapped_column(String(255))
+
+    __table_args__ = (
+        Index("ix_wq_stage_department", "stage", "department", "request_id"),
+    )
+
+class WorkflowCounter(Base):
+    """
+    عدّادات مُجمّعة تُحدَّث في نفس معاملة كل انتقال (انظر services/counters.py).
+    أمثلة المفاتيح: queue:finance, queue:manager:مالية, approved:<username>
+    """
+    __tablename__ = "workflow_counters"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, default=0)
+
+class RequestSnapshot(Base):
+    """
+    نسخة مجمّدة من تفاصيل طلب منتهٍ (completed / rejected):
+    JSON مضغوط بـ gzip يُكتب مرة عند دخول الحالة النهائية (انظر services/request_details.py)
+    ويُخدَم منه /api/requests/<id> مباشرة.
+    """
+    __tablename__ = "request_snapshots"
+
+    request_id: Mapped[int] = mapped_column(ForeignKey("purchase_requests.id", ondelete="CASCADE"), primary_key=True)
+    status: Mapped[str] = mapped_column(String(50))
+    etag: Mapped[str] = mapped_column(String(40))
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class SignatureBlob(Base):
+    """
+    مخزن التواقيع بعنوان المحتوى (content-addressed): كل صورة توقيع تُخزَّن مرة واحدة
+    بمفتاح sha256، وأعمدة *_signature في الطلبات والسجل تحمل المرجع "sha256:<hex>" فقط.
+    انظر services/signatures.py
+    """
+    __tablename__ = "signature_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[str] = mapped_column(Text)  # القيمة الأصلية كما أرسلها العميل (data URL base64)
+    size: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class SchemaVersion(Base):
+    """
+    سجل ترحيلات المخطط: صف لكل خطوة طُبِّقت (انظر migrate_db.MIGRATIONS).
+    عند الإقلاع يكفي MAX(version) لمعرفة أن المخطط حديث — بلا inspect() ولا فحوص كاملة.
+    """
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(255))
+    applied_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    seconds: Mapped[float] = mapped_column(Float, default=0.0)
+
+class IntegrityRun(Base):
+    """
+    سجل تشغيلات فحص السلامة (انظر utils/integrity.py). آخر تشغيل ناجح يحمل العلامة المائية:
+    أكبر updated_at في الطلبات وأكبر id في approval_history وقت الفحص —
+    التشغيل التزايدي التالي يفحص فقط ما تجاوزها.
+    """
+    __tablename__ = "integrity_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    started_at: Mapped[DateTime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    mode: Mapped[str] = mapped_column(String(20))  # full | incremental
+    seconds: Mapped[float] = mapped_column(Float, default=0.0)
+    scanned: Mapped[int] = mapped_column(Integer, default=0)  # طلبات ضمن نطاق الفحص
+    fixed: Mapped[int] = mapped_column(Integer, default=0)
+    warnings: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    errors: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON — تشغيل فاشل لا يحرّك العلامة
+    watermark_updated_at: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # كما يخزّنها SQLite
+    watermark_history_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
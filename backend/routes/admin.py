@@ -6,11 +6,21 @@ import logging
 from flask import Blueprint, request, jsonify
 from ..database import SessionLocal
 from ..models import PurchaseRequest
+from ..services.backup_audit import BackupNotFound, audit_request
+from ..services.notification_retention import archive_read_notifications
+from ..services.request_projections import ADMIN_COLUMNS, project_requests
 from ..utils.auth import require_auth_and_roles
+from ..utils.backup import BackupError, list_backups
+from ..utils.backup_delta import DeltaFormatError
+from ..utils.integrity import recent_runs, verify_data_integrity
+from ..utils.write_queue import write_metrics, write_session
 
 bp = Blueprint("admin", __name__)
 logger = logging.getLogger(__name__)
 
+# حد العمل لكل استدعاء HTTP (الدفعات × NOTIFICATION_ARCHIVE_BATCH)
+ARCHIVE_MAX_BATCHES = 50
+
 
 @bp.get("/api/admin/requests")
 @require_auth_and_roles("admin")
@@ -20,7 +30,7 @@ def admin_requests():
     db = SessionLocal()
     try:
         requests_list = (
-            db.query(PurchaseRequest)
+            project_requests(db, ADMIN_COLUMNS)
             .order_by(PurchaseRequest.id.desc())
             .limit(limit)
             .all()
@@ -38,3 +48,83 @@ def admin_requests():
         return jsonify(data)
     finally:
         db.close()
+
+
+@bp.post("/api/admin/notifications/archive")
+@require_auth_and_roles("admin")
+def archive_notifications():
+    """
+    أرشفة الإشعارات المقروءة القديمة على دفعات قصيرة.
+    {"days": 90, "max_batches": 50} — done=false يعني بقي عمل لاستدعاء تالٍ
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        days = int(data["days"]) if data.get("days") is not None else None
+        max_batches = int(data.get("max_batches", ARCHIVE_MAX_BATCHES))
+    except (TypeError, ValueError):
+        return jsonify({"error": "days و max_batches يجب أن تكون أرقاماً"}), 400
+    if (days is not None and days < 0) or max_batches < 1:
+        return jsonify({"error": "قيم غير صالحة"}), 400
+
+    db = write_session()
+    try:
+        return jsonify(archive_read_notifications(db, days=days, max_batches=max_batches))
+    except Exception as e:
+        db.rollback()
+        logger.error(f"خطأ في أرشفة الإشعارات: {e}")
+        return jsonify({"error": f"خطأ في أرشفة الإشعارات: {str(e)}"}), 500
+    finally:
+        db.close()
+
+
+@bp.get("/api/admin/write-metrics")
+@require_auth_and_roles("admin")
+def admin_write_metrics():
+    """زمن انتظار قفل الكتابة والمحاولات والدفعات — لهذه العملية (worker) فقط"""
+    return jsonify(write_metrics())
+
+
+@bp.get("/api/admin/backups")
+@require_auth_and_roles("admin")
+def admin_backups():
+    """النسخ الاحتياطية المتوفرة (الأحدث أولاً) — بلا المسارات على الخادم"""
+    return jsonify([{k: v for k, v in b.items() if k != "path"} for b in list_backups()])
+
+
+@bp.get("/api/admin/backups/<name>/requests/<int:req_id>")
+@require_auth_and_roles("admin")
+def admin_backup_request(name, req_id):
+    """تفاصيل طلب كما كان في نسخة احتياطية، مقارنةً بالحالة الحية — بلا استعادة"""
+    try:
+        return jsonify(audit_request(name, req_id))
+    except BackupNotFound:
+        return jsonify({"error": "النسخة الاحتياطية غير موجودة"}), 404
+    except (BackupError, DeltaFormatError) as e:
+        return jsonify({"error": f"تعذر فتح النسخة الاحتياطية: {str(e)}"}), 422
+    except Exception as e:
+        logger.error(f"خطأ في تدقيق النسخة {name}: {e}")
+        return jsonify({"error": f"خطأ في تدقيق النسخة: {str(e)}"}), 500
+
+
+@bp.get("/api/admin/integrity")
+@require_auth_and_roles("admin")
+def admin_integrity_runs():
+    """آخر تشغيلات فحص السلامة: النوع، الزمن، الطلبات المفحوصة، الإصلاحات والتحذيرات"""
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    db = SessionLocal()
+    try:
+        return jsonify(recent_runs(db, limit))
+    finally:
+        db.close()
+
+
+@bp.post("/api/admin/integrity")
+@require_auth_and_roles("admin")
+def admin_run_integrity():
+    """تشغيل فحص السلامة الآن — {"full": true} لفحص كامل بدل التزايدي"""
+    data = request.get_json(silent=True) or {}
+    full = data.get("full")
+    if full is not None and not isinstance(full, bool):
+        return jsonify({"error": "full يجب أن تكون true أو false"}), 400
+    results = verify_data_integrity(full=full)
+    return jsonify(results), 500 if results["errors"] else 200
@@ -8,6 +8,7 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import check_password_hash, generate_password_hash
 from ..utils.auth import create_token, require_auth
 from ..database import SessionLocal
+from ..utils.write_queue import write_session
 from ..models import User
 
 bp = Blueprint("auth", __name__, url_prefix="/api")
@@ -125,7 +126,7 @@ def save_my_signature():
     if not signature:
         return jsonify({"error": "التوقيع مطلوب"}), 400
 
-    db = SessionLocal()
+    db = write_session()
     try:
         user = db.query(User).filter(User.id == request.user["user_id"]).first()
         if not user:
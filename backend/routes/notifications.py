@@ -1,74 +1,253 @@
-from flask import Blueprint, jsonify, request
+import json
+import threading
+import time
+from functools import partial
+from flask import Blueprint, Response, jsonify, request
+from .. import config
 from ..database import SessionLocal
 from ..models import Notification
-from ..utils.auth import require_auth_and_roles
+from ..services.counters import bump, clear_counter, read_counters, unread_counter_key
+from ..services.notification_events import LIST_LIMIT, list_events, mark_event_read, mark_all_events_read
+from ..utils import live_events
+from ..utils.auth import create_stream_token, require_auth_and_roles
+from ..utils.write_queue import run_write, write_session
 
 bp = Blueprint("notifications", __name__, url_prefix="/api/notifications")
 
 
+ALL_ROLES = ("admin", "manager", "finance", "disbursement", "procurement", "requester")
+
+# اتصالات البث المفتوحة في هذه العملية — كل منها يشغل thread حتى LIVE_STREAM_SECONDS
+_active_streams = 0
+_streams_lock = threading.Lock()
+
+
+def _serialize_notification(n):
+    return {
+        "id": n.id,
+        "request_id": n.request_id,
+        "title": n.title,
+        "message": n.message,
+        "action_type": n.action_type,
+        "actor_username": n.actor_username,
+        "actor_role": n.actor_role,
+        "note": n.note,
+        "is_read": n.is_read,
+        "created_at": n.created_at.isoformat() if n.created_at else None,
+    }
+
+
+def _recent_notifications(db, user, since_id=None, limit=None):
+    """
+    أحدث إشعارات المستخدم، أو أقدم limit إشعار بعد since_id (صفحة تصاعدية بلا فجوات).
+    الترتيب في الاستجابة: الأحدث أولاً في الحالتين.
+    """
+    username = user.get("username")
+    limit = limit or LIST_LIMIT
+    if config.NOTIFICATIONS_MODE == "events":
+        return list_events(db, username, user.get("role"), limit=limit, since_id=since_id)
+
+    query = db.query(Notification).filter(Notification.recipient_username == username)
+    if since_id is not None:
+        rows = query.filter(Notification.id > since_id).order_by(Notification.id.asc()).limit(limit).all()
+        rows.reverse()
+    else:
+        rows = query.order_by(Notification.created_at.desc()).limit(limit).all()
+    return [_serialize_notification(n) for n in rows]
+
+
 @bp.get("")
-@require_auth_and_roles("admin", "manager", "finance", "disbursement", "procurement", "requester")
+@require_auth_and_roles(*ALL_ROLES)
 def list_notifications():
+    """
+    أحدث 100 إشعار، أو ?since_id= لجلب ما بعد آخر إشعار لدى العميل فقط
+    (مسح على المفتاح الأساسي بدلاً من ترتيب كل إشعارات المستخدم). إذا جاء 100 فقد بقي غيرها:
+    الصفحة التالية بـ since_id = أكبر id في الصفحة.
+    """
     user = getattr(request, "user", {}) or {}
-    username = user.get("username")
+    since_id = request.args.get("since_id", type=int)
     db = SessionLocal()
     try:
-        notifications = (
-            db.query(Notification)
-            .filter(Notification.recipient_username == username)
-            .order_by(Notification.created_at.desc())
-            .limit(100)
-            .all()
-        )
-        data = [
-            {
-                "id": n.id,
-                "request_id": n.request_id,
-                "title": n.title,
-                "message": n.message,
-                "action_type": n.action_type,
-                "actor_username": n.actor_username,
-                "actor_role": n.actor_role,
-                "note": n.note,
-                "is_read": n.is_read,
-                "created_at": n.created_at.isoformat() if n.created_at else None,
-            }
-            for n in notifications
-        ]
-        return jsonify(data)
+        return jsonify(_recent_notifications(db, user, since_id=since_id))
     finally:
         db.close()
 
 
-@bp.post("/<int:notification_id>/read")
-@require_auth_and_roles("admin", "manager", "finance", "disbursement", "procurement", "requester")
-def mark_notification_read(notification_id):
-    user = getattr(request, "user", {}) or {}
-    username = user.get("username")
+@bp.get("/unread-count")
+@require_auth_and_roles(*ALL_ROLES)
+def unread_count():
+    """عدد غير المقروء للشارة — قراءة مفتاح واحد من workflow_counters"""
+    username = (getattr(request, "user", {}) or {}).get("username")
     db = SessionLocal()
     try:
-        notification = db.get(Notification, notification_id)
-        if not notification or notification.recipient_username != username:
-            return jsonify({"error": "الإشعار غير موجود"}), 404
-        notification.is_read = True
-        db.add(notification)
-        db.commit()
-        return jsonify({"message": "تم تحديث حالة الإشعار"})
+        key = unread_counter_key(username)
+        return jsonify({"unread": max(read_counters(db, [key])[key], 0)})
     finally:
         db.close()
 
 
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def _stream(user, last_id):
+    """
+    ينتظر إشارة بعد commit (أو نبضة كل LIVE_HEARTBEAT_SECONDS) ولا يمسك اتصالاً بالقاعدة أثناء الانتظار.
+    النبضة تقرأ الجديد أيضاً — فلا يضيع إشعار فاتت إشارته.
+    """
+    seen = live_events.versions()
+    yield "retry: 3000\n\n"
+    deadline = time.monotonic() + config.LIVE_STREAM_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        seen, changed = live_events.wait_for_change(seen, min(config.LIVE_HEARTBEAT_SECONDS, remaining))
+        if "queue" in changed:
+            yield _sse("queue", {})
+        if changed and "notifications" not in changed:
+            continue
+
+        sent = False
+        while True:  # صفحات تصاعدية حتى آخر إشعار
+            db = SessionLocal()
+            try:
+                fresh = _recent_notifications(db, user, since_id=last_id)
+            finally:
+                db.close()
+            for n in reversed(fresh):
+                yield _sse("notification", n, n["id"])
+            if not fresh:
+                break
+            sent = True
+            last_id = fresh[0]["id"]
+            if len(fresh) < LIST_LIMIT:
+                break
+        if not sent and not changed:
+            yield ": ping\n\n"
+
+
+def _acquire_stream():
+    global _active_streams
+    with _streams_lock:
+        if _active_streams >= config.LIVE_MAX_STREAMS:
+            return False
+        _active_streams += 1
+        return True
+
+
+def _release_stream():
+    global _active_streams
+    with _streams_lock:
+        _active_streams -= 1
+
+
+@bp.post("/stream-token")
+@require_auth_and_roles(*ALL_ROLES)
+def stream_token():
+    """توكن قصير العمر لـ /stream?token= — توكن الجلسة لا يظهر في الروابط وسجلات الخوادم"""
+    return jsonify({
+        "token": create_stream_token(request.user),
+        "expires_in": config.LIVE_STREAM_TOKEN_SECONDS,
+    })
+
+
+@bp.get("/stream")
+@require_auth_and_roles(*ALL_ROLES, query_token=True)
+def notification_stream():
+    """
+    بث SSE بديل عن الاستطلاع الدوري:
+      event: notification  — إشعار جديد (id = رقم الإشعار)
+      event: queue         — تغيّر صندوق عمل؛ اللوحة تعيد تحميل قائمتها
+    ?token= (توكن بث من /stream-token) بدلاً من header لأن EventSource لا يرسل headers.
+    نقطة البداية: Last-Event-ID (إعادة اتصال) ثم ?last_id= ثم آخر إشعار حالي.
+    أكثر من LIVE_MAX_STREAMS اتصال في العملية → 503 (المتصفح يعود للاستطلاع).
+    """
+    if not _acquire_stream():
+        response = jsonify({"error": "البث الحي ممتلئ حالياً"})
+        response.headers["Retry-After"] = str(int(config.LIVE_STREAM_SECONDS))
+        return response, 503
+    try:
+        response = _open_stream(dict(request.user))
+    except Exception:
+        _release_stream()
+        raise
+    response.call_on_close(_release_stream)
+    return response
+
+
+def _open_stream(user):
+    """استجابة البث من نقطة البداية المناسبة"""
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("last_id", type=int)
+    if last_id is None:
+        db = SessionLocal()
+        try:
+            latest = _recent_notifications(db, user, limit=1)
+        finally:
+            db.close()
+        last_id = latest[0]["id"] if latest else 0
+
+    return Response(_stream(user, last_id), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx: بلا تخزين مؤقت للبث
+    })
+
+
+def _mark_read(db, username, role, notification_id):
+    """تعليم إشعار واحد كمقروء — False إذا لم يوجد"""
+    if config.NOTIFICATIONS_MODE == "events":
+        return mark_event_read(db, username, role, notification_id)
+
+    # UPDATE مشروط: العدّاد ينقص فقط عند انتقال فعلي من غير مقروء إلى مقروء
+    changed = db.query(Notification).filter(
+        Notification.id == notification_id,
+        Notification.recipient_username == username,
+        Notification.is_read.is_(False),
+    ).update({"is_read": True}, synchronize_session=False)
+    if changed:
+        bump(db, unread_counter_key(username), -changed)
+        return True
+    return db.query(Notification.id).filter(
+        Notification.id == notification_id, Notification.recipient_username == username,
+    ).first() is not None
+
+
+@bp.post("/<int:notification_id>/read")
+@require_auth_and_roles(*ALL_ROLES)
+def mark_notification_read(notification_id):
+    user = getattr(request, "user", {}) or {}
+    # كتابة صغيرة ومتكررة: تشارك commit واحداً مع غيرها عند تفعيل WRITE_GROUP_COMMIT_MS
+    found = run_write(
+        partial(_mark_read, username=user.get("username"), role=user.get("role"),
+                notification_id=notification_id),
+        group=True,
+    )
+    if not found:
+        return jsonify({"error": "الإشعار غير موجود"}), 404
+    return jsonify({"message": "تم تحديث حالة الإشعار"})
+
+
 @bp.post("/read-all")
-@require_auth_and_roles("admin", "manager", "finance", "disbursement", "procurement", "requester")
+@require_auth_and_roles(*ALL_ROLES)
 def mark_all_read():
     user = getattr(request, "user", {}) or {}
     username = user.get("username")
-    db = SessionLocal()
+    db = write_session()
     try:
+        if config.NOTIFICATIONS_MODE == "events":
+            mark_all_events_read(db, username)
+            db.commit()
+            return jsonify({"message": "تم تعليم جميع الإشعارات كمقروءة"})
+
         db.query(Notification).filter(
             Notification.recipient_username == username,
             Notification.is_read.is_(False),
         ).update({"is_read": True})
+        clear_counter(db, unread_counter_key(username))
         db.commit()
         return jsonify({"message": "تم تعليم جميع الإشعارات كمقروءة"})
     finally:
@@ -1,12 +1,19 @@
 from datetime import datetime, timezone
 from flask import Blueprint, jsonify, request
-from sqlalchemy.orm import joinedload
-
+from sqlalchemy.orm.exc import StaleDataError
 from ..database import SessionLocal
 from ..models import PurchaseRequest, PurchaseItem, ApprovalHistory, User
+from ..services.work_queue import sync_work_queue
+from ..services.request_details import sync_snapshot
+from ..services.request_projections import (
+    PROCUREMENT_COLUMNS, project_requests, load_items_by_request, list_validator,
+)
 from ..utils.auth import require_auth_and_roles
+from ..utils.http_cache import compute_etag, not_modified, with_etag
 from ..utils.notifications import create_notification
-from ..utils.watchers import get_request_watchers
+from ..utils.watchers import get_request_audience
+from ..utils.versioning import expected_version, is_stale, version_conflict
+from ..utils.write_queue import write_session
 
 bp = Blueprint("procurement", __name__, url_prefix="/api/procurement")
 
@@ -17,14 +24,22 @@ def list_procurement_requests():
     status_filter = request.args.get("status")  # pending, purchased, adjusted, cancelled, completed
     db = SessionLocal()
     try:
-        query = db.query(PurchaseRequest).options(joinedload(PurchaseRequest.items))
-        query = query.filter(PurchaseRequest.status.in_(["pending_procurement", "completed"]))
+        # المُتحقِّق يغطي كامل نطاق المشتريات (مجموعة أعم من الفلتر — آمن)
+        in_scope = PurchaseRequest.status.in_(["pending_procurement", "completed"])
+        etag = compute_etag("procurement", status_filter, *list_validator(db, in_scope))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        query = project_requests(db, PROCUREMENT_COLUMNS)
+        query = query.filter(in_scope)
         if status_filter:
             if status_filter == "completed":
                 query = query.filter(PurchaseRequest.status == "completed")
             else:
                 query = query.filter(PurchaseRequest.procurement_status == status_filter)
         requests = query.order_by(PurchaseRequest.updated_at.desc()).all()
+        items_by_request = load_items_by_request(db, [pr.id for pr in requests])
         data = []
         for pr in requests:
             data.append(
@@ -52,13 +67,14 @@ def list_procurement_requests():
                             "price": item.price,
                             "total": item.total,
                         }
-                        for item in pr.items
+                        for item in items_by_request[pr.id]
                     ],
                     "created_at": pr.created_at.isoformat() if pr.created_at else None,
                     "updated_at": pr.updated_at.isoformat() if pr.updated_at else None,
+                    "version": pr.version,
                 }
             )
-        return jsonify(data)
+        return with_etag(jsonify(data), etag)
     finally:
         db.close()
 
@@ -75,12 +91,16 @@ def update_procurement_request(req_id):
 
     if new_status and new_status not in {"pending", "purchased", "adjusted", "cancelled"}:
         return jsonify({"error": "حالة مشتريات غير صالحة"}), 400
+    try:
+        expected = expected_version(payload)
+    except (TypeError, ValueError):
+        return jsonify({"error": "رقم النسخة غير صالح"}), 400
 
     user = getattr(request, "user", {}) or {}
     actor_username = user.get("username")
     actor_role = user.get("role")
 
-    db = SessionLocal()
+    db = write_session()
     try:
         pr = db.get(PurchaseRequest, req_id)
         if pr:
@@ -88,6 +108,8 @@ def update_procurement_request(req_id):
             _ = pr.items
         if not pr:
             return jsonify({"error": "الطلب غير موجود"}), 404
+        if is_stale(pr, expected):
+            return version_conflict(db, req_id)
         if pr.status not in ("pending_procurement", "completed"):
             return jsonify({"error": "الطلب ليس في مرحلة المشتريات"}), 400
 
@@ -160,12 +182,14 @@ def update_procurement_request(req_id):
             )
         )
 
+        sync_work_queue(db, pr)
+        sync_snapshot(db, pr)  # تجميد عند الإغلاق، حذف النسخة عند إعادة الفتح
         db.add(pr)
         db.commit()
         db.refresh(pr)
 
         # إرسال الإشعارات
-        recipients = get_request_watchers(db, pr)
+        recipients = get_request_audience(db, pr)
         action_type = "procurement"
         status_text = pr.procurement_status
         message = f"تم تحديث طلب الشراء #{pr.order_number} في قسم المشتريات (الحالة: {status_text})."
@@ -191,9 +215,12 @@ def update_procurement_request(req_id):
                 "status": pr.status,
                 "procurement_status": pr.procurement_status,
                 "total_amount": pr.total_amount,
+                "version": pr.version,
                 "changes": changes,
             }
         )
+    except StaleDataError:
+        return version_conflict(db, req_id)
     except Exception as exc:
         db.rollback()
         return jsonify({"error": f"خطأ في تحديث الطلب: {exc}"}), 500
@@ -5,9 +5,11 @@
 
 import logging
 from flask import Blueprint, request, jsonify
-from ..database import SessionLocal
 from ..models import PurchaseRequest, PurchaseItem, ApprovalHistory
+from ..services.work_queue import sync_work_queue
+from ..services.counters import bump, user_counter_key
 from ..utils.auth import require_auth_and_roles
+from ..utils.write_queue import write_session
 
 bp = Blueprint("requests", __name__, url_prefix="/api")
 logger = logging.getLogger(__name__)
@@ -37,7 +39,7 @@ def create_request():
     user_role = user.get("role")
     user_department = user.get("department")
 
-    db = SessionLocal()
+    db = write_session()
     try:
         # تحديد الـ workflow حسب دور المستخدم
         if user_role == "manager" and user_department == "تطوير الأعمال":
@@ -87,6 +89,9 @@ def create_request():
 
         db.add(pr)
         db.flush()  # للحصول على pr.id
+        sync_work_queue(db, pr)
+        if creator:
+            bump(db, user_counter_key("created", creator))
 
         # إضافة الأصناف
         items = payload.get("items") or []
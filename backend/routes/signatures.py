@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify, make_response
+from ..database import SessionLocal
+from ..models import SignatureBlob
+from ..services.signatures import decode_signature
+from ..utils.auth import require_auth
+from ..utils.http_cache import IMMUTABLE, not_modified, with_etag
+
+bp = Blueprint("signatures", __name__, url_prefix="/api/signatures")
+
+
+@bp.get("/<string:digest>")
+@require_auth
+def get_signature(digest):
+    """صورة توقيع بعنوان محتواها (sha256) — لا تتغير، فتُخزَّن مؤقتاً سنة كاملة"""
+    digest = digest.lower()
+    db = SessionLocal()
+    try:
+        # 304 فقط لتوقيع موجود (بحث بالمفتاح الأساسي دون تحميل الصورة) — لا لأي If-None-Match بشكل بصمة أو *
+        if db.query(SignatureBlob.hash).filter(SignatureBlob.hash == digest).scalar() is None:
+            return jsonify({"error": "التوقيع غير موجود"}), 404
+        cached = not_modified(digest, IMMUTABLE)
+        if cached:
+            return cached
+
+        data = db.query(SignatureBlob.data).filter(SignatureBlob.hash == digest).scalar()
+        mimetype, body = decode_signature(data)
+        response = make_response(body)
+        response.mimetype = mimetype
+        return with_etag(response, digest, IMMUTABLE)
+    finally:
+        db.close()
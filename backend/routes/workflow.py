@@ -1,10 +1,19 @@
 import logging
+from functools import partial
 from flask import Blueprint, request, jsonify
 from ..utils.auth import require_roles, require_auth, require_auth_and_roles
 from ..database import SessionLocal
-from ..models import PurchaseRequest, PurchaseItem, ApprovalHistory, User
-from ..utils.notifications import create_notification
-from ..utils.watchers import get_request_watchers
+from ..models import (
+    PurchaseRequest, PurchaseItem, ApprovalHistory, WorkQueueEntry, WorkflowCounter, RequestSnapshot,
+)
+from ..utils.notifications import create_notification, create_notifications
+from ..utils.watchers import get_request_audience
+from ..utils.http_cache import compute_etag, not_modified, with_etag, gzip_json_response
+from ..utils.pagination import (
+    PageArgsError, parse_page_args, fetch_page, encode_cursor, page_response,
+)
+from ..utils.write_queue import write_session
+from ..utils.versioning import STALE_REQUEST_ERROR, expected_version, is_stale, version_conflict
 from ..services.workflow_service import (
     WORKFLOW_TRANSITIONS, STATUS_TO_REQUIRED_ROLE, STATUS_TO_SIGNATURE_FIELDS,
     STATUS_TO_HISTORY_ROLE, STATUS_TO_STAGE_ROLE,
@@ -12,6 +21,23 @@ from ..services.workflow_service import (
     get_effective_role, can_act_on_request,
     auto_skip_if_same_approver as _auto_skip_if_same_approver,
 )
+from ..services.work_queue import sync_work_queue, queue_keys_for, queue_criterion
+from ..services.counters import (
+    record_user_action, read_counters, queue_counter_keys, user_counter_key, rebuild_unread_counters,
+)
+from ..services.signatures import store_signature
+from ..services.item_review import apply_item_actions, request_items_total
+from ..services.user_directory import get_user_directory
+from ..services.request_details import (
+    TERMINAL_STATUSES, build_request_details, sync_snapshot,
+    snapshot_etag, snapshot_payload,
+)
+from ..services.request_projections import (
+    SUMMARY_COLUMNS, project_requests, load_items_by_request,
+    list_validator, queue_status_criterion,
+)
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime, timezone
 
 bp = Blueprint("workflow", __name__, url_prefix="/api")
@@ -21,7 +47,7 @@ logger = logging.getLogger(__name__)
 # ==================== أدوات تحويل البيانات ====================
 
 def _serialize_request_summary(r):
-    """تحويل PurchaseRequest إلى dict مختصر (للقوائم)"""
+    """تحويل PurchaseRequest (أو Row بأعمدة SUMMARY_COLUMNS) إلى dict مختصر (للقوائم)"""
     return {
         "id": r.id,
         "order_number": r.order_number,
@@ -38,6 +64,7 @@ def _serialize_request_summary(r):
         "delivery_date": r.delivery_date or "",
         "delivery_address": r.delivery_address,
         "project_code": r.project_code,
+        "version": r.version,
     }
 
 
@@ -63,11 +90,15 @@ def reset_db():
     if not data.get("confirm") or data.get("password") != "DELETE_ALL_DATA":
         return jsonify({"error": "يتطلب تأكيد الحذف", "message": 'أرسل {"confirm": true, "password": "DELETE_ALL_DATA"}'}), 400
     
-    db = SessionLocal()
+    db = write_session()
     try:
+        db.query(RequestSnapshot).delete()
+        db.query(WorkQueueEntry).delete()
+        db.query(WorkflowCounter).delete()
         db.query(ApprovalHistory).delete()
         db.query(PurchaseItem).delete()
-        db.query(PurchaseRequest).delete()
+        db.query(PurchaseRequest).delete()  # foreign_keys=ON: تُحذف إشعارات الطلبات معها
+        rebuild_unread_counters(db)
         db.commit()
         return jsonify({"message": "تم حذف جميع الطلبات بنجاح"})
     except Exception as e:
@@ -84,105 +115,171 @@ def reset_db():
 def list_requests():
     status = request.args.get("status")
     dept = request.args.get("department")
+    try:
+        page = parse_page_args(request.args)
+    except PageArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
     db = SessionLocal()
     try:
         user = getattr(request, "user", {}) or {}
         user_role = user.get("role")
         user_dept = user.get("department")
         
-        q = db.query(PurchaseRequest)
+        criteria = []
         if status:
-            q = q.filter(PurchaseRequest.status == status)
+            criteria.append(PurchaseRequest.status == status)
         if dept:
-            q = q.filter(PurchaseRequest.department == dept)
+            criteria.append(PurchaseRequest.department == dept)
         elif user_role != "admin" and user_dept:
-            q = q.filter(PurchaseRequest.department == user_dept)
+            criteria.append(PurchaseRequest.department == user_dept)
+
+        # 304 إذا لم يتغير شيء في نطاق القائمة (استعلام فهرس فقط)
+        etag = compute_etag("requests", request.query_string.decode(), user_role, user_dept,
+                            *list_validator(db, *criteria))
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        results = q.order_by(PurchaseRequest.id.desc()).all()
-        return jsonify([_serialize_request_summary(r) for r in results])
+        q = project_requests(db).filter(*criteria).order_by(PurchaseRequest.id.desc())
+        if page is None:
+            return with_etag(jsonify(_serialize_summaries(q.all())), etag)
+        return with_etag(jsonify(_id_keyset_page(q, page, _serialize_summaries)), etag)
     finally:
         db.close()
 
 
+def _serialize_summaries(rows):
+    return [_serialize_request_summary(r) for r in rows]
+
+
+def _id_keyset_page(q, page, serialize_rows, key=PurchaseRequest.id):
+    """
+    صفحة واحدة من استعلام مرتب بمعرّف الطلب تنازلياً (key).
+    المؤشر = (id) لآخر صف في الصفحة السابقة.
+    serialize_rows تستقبل صفوف الصفحة كاملة (لتسمح بالتحميل المجمّع).
+    """
+    limit, cursor = page
+    if cursor:
+        q = q.filter(key < cursor[0])
+    rows, has_more = fetch_page(q, limit)
+    next_cursor = encode_cursor(rows[-1].id) if has_more else None
+    return page_response(serialize_rows(rows), next_cursor)
+
+
 # ==================== تحديث حالة الطلب ====================
 
-@bp.patch("/requests/<int:req_id>/status")
-@require_auth_and_roles("admin","manager","finance","disbursement")
-def update_status(req_id):
-    """تحديث حالة طلب: موافقة أو رفض"""
-    data = request.get_json(force=True, silent=True) or {}
+def _parse_status_action(data):
+    """قراءة (action, note, signature) من جسم الطلب — أو رسالة خطأ"""
     action = (data.get("action") or "").lower()
     note = data.get("note")
-    signature = data.get("signature")
-
     if action not in ("approve", "reject"):
-        return jsonify({"error": "إجراء غير صحيح"}), 400
-
+        return None, "إجراء غير صحيح"
     if action == "reject" and not (note and note.strip()):
-        return jsonify({"error": "يجب إضافة ملاحظة توضح سبب الرفض"}), 400
+        return None, "يجب إضافة ملاحظة توضح سبب الرفض"
+    return (action, note, data.get("signature")), None
+
 
+def _current_actor():
     user = getattr(request, "user", {}) or {}
-    actor_role = user.get("role")
     actor_user = user.get("username") or user.get("name") or user.get("email")
+    return actor_user, user.get("role")
 
-    db = SessionLocal()
+
+def _apply_status_action(db, pr, action, note, signature, actor_user, actor_role):
+    """
+    تطبيق موافقة/رفض على طلب: فحص الصلاحيات ← بيانات الموافقة ← سجل الموافقات
+    ← الانتقال (+ التخطي التلقائي) ← صندوق العمل والنسخة المجمّدة.
+    signature هنا مرجع مخزّن مسبقاً (store_signature). لا يعمل commit.
+    Returns:
+        (True, effective_role) أو (False, رسالة الخطأ) — عند الفشل لا يُعدَّل شيء
+    """
+    current = pr.status or "pending_manager"
+
+    # فحص الصلاحيات
+    allowed, result = can_act_on_request(actor_user, actor_role, pr, db)
+    if not allowed:
+        return False, result
+    effective_role = result
+
+    logger.info(f"تحديث الطلب {pr.id}: {actor_user} ({effective_role}) → {action}")
+
+    # جلب اسم المستخدم الكامل (من دليل المستخدمين — بلا استعلام)
+    user_full_name = get_user_directory(db).full_name(actor_user)
+    today_str = datetime.now().strftime('%Y-%m-%d')
+
+    # حفظ بيانات الموافقة
+    if action == "approve":
+        fields = STATUS_TO_SIGNATURE_FIELDS.get(current)
+        if fields:
+            setattr(pr, fields["name"], user_full_name)
+            setattr(pr, fields["date"], today_str)
+            setattr(pr, fields["sig"], signature)
+
+    # تسجيل في سجل الموافقات (العدّاد أولاً: يفحص الإجراءات السابقة)
+    record_user_action(db, pr.id, actor_user, action)
+    history_role = STATUS_TO_HISTORY_ROLE.get(current, effective_role)
+    db.add(ApprovalHistory(
+        request_id=pr.id,
+        actor_role=history_role,
+        actor_user=actor_user,
+        action=action,
+        note=note,
+        signature=signature
+    ))
+
+    if action == "reject":
+        pr.status = "rejected"
+        pr.rejection_note = note
+        _sync_status_fields(pr)
+    else:  # approve
+        transition = WORKFLOW_TRANSITIONS.get(current)
+        if transition:
+            pr.status = transition["next_status"]
+            _sync_status_fields(pr)
+
+            if pr.status == "pending_procurement":
+                pr.procurement_status = pr.procurement_status or "pending"
+
+            # === Auto-Skip: تخطي المرحلة إذا المعتمد التالي هو نفس الشخص ===
+            _auto_skip_if_same_approver(db, pr, actor_user, signature, today_str)
+
+    sync_work_queue(db, pr)
+    if pr.status in TERMINAL_STATUSES:
+        sync_snapshot(db, pr)
+    db.add(pr)
+    return True, effective_role
+
+
+@bp.patch("/requests/<int:req_id>/status")
+@require_auth_and_roles("admin","manager","finance","disbursement")
+def update_status(req_id):
+    """تحديث حالة طلب: موافقة أو رفض — مع "version" المعروضة للمستخدم: 409 إن تغيّر الطلب"""
+    data = request.get_json(force=True, silent=True) or {}
+    parsed, error = _parse_status_action(data)
+    if error:
+        return jsonify({"error": error}), 400
+    action, note, signature = parsed
+    try:
+        expected = expected_version(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "رقم النسخة غير صالح"}), 400
+    actor_user, actor_role = _current_actor()
+
+    db = write_session()
     try:
         pr = db.get(PurchaseRequest, req_id)
         if not pr:
             return jsonify({"error": "الطلب غير موجود"}), 404
+        if is_stale(pr, expected):
+            return version_conflict(db, req_id)
 
-        current = pr.status or "pending_manager"
+        # التوقيع يُخزَّن مرة واحدة في signature_blobs — الأعمدة تحمل المرجع فقط
+        signature = store_signature(db, signature)
 
-        # فحص الصلاحيات
-        allowed, result = can_act_on_request(actor_user, actor_role, pr, db)
-        if not allowed:
+        ok, result = _apply_status_action(db, pr, action, note, signature, actor_user, actor_role)
+        if not ok:
             return jsonify({"error": result}), 403
-        effective_role = result
-
-        logger.info(f"تحديث الطلب {pr.id}: {actor_user} ({effective_role}) → {action}")
-
-        # جلب اسم المستخدم الكامل
-        approver_user = db.query(User).filter(User.username == actor_user).first()
-        user_full_name = (approver_user.full_name if approver_user else None) or actor_user
-        today_str = datetime.now().strftime('%Y-%m-%d')
-
-        # حفظ بيانات الموافقة
-        if action == "approve":
-            fields = STATUS_TO_SIGNATURE_FIELDS.get(current)
-            if fields:
-                setattr(pr, fields["name"], user_full_name)
-                setattr(pr, fields["date"], today_str)
-                setattr(pr, fields["sig"], signature)
-
-        # تسجيل في سجل الموافقات
-        history_role = STATUS_TO_HISTORY_ROLE.get(current, effective_role)
-        db.add(ApprovalHistory(
-            request_id=pr.id,
-            actor_role=history_role,
-            actor_user=actor_user,
-            action=action,
-            note=note,
-            signature=signature
-        ))
-
-        if action == "reject":
-            pr.status = "rejected"
-            pr.rejection_note = note
-            _sync_status_fields(pr)
-        else:  # approve
-            transition = WORKFLOW_TRANSITIONS.get(current)
-            if transition:
-                pr.status = transition["next_status"]
-                _sync_status_fields(pr)
-                
-                if pr.status == "pending_procurement":
-                    pr.procurement_status = pr.procurement_status or "pending"
-                
-                # === Auto-Skip: تخطي المرحلة إذا المعتمد التالي هو نفس الشخص ===
-                pr = _auto_skip_if_same_approver(db, pr, actor_user, signature, today_str)
-
-
-        db.add(pr)
         db.commit()
         db.refresh(pr)
 
@@ -195,11 +292,14 @@ def update_status(req_id):
             "status": pr.status,
             "current_stage": pr.current_stage,
             "next_role": pr.next_role,
+            "version": pr.version,
             "message": "تم تحديث الطلب بنجاح",
             "total": None,
             "approved": None,
             "rejected": None
         })
+    except StaleDataError:
+        return version_conflict(db, req_id)
     except Exception as e:
         db.rollback()
         logger.error(f"خطأ في تحديث الطلب {req_id}: {e}")
@@ -208,37 +308,121 @@ def update_status(req_id):
         db.close()
 
 
+# أقصى عدد طلبات في عملية جماعية واحدة
+MAX_BULK_IDS = 200
+
+
+@bp.post("/requests/bulk-status")
+@require_auth_and_roles("admin","manager","finance","disbursement")
+def bulk_update_status():
+    """
+    موافقة/رفض جماعي: {"ids": [...], "action", "note", "signature"}
+    نفس منطق update_status لكل طلب، في معاملة واحدة مع commit واحد،
+    والإشعارات تُضاف كلها ثم تُكتب دفعة واحدة — تُثبَّت مع تغييرات الحالة أو لا شيء.
+    الطلب المرفوض (غير موجود/بلا صلاحية/عدّله مستخدم آخر) لا يوقف الباقي — النتيجة لكل id:
+    كل طلب يُكتب داخل SAVEPOINT، فتعارض النسخة (StaleDataError) يُلغي ذلك الطلب وحده.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    parsed, error = _parse_status_action(data)
+    if error:
+        return jsonify({"error": error}), 400
+    action, note, signature = parsed
+
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "يجب تحديد قائمة الطلبات (ids)"}), 400
+    try:
+        ids = list(dict.fromkeys(int(i) for i in ids))  # بلا تكرار مع حفظ الترتيب
+    except (TypeError, ValueError):
+        return jsonify({"error": "أرقام الطلبات غير صالحة"}), 400
+    if len(ids) > MAX_BULK_IDS:
+        return jsonify({"error": f"الحد الأقصى {MAX_BULK_IDS} طلب في العملية الواحدة"}), 400
+
+    actor_user, actor_role = _current_actor()
+
+    db = write_session()
+    try:
+        requests_by_id = {
+            pr.id: pr for pr in db.query(PurchaseRequest).filter(PurchaseRequest.id.in_(ids))
+        }
+        signature = store_signature(db, signature)
+
+        results, updated = [], []
+        for req_id in ids:
+            pr = requests_by_id.get(req_id)
+            if pr is None:
+                results.append({"id": req_id, "ok": False, "error": "الطلب غير موجود"})
+                continue
+            try:
+                with db.begin_nested():
+                    ok, result = _apply_status_action(db, pr, action, note, signature, actor_user, actor_role)
+                    if ok:
+                        db.flush()
+            except StaleDataError:
+                results.append({"id": req_id, "ok": False, "error": STALE_REQUEST_ERROR})
+                continue
+            if not ok:
+                results.append({"id": req_id, "ok": False, "error": result})
+                continue
+            updated.append(pr)
+            results.append({
+                "id": pr.id, "ok": True, "status": pr.status,
+                "current_stage": pr.current_stage, "next_role": pr.next_role,
+            })
+
+        # إشعارات كل الطلبات في نفس المعاملة — أمر INSERT واحد؛ فشلها يُلغي الدفعة كلها
+        # (rollback أدناه) فلا يُثبَّت تغيير حالة بلا إشعاره
+        create_notifications(db, [
+            _status_notification(db, pr, actor_user, actor_role, note) for pr in updated
+        ])
+        db.commit()
+
+        return jsonify({
+            "results": results,
+            "succeeded": len(updated),
+            "failed": len(results) - len(updated),
+        })
+    except Exception as e:
+        db.rollback()
+        logger.error(f"خطأ في التحديث الجماعي: {e}")
+        return jsonify({"error": f"خطأ في تحديث الحالة: {str(e)}"}), 500
+    finally:
+        db.close()
+
 
+def _status_notification(db, pr, actor_user, actor_role, note):
+    """معاملات إشعار تحديث حالة الطلب (المستلمون + الرسالة)"""
+    recipients = get_request_audience(db, pr)
+    if actor_role == "requester":
+        recipients = [pr.created_by] if pr.created_by else []
+
+    if pr.status == "rejected":
+        action_type = "reject"
+        message = f"تم رفض طلب الشراء #{pr.order_number} بواسطة {actor_user}."
+        if note:
+            message += f" السبب: {note}"
+    elif pr.status == "pending_procurement":
+        action_type = "procurement"
+        message = f"تم تحويل طلب الشراء #{pr.order_number} إلى قسم المشتريات."
+    elif pr.status == "completed":
+        action_type = "approve"
+        message = f"تم إكمال طلب الشراء #{pr.order_number}."
+    else:
+        action_type = "approve"
+        message = f"تمت الموافقة على طلب الشراء #{pr.order_number} من قبل {actor_user}."
+
+    return dict(
+        request_id=pr.id, recipients=recipients,
+        title="تحديث حالة طلب الشراء", message=message,
+        action_type=action_type, actor_username=actor_user,
+        actor_role=actor_role, note=note,
+    )
 
 
 def _send_status_notification(db, pr, actor_user, actor_role, note):
     """إرسال إشعار بتحديث حالة الطلب"""
     try:
-        recipients = get_request_watchers(db, pr)
-        if actor_role == "requester":
-            recipients = [pr.created_by] if pr.created_by else []
-        
-        if pr.status == "rejected":
-            action_type = "reject"
-            message = f"تم رفض طلب الشراء #{pr.order_number} بواسطة {actor_user}."
-            if note:
-                message += f" السبب: {note}"
-        elif pr.status == "pending_procurement":
-            action_type = "procurement"
-            message = f"تم تحويل طلب الشراء #{pr.order_number} إلى قسم المشتريات."
-        elif pr.status == "completed":
-            action_type = "approve"
-            message = f"تم إكمال طلب الشراء #{pr.order_number}."
-        else:
-            action_type = "approve"
-            message = f"تمت الموافقة على طلب الشراء #{pr.order_number} من قبل {actor_user}."
-
-        create_notification(
-            db, request_id=pr.id, recipients=recipients,
-            title="تحديث حالة طلب الشراء", message=message,
-            action_type=action_type, actor_username=actor_user,
-            actor_role=actor_role, note=note,
-        )
+        create_notification(db, **_status_notification(db, pr, actor_user, actor_role, note))
     except Exception as e:
         logger.warning(f"فشل إرسال الإشعار: {e}")
 
@@ -250,68 +434,28 @@ def _send_status_notification(db, pr, actor_user, actor_role, note):
 def get_request_details(req_id):
     db = SessionLocal()
     try:
+        # الطلبات المنتهية تُخدَم من النسخة المجمّدة دون بناء التفاصيل.
+        # no-cache لا max-age: المشتريات قد تعيد فتح الطلب فتتغير النسخة
+        etag = snapshot_etag(db, req_id)
+        if etag is not None:
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            return with_etag(gzip_json_response(snapshot_payload(db, req_id)), etag)
+
+        # المُتحقِّق: updated_at للطلب (بحث بالمفتاح الأساسي فقط)
+        updated_at = db.query(PurchaseRequest.updated_at).filter(PurchaseRequest.id == req_id).first()
+        if updated_at is None:
+            return jsonify({"error": "الطلب غير موجود"}), 404
+        etag = compute_etag("request", req_id, updated_at[0])
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
         pr = db.get(PurchaseRequest, req_id)
         if not pr:
             return jsonify({"error": "الطلب غير موجود"}), 404
-        
-        items = [{
-            "id": item.id, "item_name": item.item_name,
-            "specification": item.specification, "unit": item.unit,
-            "quantity": item.quantity, "price": item.price,
-            "total": item.total, "status": item.status or "pending",
-            "rejection_reason": item.rejection_reason,
-            "rejected_by": item.rejected_by
-        } for item in pr.items]
-        
-        approval_dates = {}
-        histories = db.query(ApprovalHistory).filter(
-            ApprovalHistory.request_id == req_id,
-            ApprovalHistory.action.in_(["approve", "auto-approve"])
-        ).order_by(ApprovalHistory.created_at.desc()).all()
-        for h in histories:
-            role_key = (h.actor_role or "").lower()
-            if role_key and role_key not in approval_dates:
-                approval_dates[role_key] = h.created_at.isoformat() if h.created_at else None
-        
-        return jsonify({
-            "id": pr.id,
-            "order_number": pr.order_number,
-            "requester": pr.requester,
-            "department": pr.department,
-            "delivery_address": pr.delivery_address,
-            "delivery_date": pr.delivery_date,
-            "project_code": pr.project_code,
-            "currency": pr.currency,
-            "total_amount": float(pr.total_amount or 0.0),
-            "status": pr.status,
-            "current_stage": pr.current_stage,
-            "next_role": pr.next_role,
-            "created_by": pr.created_by,
-            "created_at": pr.created_at.isoformat() if pr.created_at else None,
-            "updated_at": pr.updated_at.isoformat() if pr.updated_at else None,
-            "date": str(pr.created_at.date()) if pr.created_at else "",
-            "items": items,
-            "approval_data": {
-                "requester_name": pr.requester_name,
-                "requester_position": pr.requester_position,
-                "manager_name": pr.manager_name,
-                "manager_position": pr.manager_position,
-                "finance_name": pr.finance_name,
-                "finance_position": pr.finance_position,
-                "disbursement_name": pr.disbursement_name,
-                "disbursement_position": pr.disbursement_position,
-                "requester_date": pr.requester_date,
-                "manager_date": pr.manager_date,
-                "finance_date": pr.finance_date,
-                "disbursement_date": pr.disbursement_date
-            },
-            "signatures": {
-                "manager": pr.manager_signature,
-                "finance": pr.finance_signature,
-                "disbursement": pr.disbursement_signature
-            },
-            "approval_dates": approval_dates
-        })
+        return with_etag(jsonify(build_request_details(db, pr)), etag)
     finally:
         db.close()
 
@@ -338,11 +482,15 @@ def _my_actioned_requests(actions):
     user = getattr(request, "user", {}) or {}
     actor_user = user.get("username") or user.get("name") or user.get("email")
     is_reject = "reject" in actions
+    try:
+        # المؤشر هنا = (action_at, id) لأن الترتيب حسب وقت الإجراء
+        page = parse_page_args(request.args, cursor_types=(datetime, int))
+    except PageArgsError as e:
+        return jsonify({"error": str(e)}), 400
 
     db = SessionLocal()
     try:
         # استعلام واحد مع subquery بدلاً من N+1
-        from sqlalchemy import func
         latest_action = (
             db.query(
                 ApprovalHistory.request_id,
@@ -357,25 +505,43 @@ def _my_actioned_requests(actions):
             .subquery()
         )
 
-        rows = (
-            db.query(PurchaseRequest, latest_action.c.action_at, latest_action.c.note)
+        q = (
+            project_requests(db, SUMMARY_COLUMNS, latest_action.c.action_at, latest_action.c.note)
             .join(latest_action, PurchaseRequest.id == latest_action.c.request_id)
-            .order_by(latest_action.c.action_at.desc())
-            .all()
+            .order_by(latest_action.c.action_at.desc(), latest_action.c.request_id.desc())
         )
 
+        next_cursor = None
+        if page is None:
+            rows = q.all()
+        else:
+            limit, cursor = page
+            if cursor:
+                last_at, last_id = cursor
+                q = q.filter(or_(
+                    latest_action.c.action_at < last_at,
+                    and_(latest_action.c.action_at == last_at,
+                         latest_action.c.request_id < last_id),
+                ))
+            rows, has_more = fetch_page(q, limit)
+            if has_more:
+                next_cursor = encode_cursor(rows[-1].action_at, rows[-1].id)
+
         result = []
-        for pr, action_at, note in rows:
-            d = _serialize_request_summary(pr)
+        for row in rows:
+            d = _serialize_request_summary(row)
+            action_at = row.action_at.isoformat() if row.action_at else None
             if is_reject:
-                d["rejected_at"] = action_at.isoformat() if action_at else None
-                d["rejection_note"] = note
+                d["rejected_at"] = action_at
+                d["rejection_note"] = row.note
             else:
-                d["approved_at"] = action_at.isoformat() if action_at else None
-                d["approval_note"] = note
+                d["approved_at"] = action_at
+                d["approval_note"] = row.note
             result.append(d)
 
-        return jsonify(result)
+        if page is None:
+            return jsonify(result)
+        return jsonify(page_response(result, next_cursor))
     except Exception as e:
         label = "المرفوضة" if is_reject else "المعتمدة"
         logger.error(f"خطأ في جلب {label}: {e}")
@@ -393,52 +559,79 @@ def my_queue():
     role = user.get("role")
     username = user.get("username")
     user_dept = user.get("department")
+    try:
+        page = parse_page_args(request.args)
+    except PageArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
+    keys = queue_keys_for(role, username, user_dept)
+    if not keys:
+        return jsonify({"requests": [], "total": 0, "approved": 0, "rejected": 0, "pending": 0})
     
     db = SessionLocal()
     try:
-        q = db.query(PurchaseRequest)
-        
-        if role == "admin":
-            q = q.filter(PurchaseRequest.current_stage.in_(["manager", "finance", "disbursement"]))
-        elif role == "manager":
-            if not user_dept:
-                return jsonify({"requests": [], "total": 0, "approved": 0, "rejected": 0, "pending": 0})
-            
-            if username == "manager_finance":
-                # المدير المالي: طلبات إدارته (pending_manager) + جميع طلبات المالية (pending_finance)
-                q = q.filter(
-                    (PurchaseRequest.status == "pending_manager") & (PurchaseRequest.department == "مالية") |
-                    (PurchaseRequest.status == "pending_finance")
-                )
-            elif username == "manager_exec":
-                # آمر الصرف: طلبات إدارته (pending_manager) + جميع طلبات أمر الصرف
-                q = q.filter(
-                    ((PurchaseRequest.status == "pending_manager") & (PurchaseRequest.department == user_dept)) |
-                    (PurchaseRequest.status == "pending_disbursement")
-                )
-            else:
-                # مدير عادي: طلبات إدارته فقط
-                q = q.filter(PurchaseRequest.department == user_dept, PurchaseRequest.status == "pending_manager")
-        elif role == "finance":
-            q = q.filter(PurchaseRequest.status == "pending_finance")
-        elif role == "disbursement" or username == "manager_exec":
-            q = q.filter(PurchaseRequest.status == "pending_disbursement")
-        elif role == "procurement":
-            q = q.filter(PurchaseRequest.status == "pending_procurement")
-        else:
-            q = q.filter(PurchaseRequest.next_role == role)
-        
-        requests_list = q.order_by(PurchaseRequest.id.desc()).all()
-        out = []
-        for r in requests_list:
-            d = _serialize_request_summary(r)
-            d["items"] = [_serialize_item(it) for it in r.items]
-            out.append(d)
-        return jsonify(out)
+        etag = compute_etag("queue", request.query_string.decode(), keys,
+                            *list_validator(db, queue_status_criterion(keys)))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        # قراءة مفهرسة من صندوق العمل (work_queue) بدلاً من مسح purchase_requests
+        q = (
+            project_requests(db)
+            .join(WorkQueueEntry, WorkQueueEntry.request_id == PurchaseRequest.id)
+            .filter(queue_criterion(keys))
+            .order_by(WorkQueueEntry.request_id.desc())
+        )
+        serialize = partial(_serialize_queue_entries, db)
+        if page is None:
+            return with_etag(jsonify(serialize(q.all())), etag)
+        return with_etag(jsonify(_id_keyset_page(q, page, serialize, key=WorkQueueEntry.request_id)), etag)
     finally:
         db.close()
 
 
+@bp.get("/my/counters")
+@require_auth_and_roles("admin","manager","finance","disbursement","procurement","requester")
+def my_counters():
+    """
+    أرقام الشارات للمستخدم الحالي: حجم صندوق العمل + المعتمدة/المرفوضة/المنشأة.
+    تُقرأ من workflow_counters باستعلام واحد على المفتاح الأساسي.
+    """
+    user = getattr(request, "user", {}) or {}
+    username = user.get("username")
+    keys = queue_keys_for(user.get("role"), username, user.get("department"))
+    queue_keys = [
+        queue_counter_keys(stage, department)[0 if department is None else 1]
+        for stage, department in keys
+    ]
+    kinds = ("approved", "rejected", "created")
+    user_keys = {kind: user_counter_key(kind, username) for kind in kinds}
+
+    db = SessionLocal()
+    try:
+        values = read_counters(db, queue_keys + list(user_keys.values()))
+        result = {"pending": sum(values[k] for k in queue_keys)}
+        result.update({kind: values[key] for kind, key in user_keys.items()})
+        return jsonify(result)
+    finally:
+        db.close()
+
+
+def _serialize_queue_entries(db, rows):
+    """
+    ملخصات الطلبات مع أصنافها (لطابور العمل).
+    أصناف الصفحة كلها تُحمّل باستعلام واحد بدلاً من lazy-load لكل طلب.
+    """
+    items_by_request = load_items_by_request(db, [r.id for r in rows])
+    out = []
+    for r in rows:
+        d = _serialize_request_summary(r)
+        d["items"] = [_serialize_item(it) for it in items_by_request[r.id]]
+        out.append(d)
+    return out
+
+
 # ==================== طلباتي ====================
 
 @bp.get("/my/requests")
@@ -459,13 +652,20 @@ def _get_user_own_requests():
     """جلب الطلبات التي أنشأها المستخدم الحالي"""
     user = getattr(request, "user", {}) or {}
     me = user.get("username") or user.get("name") or user.get("email")
+    try:
+        page = parse_page_args(request.args)
+    except PageArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
     db = SessionLocal()
     try:
-        q = db.query(PurchaseRequest)
+        q = project_requests(db)
         if user.get("role") != "admin":
             q = q.filter(PurchaseRequest.created_by == me)
-        results = q.order_by(PurchaseRequest.id.desc()).all()
-        return jsonify([_serialize_request_summary(r) for r in results])
+        q = q.order_by(PurchaseRequest.id.desc())
+        if page is None:
+            return jsonify(_serialize_summaries(q.all()))
+        return jsonify(_id_keyset_page(q, page, _serialize_summaries))
     finally:
         db.close()
 
@@ -484,8 +684,12 @@ def item_action(request_id, item_id):
         return jsonify({"error": "الإجراء يجب أن يكون 'approve' أو 'reject'"}), 400
     if action == "reject" and not reason:
         return jsonify({"error": "يجب إدخال سبب الرفض"}), 400
+    try:
+        expected = expected_version(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "رقم النسخة غير صالح"}), 400
     
-    db = SessionLocal()
+    db = write_session()
     try:
         item = db.query(PurchaseItem).filter(
             PurchaseItem.id == item_id, PurchaseItem.request_id == request_id
@@ -493,7 +697,6 @@ def item_action(request_id, item_id):
         if not item:
             return jsonify({"error": "البند غير موجود"}), 404
         
-        pr = item.request
         actor_user = request.user.get("username")
         actor_role = request.user.get("role")
         actor_name = request.user.get("full_name") or actor_user
@@ -501,6 +704,10 @@ def item_action(request_id, item_id):
         if actor_role not in ["manager", "finance", "disbursement", "admin"]:
             return jsonify({"error": "لا تملك صلاحية لتنفيذ هذا الإجراء"}), 403
         
+        pr = db.get(PurchaseRequest, request_id)
+        if is_stale(pr, expected):
+            return version_conflict(db, request_id)
+        
         if action == "approve":
             item.status = "approved"
             item.rejection_reason = None
@@ -511,18 +718,23 @@ def item_action(request_id, item_id):
             item.rejection_reason = reason
             item.rejected_by = actor_name
             item.rejection_date = datetime.now(timezone.utc)
+        db.flush()
         
-        # إعادة حساب المبلغ الإجمالي
-        approved_total = sum(i.total for i in pr.items if i.status in ["approved", "pending"])
-        pr.total_amount = approved_total
+        # إعادة حساب المبلغ الإجمالي (SUM في SQL بدلاً من تحميل كل البنود)
+        pr.total_amount = request_items_total(db, request_id)
+        pr.updated_at = datetime.now(timezone.utc)  # يُبطل ETag حتى لو لم يتغير المبلغ
+        if pr.status in TERMINAL_STATUSES:
+            sync_snapshot(db, pr)
         
         db.commit()
         return jsonify({
             "message": f"تم {'الموافقة على' if action == 'approve' else 'رفض'} البند بنجاح",
             "item": {"id": item.id, "item_name": item.item_name, "status": item.status,
                      "rejection_reason": item.rejection_reason, "rejected_by": item.rejected_by},
-            "request": {"id": pr.id, "total_amount": float(pr.total_amount or 0)}
+            "request": {"id": pr.id, "total_amount": float(pr.total_amount or 0), "version": pr.version}
         })
+    except StaleDataError:
+        return version_conflict(db, request_id)
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
@@ -559,43 +771,46 @@ def bulk_item_action(request_id):
     items_actions = data.get("items", [])
     if not items_actions:
         return jsonify({"error": "يجب تحديد البنود والإجراءات"}), 400
+    try:
+        expected = expected_version(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "رقم النسخة غير صالح"}), 400
     
-    db = SessionLocal()
+    db = write_session()
     try:
-        pr = db.query(PurchaseRequest).filter(PurchaseRequest.id == request_id).first()
+        pr = db.get(PurchaseRequest, request_id)
         if not pr:
             return jsonify({"error": "الطلب غير موجود"}), 404
+        if is_stale(pr, expected):
+            return version_conflict(db, request_id)
         
         actor_user = request.user.get("username")
         actor_name = request.user.get("full_name") or actor_user
-        results = []
         
-        for ia in items_actions:
-            item = db.query(PurchaseItem).filter(
-                PurchaseItem.id == ia.get("id"), PurchaseItem.request_id == request_id
-            ).first()
-            if not item:
-                continue
-            
-            if ia.get("action") == "approve":
-                item.status = "approved"
-                item.rejection_reason = None
-                item.rejected_by = None
-                item.rejection_date = None
-            elif ia.get("action") == "reject":
-                item.status = "rejected"
-                item.rejection_reason = ia.get("reason", "").strip()
-                item.rejected_by = actor_name
-                item.rejection_date = datetime.now(timezone.utc)
-            
-            results.append({"id": item.id, "item_name": item.item_name, "status": item.status})
+        # UPDATE واحد لكل فئة إجراء بدلاً من SELECT + تعديل لكل بند
+        apply_item_actions(db, request_id, items_actions, actor_name)
+        
+        requested_ids = list(dict.fromkeys(ia.get("id") for ia in items_actions))  # بلا تكرار، بترتيب الحمولة
+        rows = {
+            row.id: row for row in db.query(PurchaseItem.id, PurchaseItem.item_name, PurchaseItem.status)
+            .filter(PurchaseItem.request_id == request_id, PurchaseItem.id.in_(requested_ids))
+        }
+        results = [
+            {"id": row.id, "item_name": row.item_name, "status": row.status}
+            for row in (rows.get(item_id) for item_id in requested_ids) if row is not None
+        ]
         
         # إعادة حساب المبلغ
-        pr.total_amount = sum(i.total for i in pr.items if i.status in ["approved", "pending"])
+        pr.total_amount = request_items_total(db, request_id)
+        pr.updated_at = datetime.now(timezone.utc)
+        if pr.status in TERMINAL_STATUSES:
+            sync_snapshot(db, pr)
         db.commit()
         
         return jsonify({"message": "تم تنفيذ الإجراءات بنجاح", "results": results,
-                        "new_total": float(pr.total_amount or 0)})
+                        "new_total": float(pr.total_amount or 0), "version": pr.version})
+    except StaleDataError:
+        return version_conflict(db, request_id)
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
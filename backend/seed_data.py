@@ -5,8 +5,9 @@
 
 import logging
 from werkzeug.security import generate_password_hash
-from .database import SessionLocal, Base, engine
+from .database import SessionLocal
 from .models import User
+from .services.user_directory import invalidate_users
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +19,8 @@ def hash_password(password):
 
 def create_default_users():
     """إنشاء المستخدمين الافتراضيين — آمن: لا يمس البيانات الموجودة"""
-    Base.metadata.create_all(bind=engine)
+    from .migrate_db import run_migrations
+    run_migrations()  # لا شيء إن كان المخطط حديثاً
 
     db = SessionLocal()
     try:
@@ -73,6 +75,7 @@ def create_default_users():
                 department=user_data["department"],
             ))
 
+        invalidate_users(db)
         db.commit()
         logger.info(f"تم إنشاء {len(users)} مستخدم افتراضي بنجاح")
 
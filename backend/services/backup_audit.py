@@ -0,0 +1,229 @@
+"""
+تدقيق النسخ الاحتياطية في مكانها — "كيف كان الطلب X يوم الثلاثاء الماضي؟"
+بلا restore_database (الذي يستبدل القاعدة الحية بعد نسخة كاملة أخرى).
+
+كل نسخة من list_backups() تُفتح بـ engine منفصل للقراءة فقط (mode=ro&immutable=1):
+    - .db غير المضغوطة تُفتح كما هي
+    - المضغوطة تُفك، وحلقات delta يُعاد بناؤها، إلى ملف مؤقت يعيش ما دام الـ engine في الذاكرة
+ثم يعمل build_request_details نفسه على جلسة النسخة، وتُقارن النتيجة بالصف الحي.
+
+نسخ أقدم من بعض الترحيلات ينقصها أعمدة (أو جداول) يقرؤها الـ ORM: على كل اتصال
+تُنشأ TEMP VIEW بنفس اسم الجدول تضيف العمود الناقص بقيمته الافتراضية (أو NULL) —
+SQLite يبحث في temp قبل main، وملف النسخة لا يُمس.
+
+الـ engines المفتوحة في LRU بحجم BACKUP_AUDIT_CACHE لكل عملية: تكرار التدقيق على
+نفس النسخة لا يعيد فك الضغط. الإخراج من الذاكرة يغلق الـ engine ويحذف الملف المؤقت.
+
+    python -m backend.services.backup_audit <backup name> <request id>
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from .. import config
+from ..database import Base, SessionLocal
+from ..models import PurchaseRequest
+from ..utils import backup
+from .request_details import build_request_details
+
+logger = logging.getLogger(__name__)
+
+class BackupNotFound(LookupError):
+    """اسم ليس في list_backups()"""
+
+
+class _OpenBackup:
+    """engine للقراءة فقط على نسخة واحدة + الملف المؤقت الذي يقوم عليه"""
+
+    def __init__(self, info):
+        self.info = info
+        self.key = _file_key(info["path"])
+        self._stack = ExitStack()
+        try:
+            path = self._stack.enter_context(backup._expanded(info["path"]))
+            uri = f"file:{path}?mode=ro&immutable=1"
+            shims = _schema_shims(uri)
+
+            def connect():
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                for sql in shims:
+                    conn.execute(sql)
+                return conn
+
+            self.engine = create_engine("sqlite://", creator=connect, poolclass=QueuePool, pool_size=2)
+            self.Session = sessionmaker(bind=self.engine, autoflush=False)
+            self.shimmed = len(shims)
+        except Exception:
+            self._stack.close()
+            raise
+
+    def close(self):
+        self.engine.dispose()
+        self._stack.close()
+
+
+_cache = OrderedDict()  # name → _OpenBackup، الأحدث استخداماً في النهاية
+_cache_lock = threading.Lock()
+
+
+def _file_key(path):
+    """ملف النسخة قد يُستبدل (دمج حلقة delta في تابعها) — الحجم ووقت التعديل يكشفان ذلك"""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _schema_shims(uri):
+    """
+    TEMP VIEW لكل جدول في النماذج ينقصه عمود في النسخة (أو غير موجود فيها أصلاً).
+    Returns:
+        جمل CREATE TEMP VIEW تُنفذ على كل اتصال
+    """
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        existing = {
+            name: {row[1] for row in conn.execute(f'PRAGMA table_info("{name}")')}
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+    finally:
+        conn.close()
+
+    shims = []
+    for table in Base.metadata.sorted_tables:
+        present = existing.get(table.name)
+        if present is not None and all(c.name in present for c in table.columns):
+            continue
+        columns = ", ".join(
+            f'"{c.name}"' if present and c.name in present else f'{_default_sql(c)} AS "{c.name}"'
+            for c in table.columns
+        )
+        source = f'FROM main."{table.name}"' if present is not None else "WHERE 0"
+        shims.append(f'CREATE TEMP VIEW "{table.name}" AS SELECT {columns} {source}')
+    return shims
+
+
+def _default_sql(column):
+    """قيمة العمود الناقص: server_default إن وُجد (بنوع العمود) وإلا NULL"""
+    default = column.server_default
+    if default is None:
+        return "NULL"
+    arg = getattr(default, "arg", None)
+    literal = getattr(arg, "text", None) or "'{}'".format(str(arg).replace("'", "''"))
+    return f"CAST({literal} AS {column.type.compile()})"
+
+
+def open_backup(name):
+    """
+    engine النسخة من الـ LRU (أو فتحها وإضافتها).
+    Raises:
+        BackupNotFound إذا لم تكن في list_backups()
+        backup.BackupError إذا تعذرت إعادة بناء حلقة delta
+    """
+    info = next((b for b in backup.list_backups() if b["name"] == name), None)
+    if info is None:
+        raise BackupNotFound(name)
+    key = _file_key(info["path"])
+    with _cache_lock:
+        opened = _cache.get(name)
+        if opened is not None and opened.key != key:
+            _cache.pop(name).close()
+            opened = None
+        if opened is None:
+            opened = _OpenBackup(info)
+            _cache[name] = opened
+            if opened.shimmed:
+                logger.info(f"النسخة {name} أقدم من المخطط الحالي — {opened.shimmed} جدول عبر TEMP VIEW")
+            while len(_cache) > max(config.BACKUP_AUDIT_CACHE, 1):
+                _, evicted = _cache.popitem(last=False)
+                evicted.close()
+        _cache.move_to_end(name)
+        return opened
+
+
+def close_all():
+    """إغلاق كل الـ engines المفتوحة وحذف ملفاتها المؤقتة"""
+    with _cache_lock:
+        while _cache:
+            _cache.popitem()[1].close()
+
+
+def _details(db, request_id):
+    pr = db.get(PurchaseRequest, request_id)
+    if pr is None:
+        return None
+    return build_request_details(db, pr)
+
+
+def diff_details(before, after, path=""):
+    """
+    الفروق بين نسختين من تفاصيل الطلب: [{"path", "backup", "live"}].
+    القوائم التي عناصرها dict بمفتاح id (الأصناف) تُقارن حسب id لا حسب الموضع.
+    """
+    if isinstance(before, dict) and isinstance(after, dict):
+        changes = []
+        for key in list(before) + [k for k in after if k not in before]:
+            changes += diff_details(before.get(key), after.get(key), f"{path}.{key}" if path else key)
+        return changes
+    if _keyed_list(before) and _keyed_list(after):
+        old, new = {i["id"]: i for i in before}, {i["id"]: i for i in after}
+        changes = []
+        for item_id in list(old) + [i for i in new if i not in old]:
+            changes += diff_details(old.get(item_id), new.get(item_id), f"{path}[{item_id}]")
+        return changes
+    return [] if before == after else [{"path": path, "backup": before, "live": after}]
+
+
+def _keyed_list(value):
+    return isinstance(value, list) and all(isinstance(i, dict) and "id" in i for i in value)
+
+
+def audit_request(name, request_id):
+    """
+    تفاصيل الطلب كما في النسخة وكما هي الآن، والفروق بينهما.
+    Returns:
+        {"backup": {name, created, reason, kind}, "request_id", "backup_state", "live", "changes"}
+        backup_state = None: الطلب لم يكن موجوداً وقت النسخة — live = None: حُذف بعدها
+    """
+    opened = open_backup(name)
+    bdb = opened.Session()
+    try:
+        then = _details(bdb, request_id)
+    finally:
+        bdb.close()
+
+    db = SessionLocal()
+    try:
+        now = _details(db, request_id)
+    finally:
+        db.close()
+
+    info = opened.info
+    return {
+        "backup": {k: info.get(k) for k in ("name", "created", "reason", "kind")},
+        "request_id": request_id,
+        "backup_state": then,
+        "live": now,
+        "changes": diff_details(then or {}, now or {}) if then and now else [],
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    if len(sys.argv) != 3 or not sys.argv[2].isdigit():
+        print("الاستخدام: python -m backend.services.backup_audit <backup name> <request id>")
+        sys.exit(2)
+    try:
+        result = audit_request(sys.argv[1], int(sys.argv[2]))
+    except BackupNotFound:
+        print(f"النسخة غير موجودة: {sys.argv[1]} (python -m backend.utils.backup list)")
+        sys.exit(1)
+    finally:
+        close_all()
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
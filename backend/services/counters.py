@@ -0,0 +1,194 @@
+"""
+عدّادات سير العمل (Workflow Counters)
+جدول workflow_counters (key → value) يُحدَّث تزايدياً داخل معاملة كل انتقال،
+فتصبح أرقام الشارات (badges) قراءة مفاتيح أساسية بدلاً من COUNT(*).
+
+المفاتيح:
+    queue:<stage>               حجم صندوق العمل لمرحلة (كل الأقسام)
+    queue:<stage>:<department>  حجم صندوق العمل لمرحلة في قسم
+    approved:<username>         عدد الطلبات التي وافق عليها المستخدم
+    rejected:<username>         عدد الطلبات التي رفضها المستخدم
+    created:<username>          عدد الطلبات التي أنشأها المستخدم
+    unread:<username>           عدد الإشعارات غير المقروءة (شارة الإشعارات)
+    rev:<name>                  رقم نسخة لإبطال الذاكرة المؤقتة (مثل rev:users — services/user_directory.py)
+"""
+
+import logging
+from sqlalchemy import func, insert, literal, select, distinct
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..models import (
+    WorkflowCounter, WorkQueueEntry, ApprovalHistory, PurchaseRequest, Notification, NotificationEvent,
+)
+
+logger = logging.getLogger(__name__)
+
+APPROVE_ACTIONS = ("approve", "auto-approve")
+
+
+def queue_counter_keys(stage, department):
+    """مفتاحا عدّاد الصندوق لطلب في (stage, department)"""
+    return (f"queue:{stage}", f"queue:{stage}:{department}")
+
+
+def user_counter_key(kind, username):
+    return f"{kind}:{username}"
+
+
+def unread_counter_key(username):
+    return f"unread:{username}"
+
+
+def bump(db, key, delta=1):
+    """زيادة/إنقاص عدّاد (ينشئه إذا لم يوجد). لا يعمل commit."""
+    updated = (
+        db.query(WorkflowCounter)
+        .filter(WorkflowCounter.key == key)
+        .update({WorkflowCounter.value: WorkflowCounter.value + delta}, synchronize_session=False)
+    )
+    if not updated:
+        db.add(WorkflowCounter(key=key, value=delta))
+        db.flush()
+
+
+def clear_counter(db, key):
+    """تصفير عدّاد (حذف المفتاح = صفر). لا يعمل commit."""
+    db.query(WorkflowCounter).filter(WorkflowCounter.key == key).delete(synchronize_session=False)
+
+
+def bump_many(db, deltas):
+    """
+    زيادة عدة عدّادات {key: delta} بأمر UPSERT واحد (executemany) بدلاً من UPDATE/INSERT لكل مفتاح.
+    لا يعمل commit.
+    """
+    rows = [{"key": key, "value": delta} for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    if db.get_bind().dialect.name != "sqlite":
+        for row in rows:
+            bump(db, row["key"], row["value"])
+        return
+    stmt = sqlite_insert(WorkflowCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WorkflowCounter.key],
+        set_={"value": WorkflowCounter.value + stmt.excluded.value},
+    )
+    db.execute(stmt, rows)
+
+
+def record_user_action(db, request_id, actor_user, action):
+    """
+    تحديث عدّاد approved/rejected للمستخدم عند إجراء على طلب.
+    يُستدعى قبل إضافة سجل الإجراء، ويعدّ كل طلب مرة واحدة لكل مستخدم
+    (مطابقاً لـ /api/my/approved و /api/my/rejected). لا يعمل commit.
+    """
+    if not actor_user:
+        return
+    if action == "reject":
+        kind, actions = "rejected", ("reject",)
+    else:
+        kind, actions = "approved", APPROVE_ACTIONS
+    seen = (
+        db.query(ApprovalHistory.id)
+        .filter(
+            ApprovalHistory.request_id == request_id,
+            ApprovalHistory.actor_user == actor_user,
+            ApprovalHistory.action.in_(actions),
+        )
+        .first()
+    )
+    if seen is None:
+        bump(db, user_counter_key(kind, actor_user))
+
+
+def read_counters(db, keys):
+    """قراءة عدة عدّادات باستعلام واحد — المفاتيح غير الموجودة = 0"""
+    keys = list(keys)
+    values = dict.fromkeys(keys, 0)
+    if keys:
+        for key, value in db.query(WorkflowCounter.key, WorkflowCounter.value).filter(WorkflowCounter.key.in_(keys)):
+            values[key] = value or 0
+    return values
+
+
+def _delete_prefix(db, prefix):
+    db.query(WorkflowCounter).filter(
+        WorkflowCounter.key >= prefix,
+        WorkflowCounter.key < prefix[:-1] + chr(ord(prefix[-1]) + 1),
+    ).delete(synchronize_session=False)
+
+
+def _insert_from(db, query):
+    db.execute(insert(WorkflowCounter).from_select(["key", "value"], query))
+
+
+def rebuild_queue_counters(db):
+    """إعادة حساب عدّادات queue:* من جدول work_queue (لا يعمل commit)"""
+    _delete_prefix(db, "queue:")
+    _insert_from(db, select(
+        literal("queue:") + WorkQueueEntry.stage, func.count()
+    ).group_by(WorkQueueEntry.stage))
+    _insert_from(db, select(
+        literal("queue:") + WorkQueueEntry.stage + literal(":") + WorkQueueEntry.department, func.count()
+    ).group_by(WorkQueueEntry.stage, WorkQueueEntry.department))
+
+
+def rebuild_user_counters(db):
+    """إعادة حساب عدّادات approved/rejected/created من السجلات (لا يعمل commit)"""
+    for kind, actions in (("approved", APPROVE_ACTIONS), ("rejected", ("reject",))):
+        _delete_prefix(db, f"{kind}:")
+        _insert_from(db, select(
+            literal(f"{kind}:") + ApprovalHistory.actor_user,
+            func.count(distinct(ApprovalHistory.request_id)),
+        ).where(
+            ApprovalHistory.action.in_(actions),
+            ApprovalHistory.actor_user.isnot(None),
+        ).group_by(ApprovalHistory.actor_user))
+
+    _delete_prefix(db, "created:")
+    _insert_from(db, select(
+        literal("created:") + PurchaseRequest.created_by, func.count()
+    ).where(PurchaseRequest.created_by.isnot(None)).group_by(PurchaseRequest.created_by))
+    logger.info("🔁 إعادة حساب عدّادات المستخدمين")
+
+
+def rebuild_unread_counters(db, mode=None):
+    """إعادة حساب عدّادات unread:* حسب mode (الافتراضي NOTIFICATIONS_MODE). لا يعمل commit."""
+    from .. import config
+    _delete_prefix(db, "unread:")
+    if (mode or config.NOTIFICATIONS_MODE) == "events":
+        from .notification_events import count_unread_events
+        from .user_directory import get_user_directory
+        deltas = {
+            unread_counter_key(u.username): count_unread_events(db, u.username, u.role)
+            for u in get_user_directory(db).by_username.values()
+        }
+        bump_many(db, deltas)
+    else:
+        _insert_from(db, select(
+            literal("unread:") + Notification.recipient_username, func.count()
+        ).where(Notification.is_read.is_(False)).group_by(Notification.recipient_username))
+    logger.info("🔁 إعادة حساب عدّادات الإشعارات غير المقروءة")
+
+
+def ensure_unread_counters(db):
+    """حساب عدّادات unread:* لأول مرة (قاعدة بيانات قبل إضافتها). لا يعمل commit."""
+    if db.query(WorkflowCounter.key).filter(WorkflowCounter.key.startswith("unread:")).first() is not None:
+        return False
+    if (db.query(Notification.id).filter(Notification.is_read.is_(False)).first() is None
+            and db.query(NotificationEvent.id).first() is None):
+        return False
+    rebuild_unread_counters(db)
+    return True
+
+
+def ensure_counters(db):
+    """حساب العدّادات لأول مرة إذا كان الجدول فارغاً بينما توجد طلبات. لا يعمل commit."""
+    if db.query(WorkflowCounter.key).filter(
+        ~WorkflowCounter.key.startswith("rev:"), ~WorkflowCounter.key.startswith("unread:"),
+    ).first() is not None:
+        return False
+    if db.query(PurchaseRequest.id).first() is None:
+        return False
+    rebuild_queue_counters(db)
+    rebuild_user_counters(db)
+    return True
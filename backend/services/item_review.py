@@ -0,0 +1,71 @@
+"""
+مراجعة البنود (Item Review) — تحديثات جماعية على مستوى SQL
+بدلاً من SELECT لكل بند ثم تحميل كل أصناف الطلب وجمعها في Python:
+    - UPDATE ... WHERE request_id = ? AND id IN (...) واحد لكل فئة إجراء
+      (موافقة، ورفض لكل سبب مختلف)
+    - SUM(total) واحد للمبلغ الإجمالي (من فهرس التغطية ix_items_request_status)
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy import func
+from ..models import PurchaseItem
+
+# البنود التي تدخل في المبلغ الإجمالي للطلب
+COUNTED_STATUSES = ("approved", "pending")
+
+
+def apply_item_actions(db, request_id, item_actions, actor_name):
+    """
+    تطبيق [{"id", "action", "reason"}] على بنود طلب بأمر UPDATE لكل فئة إجراء.
+    البنود التي لا تتبع الطلب تُتجاهل، والإجراءات غير المعروفة لا تغيّر شيئاً. لا يعمل commit.
+    البند المكرر في الحمولة يأخذ آخر إجراء له (كما لو طُبقت الإجراءات بالترتيب).
+    Returns:
+        int: عدد الصفوف المحدّثة
+    """
+    last = {}  # id → آخر إجراء له في الحمولة
+    for ia in item_actions:
+        last[ia.get("id")] = ia
+
+    approve_ids = []
+    reject_ids = defaultdict(list)  # سبب الرفض → ids
+    for item_id, ia in last.items():
+        if ia.get("action") == "approve":
+            approve_ids.append(item_id)
+        elif ia.get("action") == "reject":
+            reject_ids[(ia.get("reason") or "").strip()].append(item_id)
+
+    def _update(ids, values):
+        return (
+            db.query(PurchaseItem)
+            .filter(PurchaseItem.request_id == request_id, PurchaseItem.id.in_(ids))
+            .update(values, synchronize_session=False)
+        )
+
+    updated = 0
+    if approve_ids:
+        updated += _update(approve_ids, {
+            PurchaseItem.status: "approved",
+            PurchaseItem.rejection_reason: None,
+            PurchaseItem.rejected_by: None,
+            PurchaseItem.rejection_date: None,
+        })
+    now = datetime.now(timezone.utc)
+    for reason, ids in reject_ids.items():
+        updated += _update(ids, {
+            PurchaseItem.status: "rejected",
+            PurchaseItem.rejection_reason: reason,
+            PurchaseItem.rejected_by: actor_name,
+            PurchaseItem.rejection_date: now,
+        })
+    return updated
+
+
+def request_items_total(db, request_id):
+    """مجموع البنود الموافق عليها/المعلقة — SUM واحد بدلاً من تحميل كل البنود"""
+    total = (
+        db.query(func.coalesce(func.sum(PurchaseItem.total), 0.0))
+        .filter(PurchaseItem.request_id == request_id, PurchaseItem.status.in_(COUNTED_STATUSES))
+        .scalar()
+    )
+    return float(total)
@@ -0,0 +1,309 @@
+"""
+الإشعارات بنمط fan-out-on-read (NOTIFICATIONS_MODE=events)
+في الوضع الافتراضي (rows) يُكتب صف لكل مستلم، و get_request_watchers يعيد كل مستخدمي
+المالية وأمر الصرف مع كل انتقال، فينمو الجدول بـ (المتابعين × الانتقالات) لكل طلب.
+
+هنا:
+    notification_events       حدث واحد لكل تغيير
+    notification_audience     (user, <username>) أو (role, <role>) — يُحل عند القراءة
+    notification_read_state   علامة قراءة مدمجة لكل مستخدم (كل id <= watermark مقروء)
+    notification_read_marks   القراءات الفردية فوق العلامة فقط
+
+التحويل من الوضع rows (ينقل الصفوف على دفعات ثم يحذفها):
+    python -m backend.services.notification_events migrate
+"""
+
+import logging
+from sqlalchemy import and_, func, or_, select, union
+from ..models import (
+    Notification, NotificationEvent, NotificationAudience,
+    NotificationReadState, NotificationReadMark, User,
+)
+from ..utils.watchers import Audience
+from .counters import bump, clear_counter, rebuild_unread_counters, unread_counter_key
+from .user_directory import get_user_directory
+
+logger = logging.getLogger(__name__)
+
+LIST_LIMIT = 100
+
+
+def _audience_rows(recipients):
+    """(kind, value) لجمهور إشعار — Audience أو قائمة أسماء مستخدمين"""
+    if isinstance(recipients, Audience):
+        pairs = [("user", u) for u in recipients.users] + [("role", r) for r in recipients.roles]
+    else:
+        pairs = [("user", u) for u in recipients]
+    return sorted({(kind, value) for kind, value in pairs if value})
+
+
+def add_events(db, notifications):
+    """إضافة حدث لكل إشعار مع جمهوره. لا يعمل commit."""
+    count = 0
+    for n in notifications:
+        audience = _audience_rows(n["recipients"])
+        if not audience:
+            continue
+        db.add(NotificationEvent(
+            request_id=n["request_id"],
+            title=n["title"],
+            message=n["message"],
+            action_type=n["action_type"],
+            actor_username=n.get("actor_username"),
+            actor_role=n.get("actor_role"),
+            note=n.get("note"),
+            audience=[NotificationAudience(kind=kind, value=value) for kind, value in audience],
+        ))
+        count += 1
+    return count
+
+
+def _audience_keys(username, role):
+    keys = [("user", username)]
+    if role:
+        keys.append(("role", role))
+    return keys
+
+
+def _user_created_at(db, username):
+    """وقت إنشاء المستخدم — أحداث دوره الأقدم منه ليست له (كما في expand_audience عند الكتابة)"""
+    return db.query(User.created_at).filter(User.username == username).scalar()
+
+
+def _latest_visible_ids(username, role, limit, since_id=None, role_since=None):
+    """
+    أحدث أرقام الأحداث الموجهة للمستخدم: لكل (kind, value) مسح مرتب تنازلياً لفهرس
+    ix_naud_kind_value_event يتوقف عند limit، ثم دمج الفرعين — الكلفة لا تنمو مع عدد الأحداث.
+    مع since_id يصبح المسح تصاعدياً من since_id: أقدم limit حدث بعده، فلا فجوات بين الصفحات
+    (العميل يطلب الصفحة التالية بأكبر id وصله).
+    role_since: فرع الدور يتخطى الأحداث الأقدم منه (نفس شرط _counted_clause).
+    """
+    order = NotificationAudience.event_id.desc() if since_id is None else NotificationAudience.event_id.asc()
+    branches = []
+    for kind, value in _audience_keys(username, role):
+        branch = select(NotificationAudience.event_id).where(
+            NotificationAudience.kind == kind, NotificationAudience.value == value,
+        )
+        if kind == "role" and role_since is not None:
+            branch = branch.join(
+                NotificationEvent, NotificationEvent.id == NotificationAudience.event_id,
+            ).where(NotificationEvent.created_at >= role_since)
+        if since_id is not None:
+            branch = branch.where(NotificationAudience.event_id > since_id)
+        branches.append(select(branch.order_by(order).limit(limit).subquery().c.event_id))
+    merged = (union(*branches) if len(branches) > 1 else branches[0]).subquery()
+    merged_order = merged.c.event_id.desc() if since_id is None else merged.c.event_id.asc()
+    return select(merged.c.event_id).order_by(merged_order).limit(limit)
+
+
+def _audience_clause(username, role):
+    return or_(*[
+        and_(NotificationAudience.kind == kind, NotificationAudience.value == value)
+        for kind, value in _audience_keys(username, role)
+    ])
+
+
+def _is_visible(db, username, role, event_id):
+    return db.query(NotificationAudience.event_id).filter(
+        NotificationAudience.event_id == event_id, _audience_clause(username, role),
+    ).first() is not None
+
+
+def _counted_clause(db, username, role):
+    """
+    الأحداث التي يزيد لها create_notifications عدّاد unread:<username> — نفس حل expand_audience:
+    بالاسم، أو بالدور المسجل في دليل المستخدمين لمستخدم كان موجوداً عند الحدث.
+    (يتطلب join مع notification_events)
+    """
+    clause = and_(NotificationAudience.kind == "user", NotificationAudience.value == username)
+    if role:
+        by_role = and_(NotificationAudience.kind == "role", NotificationAudience.value == role)
+        created = _user_created_at(db, username)
+        if created is not None:
+            by_role = and_(by_role, NotificationEvent.created_at >= created)
+        clause = or_(clause, by_role)
+    return clause
+
+
+def _was_counted(db, username, event_id):
+    """
+    هل الحدث محسوب في عدّاد المستخدم؟ الدور من دليل المستخدمين لا من الـ JWT (قد يكون أقدم).
+    تغيير دور مستخدم بعد أحداث موجهة لدوره يحتاج rebuild_unread_counters.
+    """
+    user = get_user_directory(db).get(username)
+    return db.query(NotificationAudience.event_id).join(
+        NotificationEvent, NotificationEvent.id == NotificationAudience.event_id,
+    ).filter(
+        NotificationAudience.event_id == event_id, _counted_clause(db, username, user.role if user else None),
+    ).first() is not None
+
+
+def _watermark(db, username):
+    return db.query(NotificationReadState.watermark).filter(
+        NotificationReadState.username == username
+    ).scalar() or 0
+
+
+def list_events(db, username, role, limit=LIST_LIMIT, since_id=None):
+    """
+    أحدث الأحداث للمستخدم بنفس شكل /api/notifications في الوضع rows —
+    أحداث الدور السابقة لإنشاء المستخدم لا تظهر، كما لا تُحسب في عدّاده.
+    """
+    visible = _latest_visible_ids(username, role, limit, since_id, role_since=_user_created_at(db, username))
+    events = (
+        db.query(NotificationEvent)
+        .filter(NotificationEvent.id.in_(visible))
+        .order_by(NotificationEvent.id.desc())  # الأحدث أولاً في الحالتين
+        .all()
+    )
+    watermark = _watermark(db, username)
+    above = [e.id for e in events if e.id > watermark]
+    marked = set()
+    if above:
+        marked = {
+            event_id for (event_id,) in db.query(NotificationReadMark.event_id).filter(
+                NotificationReadMark.username == username, NotificationReadMark.event_id.in_(above),
+            )
+        }
+    return [
+        {
+            "id": e.id,
+            "request_id": e.request_id,
+            "title": e.title,
+            "message": e.message,
+            "action_type": e.action_type,
+            "actor_username": e.actor_username,
+            "actor_role": e.actor_role,
+            "note": e.note,
+            "is_read": e.id <= watermark or e.id in marked,
+            "created_at": e.created_at.isoformat() if e.created_at else None,
+        }
+        for e in events
+    ]
+
+
+def count_unread_events(db, username, role):
+    """
+    عدد الأحداث المحسوبة وغير المقروءة بالعدّ الفعلي — لإعادة بناء عدّاد unread:<username> فقط.
+    role: الدور في دليل المستخدمين.
+    """
+    unread = (
+        select(NotificationAudience.event_id).distinct()
+        .join(NotificationEvent, NotificationEvent.id == NotificationAudience.event_id)
+        .where(
+            _counted_clause(db, username, role),
+            NotificationAudience.event_id > _watermark(db, username),
+            NotificationAudience.event_id.not_in(
+                select(NotificationReadMark.event_id).where(NotificationReadMark.username == username)
+            ),
+        )
+        .subquery()
+    )
+    return db.query(func.count()).select_from(unread).scalar() or 0
+
+
+def mark_event_read(db, username, role, event_id):
+    """
+    تعليم حدث كمقروء وإنقاص عدّاد unread:<username> إذا كان غير مقروء ومحسوباً فيه
+    (_was_counted) — وإلا ينزل العدّاد تحت الصفر أو يُنقص عن أحداث أخرى.
+    False إذا لم يكن الحدث موجهاً للمستخدم. لا يعمل commit.
+    """
+    if not _is_visible(db, username, role, event_id):
+        return False
+    if event_id > _watermark(db, username) and db.get(NotificationReadMark, (username, event_id)) is None:
+        db.add(NotificationReadMark(username=username, event_id=event_id))
+        if _was_counted(db, username, event_id):
+            bump(db, unread_counter_key(username), -1)
+    return True
+
+
+def mark_all_events_read(db, username):
+    """تقديم العلامة إلى آخر حدث وحذف القراءات الفردية تحتها وتصفير العدّاد. لا يعمل commit."""
+    latest = db.query(func.max(NotificationEvent.id)).scalar() or 0
+    state = db.get(NotificationReadState, username)
+    if state is None:
+        db.add(NotificationReadState(username=username, watermark=latest))
+    elif latest > (state.watermark or 0):
+        state.watermark = latest
+    db.query(NotificationReadMark).filter(
+        NotificationReadMark.username == username, NotificationReadMark.event_id <= latest,
+    ).delete(synchronize_session=False)
+    clear_counter(db, unread_counter_key(username))
+    return latest
+
+
+def _group_key(row):
+    return (row.request_id, row.title, row.message, row.action_type,
+            row.actor_username, row.actor_role, row.note, row.created_at)
+
+
+def migrate_rows_to_events(db, batch_size=1000):
+    """
+    تحويل صفوف notifications (صف لكل مستلم) إلى أحداث، على دفعات مع commit لكل دفعة.
+    صفوف الاستدعاء الواحد لـ create_notification متتالية وتشترك في created_at،
+    فتُجمع في حدث واحد جمهوره مستلموها، وحالة is_read تصبح قراءة فردية.
+    في النهاية تُعاد عدّادات unread:* محسوبة من الأحداث (مهما كان NOTIFICATIONS_MODE الحالي).
+    Returns:
+        dict: rows (الصفوف المنقولة)، events (الأحداث الناتجة)
+    """
+    stats = {"rows": 0, "events": 0}
+    while True:
+        rows = db.query(Notification).order_by(Notification.id).limit(batch_size).all()
+        if not rows:
+            break
+        # لا نقسم مجموعة بين دفعتين (إلا إذا كانت الدفعة كلها مجموعة واحدة)
+        if len(rows) == batch_size and _group_key(rows[0]) != _group_key(rows[-1]):
+            last = _group_key(rows[-1])
+            while _group_key(rows[-1]) == last:
+                rows.pop()
+
+        groups = {}
+        for row in rows:
+            groups.setdefault(_group_key(row), []).append(row)
+        for group in groups.values():
+            first = group[0]
+            event = NotificationEvent(
+                request_id=first.request_id, title=first.title, message=first.message,
+                action_type=first.action_type, actor_username=first.actor_username,
+                actor_role=first.actor_role, note=first.note, created_at=first.created_at,
+                audience=[
+                    NotificationAudience(kind="user", value=username)
+                    for username in sorted({r.recipient_username for r in group if r.recipient_username})
+                ],
+            )
+            db.add(event)
+            db.flush()
+            db.add_all(
+                NotificationReadMark(username=username, event_id=event.id)
+                for username in sorted({r.recipient_username for r in group if r.is_read and r.recipient_username})
+            )
+            stats["events"] += 1
+
+        db.query(Notification).filter(
+            Notification.id.in_([r.id for r in rows])
+        ).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+        stats["rows"] += len(rows)
+        logger.info(f"  نقل {stats['rows']} صف → {stats['events']} حدث")
+    rebuild_unread_counters(db, mode="events")
+    db.commit()
+    logger.info(f"✅ تحويل الإشعارات: {stats['rows']} صف → {stats['events']} حدث")
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    from ..database import SessionLocal, Base, engine
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    if sys.argv[1:2] != ["migrate"]:
+        print("الاستخدام: python -m backend.services.notification_events migrate")
+        sys.exit(2)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        result = migrate_rows_to_events(session)
+    finally:
+        session.close()
+    print(f"الصفوف المنقولة: {result['rows']} | الأحداث الناتجة: {result['events']}")
@@ -0,0 +1,195 @@
+"""
+أرشفة الإشعارات المقروءة القديمة (Retention)
+لا شيء يحذف من notifications، فيكبر الجدول وفهرس ix_notif_recipient_read بصفوف مقروءة
+لا ينظر إليها أحد. هنا تُنقل الإشعارات المقروءة الأقدم من NOTIFICATION_RETENTION_DAYS
+إلى notifications_archive على دفعات صغيرة:
+    - كل دفعة (INSERT ... SELECT ثم DELETE بنفس الأرقام) معاملة قصيرة مستقلة،
+      ثم توقف قصير NOTIFICATION_ARCHIVE_PAUSE ليأخذ المعتمدون قفل الكتابة
+    - مؤشر على id يجعل كل دفعة تبدأ من حيث انتهت السابقة (بلا إعادة مسح)
+    - max_batches يحد عمل الاستدعاء الواحد؛ التشغيل التالي يكمل
+
+في الوضع events (NOTIFICATIONS_MODE=events) لا توجد حالة is_read للحدث: يُؤرشف الحدث الأقدم
+من المدة إذا قرأه كل من حُسب له (جمهوره بالاسم + أصحاب الدور الموجودون عند الحدث، النشطون فقط)،
+فينتقل إلى notification_events_archive وتُحذف صفوف جمهوره وقراءاته الفردية. العدّادات لا تتغير
+(الحدث مقروء للجميع).
+
+التشغيل (مثلاً من cron يومياً):
+    python -m backend.services.notification_retention [--days 90] [--batch 500]
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, literal, select
+from .. import config
+from ..models import (
+    Notification, NotificationArchive, NotificationEvent, NotificationAudience,
+    NotificationEventArchive, NotificationReadMark, NotificationReadState, User,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = (
+    "id", "request_id", "recipient_username", "title", "message", "action_type",
+    "actor_username", "actor_role", "note", "is_read", "created_at",
+)
+
+
+def archive_read_notifications(db, days=None, batch_size=None, max_batches=None, pause=None):
+    """
+    نقل الإشعارات المقروءة الأقدم من days يوم إلى الأرشيف، مع commit لكل دفعة.
+    Returns:
+        dict: rows (المنقولة؛ events في الوضع events)، batches، seconds، done (لم يبقَ ما يُؤرشف)
+    """
+    days = config.NOTIFICATION_RETENTION_DAYS if days is None else days
+    batch_size = batch_size or config.NOTIFICATION_ARCHIVE_BATCH
+    pause = config.NOTIFICATION_ARCHIVE_PAUSE if pause is None else pause
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    if config.NOTIFICATIONS_MODE == "events":
+        return _archive_read_events(db, days, cutoff, batch_size, max_batches, pause)
+
+    stats = {"rows": 0, "batches": 0, "seconds": 0.0, "done": False}
+    start = time.perf_counter()
+    last_id = 0
+    while max_batches is None or stats["batches"] < max_batches:
+        ids = [
+            nid for (nid,) in db.query(Notification.id)
+            .filter(
+                Notification.id > last_id,
+                Notification.is_read.is_(True),
+                Notification.created_at < cutoff,
+            )
+            .order_by(Notification.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            stats["done"] = True
+            break
+
+        now = datetime.now(timezone.utc)
+        db.execute(insert(NotificationArchive).from_select(
+            list(ARCHIVE_COLUMNS) + ["archived_at"],
+            select(*[getattr(Notification, c) for c in ARCHIVE_COLUMNS], literal(now, NotificationArchive.archived_at.type))
+            .where(Notification.id.in_(ids)),
+        ))
+        db.query(Notification).filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+        last_id = ids[-1]
+        stats["rows"] += len(ids)
+        stats["batches"] += 1
+        if pause:
+            time.sleep(pause)
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"🗄️ أرشفة الإشعارات: {stats['rows']} صف في {stats['batches']} دفعة "
+        f"خلال {stats['seconds']} ث (الأقدم من {days} يوم)"
+    )
+    return stats
+
+
+def _unread_by_someone(event, audience, members, watermarks, marks):
+    """هل بقي مستلم محسوب (نشط) لم يقرأ الحدث؟"""
+    for kind, value in audience:
+        if kind == "user":
+            usernames = [value] if value in members["active"] else []
+        else:
+            usernames = [
+                username for username, created in members["by_role"].get(value, ())
+                if created is None or event.created_at is None or event.created_at >= created
+            ]
+        for username in usernames:
+            if watermarks.get(username, 0) < event.id and (username, event.id) not in marks:
+                return True
+    return False
+
+
+def _archive_read_events(db, days, cutoff, batch_size, max_batches, pause):
+    """أرشفة أحداث الوضع events — نفس الدفعات والمؤشر على id"""
+    members = {"active": set(), "by_role": {}}
+    for username, role, created in db.query(User.username, User.role, User.created_at).filter(User.is_active.is_(True)):
+        members["active"].add(username)
+        members["by_role"].setdefault(role, []).append((username, created))
+    watermarks = dict(db.query(NotificationReadState.username, NotificationReadState.watermark))
+
+    stats = {"events": 0, "batches": 0, "seconds": 0.0, "done": False}
+    start = time.perf_counter()
+    last_id = 0
+    while max_batches is None or stats["batches"] < max_batches:
+        events = (
+            db.query(NotificationEvent)
+            .filter(NotificationEvent.id > last_id, NotificationEvent.created_at < cutoff)
+            .order_by(NotificationEvent.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not events:
+            stats["done"] = True
+            break
+
+        ids = [e.id for e in events]
+        audience = {}
+        for event_id, kind, value in db.query(
+            NotificationAudience.event_id, NotificationAudience.kind, NotificationAudience.value,
+        ).filter(NotificationAudience.event_id.in_(ids)):
+            audience.setdefault(event_id, []).append((kind, value))
+        marks = set(db.query(NotificationReadMark.username, NotificationReadMark.event_id).filter(
+            NotificationReadMark.event_id.in_(ids)
+        ))
+        read = [
+            e for e in events
+            if not _unread_by_someone(e, audience.get(e.id, ()), members, watermarks, marks)
+        ]
+
+        if read:
+            now = datetime.now(timezone.utc)
+            read_ids = [e.id for e in read]
+            db.execute(insert(NotificationEventArchive), [
+                {
+                    "id": e.id, "request_id": e.request_id, "title": e.title, "message": e.message,
+                    "action_type": e.action_type, "actor_username": e.actor_username,
+                    "actor_role": e.actor_role, "note": e.note, "created_at": e.created_at,
+                    "audience": ",".join(f"{kind}:{value}" for kind, value in sorted(audience.get(e.id, ()))),
+                    "archived_at": now,
+                }
+                for e in read
+            ])
+            db.query(NotificationReadMark).filter(NotificationReadMark.event_id.in_(read_ids)).delete(synchronize_session=False)
+            db.query(NotificationAudience).filter(NotificationAudience.event_id.in_(read_ids)).delete(synchronize_session=False)
+            db.query(NotificationEvent).filter(NotificationEvent.id.in_(read_ids)).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+
+        last_id = ids[-1]
+        stats["events"] += len(read)
+        stats["batches"] += 1
+        if pause:
+            time.sleep(pause)
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"🗄️ أرشفة أحداث الإشعارات: {stats['events']} حدث في {stats['batches']} دفعة "
+        f"خلال {stats['seconds']} ث (الأقدم من {days} يوم)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    from ..database import SessionLocal, Base, engine
+
+    parser = argparse.ArgumentParser(description="أرشفة الإشعارات المقروءة القديمة")
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument("--batch", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        result = archive_read_notifications(session, days=args.days, batch_size=args.batch)
+    finally:
+        session.close()
+    moved = f"الصفوف المنقولة: {result['rows']}" if "rows" in result else f"الأحداث المنقولة: {result['events']}"
+    print(f"{moved} | الدفعات: {result['batches']} | الزمن: {result['seconds']} ث")
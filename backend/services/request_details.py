@@ -0,0 +1,158 @@
+"""
+تفاصيل الطلب + النسخ المجمّدة (Request Snapshots)
+الطلب في حالة completed أو rejected لا يتغير عملياً، لكن بناء تفاصيله يكلّف
+تحميل الأصناف والتواقيع الثلاثة واستعلام approval_history في كل مرة.
+عند دخول الحالة النهائية نحفظ JSON التفاصيل مضغوطاً (gzip) في request_snapshots،
+ويُخدَم /api/requests/<id> منه مباشرة. النسخة تُحذف إذا أعادت المشتريات فتح الطلب.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+from ..models import PurchaseRequest, ApprovalHistory, RequestSnapshot
+from .signatures import ref_hash
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "rejected")
+
+
+def build_request_details(db, pr):
+    """بناء dict تفاصيل الطلب (الأصناف + بيانات الموافقة + التواقيع + تواريخ الاعتماد)"""
+    items = [{
+        "id": item.id, "item_name": item.item_name,
+        "specification": item.specification, "unit": item.unit,
+        "quantity": item.quantity, "price": item.price,
+        "total": item.total, "status": item.status or "pending",
+        "rejection_reason": item.rejection_reason,
+        "rejected_by": item.rejected_by
+    } for item in pr.items]
+
+    approval_dates = {}
+    histories = db.query(ApprovalHistory).filter(
+        ApprovalHistory.request_id == pr.id,
+        ApprovalHistory.action.in_(["approve", "auto-approve"])
+    ).order_by(ApprovalHistory.created_at.desc()).all()
+    for h in histories:
+        role_key = (h.actor_role or "").lower()
+        if role_key and role_key not in approval_dates:
+            approval_dates[role_key] = h.created_at.isoformat() if h.created_at else None
+
+    # التواقيع مراجع إلى signature_blobs: التفاصيل (والنسخ المجمّدة) تحمل البصمة فقط،
+    # والصورة تُجلب من /api/signatures/<hash> — نسخة واحدة مخزنة مؤقتاً لكل توقيع
+    refs = {
+        "manager": pr.manager_signature,
+        "finance": pr.finance_signature,
+        "disbursement": pr.disbursement_signature,
+    }
+
+    return {
+        "id": pr.id,
+        "order_number": pr.order_number,
+        "requester": pr.requester,
+        "department": pr.department,
+        "delivery_address": pr.delivery_address,
+        "delivery_date": pr.delivery_date,
+        "project_code": pr.project_code,
+        "currency": pr.currency,
+        "total_amount": float(pr.total_amount or 0.0),
+        "status": pr.status,
+        "current_stage": pr.current_stage,
+        "next_role": pr.next_role,
+        "created_by": pr.created_by,
+        "created_at": pr.created_at.isoformat() if pr.created_at else None,
+        "updated_at": pr.updated_at.isoformat() if pr.updated_at else None,
+        "version": pr.version,
+        "date": str(pr.created_at.date()) if pr.created_at else "",
+        "items": items,
+        "approval_data": {
+            "requester_name": pr.requester_name,
+            "requester_position": pr.requester_position,
+            "manager_name": pr.manager_name,
+            "manager_position": pr.manager_position,
+            "finance_name": pr.finance_name,
+            "finance_position": pr.finance_position,
+            "disbursement_name": pr.disbursement_name,
+            "disbursement_position": pr.disbursement_position,
+            "requester_date": pr.requester_date,
+            "manager_date": pr.manager_date,
+            "finance_date": pr.finance_date,
+            "disbursement_date": pr.disbursement_date
+        },
+        "signature_refs": {role: ref_hash(ref) for role, ref in refs.items()},
+        "approval_dates": approval_dates
+    }
+
+
+def freeze_request(db, pr):
+    """
+    كتابة (أو استبدال) النسخة المجمّدة لطلب منتهٍ. لا يعمل commit.
+    يعمل flush أولاً ليظهر updated_at وسجل الإجراء الحالي في التفاصيل.
+    """
+    db.flush()
+    body = json.dumps(build_request_details(db, pr), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = gzip.compress(body, mtime=0)
+    etag = hashlib.sha1(body).hexdigest()
+    snapshot = db.get(RequestSnapshot, pr.id)
+    if snapshot is None:
+        db.add(RequestSnapshot(request_id=pr.id, status=pr.status, etag=etag, payload=payload))
+    else:
+        snapshot.status, snapshot.etag, snapshot.payload = pr.status, etag, payload
+    return snapshot
+
+
+def sync_snapshot(db, pr):
+    """
+    مزامنة النسخة المجمّدة مع حالة الطلب (يُستدعى قبل commit كل تغيير على طلب):
+      - حالة نهائية → تجميد/إعادة تجميد
+      - غير ذلك (إعادة فتح) → حذف النسخة إن وُجدت
+    """
+    if pr.status in TERMINAL_STATUSES:
+        freeze_request(db, pr)
+    else:
+        db.query(RequestSnapshot).filter(RequestSnapshot.request_id == pr.id).delete(synchronize_session=False)
+
+
+def drop_snapshots(db):
+    """
+    حذف كل النسخ المجمّدة بعد إصلاح بـ SQL مباشر ثم تجميد الطلبات المنتهية من جديد
+    (القراءة لا تكتب — بدون إعادة التجميد تُبنى تفاصيلها في كل طلب). لا يعمل commit.
+    """
+    db.query(RequestSnapshot).delete(synchronize_session=False)
+    freeze_terminal_requests(db)
+
+
+def snapshot_etag(db, request_id):
+    """ETag النسخة المجمّدة (بحث بالمفتاح الأساسي) — None إذا لم توجد"""
+    return db.query(RequestSnapshot.etag).filter(RequestSnapshot.request_id == request_id).scalar()
+
+
+def snapshot_payload(db, request_id):
+    """محتوى النسخة المجمّدة (JSON مضغوط gzip)"""
+    return db.query(RequestSnapshot.payload).filter(RequestSnapshot.request_id == request_id).scalar()
+
+
+def freeze_terminal_requests(db, batch_size=500):
+    """
+    تجميد الطلبات المنتهية التي ليس لها نسخة (أُنهيت قبل وجود النسخ، أو بعد drop_snapshots).
+    يعمل في ترحيل أو داخل معاملة كتابة — لا عند القراءة. لا يعمل commit.
+    Returns:
+        int: عدد الطلبات المجمّدة
+    """
+    frozen = 0
+    while True:
+        batch = (
+            db.query(PurchaseRequest)
+            .outerjoin(RequestSnapshot, RequestSnapshot.request_id == PurchaseRequest.id)
+            .filter(PurchaseRequest.status.in_(TERMINAL_STATUSES), RequestSnapshot.request_id.is_(None))
+            .order_by(PurchaseRequest.id)
+            .limit(batch_size)
+            .all()
+        )
+        for pr in batch:
+            freeze_request(db, pr)
+        db.flush()
+        frozen += len(batch)
+        if len(batch) < batch_size:
+            return frozen
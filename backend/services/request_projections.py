@@ -0,0 +1,134 @@
+"""
+إسقاط الأعمدة لقوائم الطلبات (Column Projections)
+القوائم تحتاج ~15 عموداً فقط، بينما تحميل PurchaseRequest كاملاً يجلب
+أعمدة التواقيع (base64 بعشرات الكيلوبايت لكل عمود).
+هنا نختار الأعمدة المطلوبة فقط كـ Row خفيفة (بدون ORM identity map)،
+وتبقى دوال التحويل إلى dict كما هي لأن Row يدعم الوصول بالخاصية (r.id).
+"""
+
+from collections import defaultdict
+from sqlalchemy import and_, func, or_
+from ..models import PurchaseRequest, PurchaseItem
+
+# أعمدة ملخص الطلب — تطابق _serialize_request_summary
+SUMMARY_COLUMNS = (
+    PurchaseRequest.id,
+    PurchaseRequest.order_number,
+    PurchaseRequest.requester,
+    PurchaseRequest.department,
+    PurchaseRequest.status,
+    PurchaseRequest.current_stage,
+    PurchaseRequest.next_role,
+    PurchaseRequest.total_amount,
+    PurchaseRequest.currency,
+    PurchaseRequest.created_by,
+    PurchaseRequest.created_at,
+    PurchaseRequest.delivery_date,
+    PurchaseRequest.delivery_address,
+    PurchaseRequest.project_code,
+    PurchaseRequest.version,
+)
+
+# أعمدة لوحة المشرف
+ADMIN_COLUMNS = (
+    PurchaseRequest.id,
+    PurchaseRequest.order_number,
+    PurchaseRequest.requester,
+    PurchaseRequest.department,
+    PurchaseRequest.delivery_date,
+    PurchaseRequest.currency,
+    PurchaseRequest.total_amount,
+    PurchaseRequest.status,
+)
+
+# أعمدة قائمة المشتريات
+PROCUREMENT_COLUMNS = (
+    PurchaseRequest.id,
+    PurchaseRequest.order_number,
+    PurchaseRequest.requester,
+    PurchaseRequest.department,
+    PurchaseRequest.status,
+    PurchaseRequest.procurement_status,
+    PurchaseRequest.procurement_note,
+    PurchaseRequest.procurement_assigned_to,
+    PurchaseRequest.total_amount,
+    PurchaseRequest.currency,
+    PurchaseRequest.delivery_date,
+    PurchaseRequest.delivery_address,
+    PurchaseRequest.project_code,
+    PurchaseRequest.created_at,
+    PurchaseRequest.updated_at,
+    PurchaseRequest.version,
+)
+
+# أعمدة الأصناف (بدون rejection_date — غير مستخدم في القوائم)
+ITEM_COLUMNS = (
+    PurchaseItem.id,
+    PurchaseItem.request_id,
+    PurchaseItem.item_name,
+    PurchaseItem.specification,
+    PurchaseItem.unit,
+    PurchaseItem.quantity,
+    PurchaseItem.price,
+    PurchaseItem.total,
+    PurchaseItem.status,
+    PurchaseItem.rejection_reason,
+    PurchaseItem.rejected_by,
+)
+
+
+def project_requests(db, columns=SUMMARY_COLUMNS, *extra):
+    """استعلام طلبات يُرجع Row بالأعمدة المحددة فقط (+ أعمدة إضافية اختيارية)"""
+    return db.query(*columns, *extra).select_from(PurchaseRequest)
+
+
+# حد معاملات IN في أمر واحد — أقل بكثير من SQLITE_MAX_VARIABLE_NUMBER
+IN_CHUNK_SIZE = 500
+
+
+def load_items_by_request(db, request_ids, columns=ITEM_COLUMNS):
+    """
+    تحميل أصناف عدة طلبات (WHERE request_id IN ...) — أمر لكل IN_CHUNK_SIZE طلب،
+    فتبقى القائمة الطويلة (تصدير/طابور كبير) ضمن حد معاملات SQLite.
+    Returns:
+        dict: request_id → list من Row مرتبة حسب id
+    """
+    grouped = defaultdict(list)
+    ids = sorted(set(request_ids))
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        rows = (
+            db.query(*columns)
+            .filter(PurchaseItem.request_id.in_(ids[start:start + IN_CHUNK_SIZE]))
+            .order_by(PurchaseItem.id)
+        )
+        for row in rows:
+            grouped[row.request_id].append(row)
+    return grouped
+
+
+def list_validator(db, *criteria):
+    """
+    مُتحقِّق رخيص لقائمة طلبات (لـ ETag): (العدد، آخر updated_at، أكبر id).
+    يُنفَّذ من فهرس التغطية ix_pr_status_department_updated دون قراءة الجدول
+    ما دامت الشروط على status/department فقط.
+    """
+    row = (
+        db.query(func.count(), func.max(PurchaseRequest.updated_at), func.max(PurchaseRequest.id))
+        .filter(*criteria)
+        .one()
+    )
+    return tuple(row)
+
+
+def queue_status_criterion(keys):
+    """
+    شرط مكافئ لمفاتيح صندوق العمل (stage, department) لكن على purchase_requests
+    (pending_<stage>) — ليُحسب مُتحقِّق الطابور من فهرس التغطية.
+    """
+    clauses = []
+    for stage, department in keys:
+        clause = PurchaseRequest.status == f"pending_{stage}"
+        if department is not None:
+            clause = and_(clause, PurchaseRequest.department == department)
+        clauses.append(clause)
+    return or_(*clauses)
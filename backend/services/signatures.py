@@ -0,0 +1,145 @@
+"""
+مخزن التواقيع بعنوان المحتوى (Content-Addressed Signature Store)
+كانت صورة التوقيع (base64 بعشرات الكيلوبايت) تُنسخ في purchase_requests.*_signature
+وفي approval_history.signature مع كل موافقة وموافقة تلقائية.
+الآن تُخزَّن الصورة مرة واحدة في signature_blobs بمفتاح sha256،
+وتحمل الأعمدة المرجع "sha256:<hex>" فقط، وتفاصيل الطلب البصمة فقط (signature_refs)
+والصورة من /api/signatures/<hex>. القيم القديمة (base64 مباشرة) يحوّلها ترحيل المخطط 4.
+
+التحويل لقاعدة موجودة:
+    python -m backend.services.signatures [--vacuum]
+"""
+
+import base64
+import hashlib
+import logging
+import re
+from ..models import PurchaseRequest, ApprovalHistory, SignatureBlob
+
+logger = logging.getLogger(__name__)
+
+REF_PREFIX = "sha256:"
+
+# الأعمدة التي تحمل مراجع تواقيع (User.signature يبقى القيمة الأصلية — نسخة واحدة لكل مستخدم)
+SIGNATURE_COLUMNS = (
+    PurchaseRequest.manager_signature,
+    PurchaseRequest.finance_signature,
+    PurchaseRequest.disbursement_signature,
+    ApprovalHistory.signature,
+)
+
+_DATA_URL = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+);base64,(?P<data>.*)$", re.DOTALL)
+
+
+def is_ref(value):
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+def ref_hash(value):
+    """الجزء hex من المرجع، أو None إذا لم تكن القيمة مرجعاً"""
+    return value[len(REF_PREFIX):] if is_ref(value) else None
+
+
+def store_signature(db, value):
+    """
+    تخزين توقيع (إن لم يكن موجوداً) وإرجاع مرجعه "sha256:<hex>".
+    القيم الفارغة والمراجع الجاهزة تُرجع كما هي. لا يعمل commit.
+    """
+    return _store(db, value)[0]
+
+
+def _store(db, value):
+    """(المرجع، هل أُضيف توقيع جديد)"""
+    if not value or is_ref(value):
+        return value, False
+    digest = hashlib.sha256(value.encode("utf-8")).hexdigest()
+    created = db.get(SignatureBlob, digest) is None
+    if created:
+        db.add(SignatureBlob(hash=digest, data=value, size=len(value)))
+        db.flush()  # autoflush معطّل: نفس التوقيع قد يُخزَّن مرتين في نفس المعاملة (auto-skip)
+    return REF_PREFIX + digest, created
+
+
+def decode_signature(data):
+    """
+    (mimetype, bytes) لعرض التوقيع كصورة.
+    data URL → الصورة المفكوكة، غير ذلك → النص كما هو.
+    """
+    match = _DATA_URL.match(data)
+    if match:
+        try:
+            return match.group("mime"), base64.b64decode(match.group("data"))
+        except ValueError:
+            pass
+    return "text/plain", data.encode("utf-8")
+
+
+def migrate_signatures(db, batch_size=500):
+    """
+    تحويل التواقيع المضمّنة (base64) في الأعمدة إلى مراجع، على دفعات مع commit لكل دفعة.
+    Returns:
+        dict: rows (الصفوف المحوّلة)، blobs (التواقيع الفريدة الجديدة)،
+              bytes_before / bytes_after (حجم الأعمدة + المخزن)، reclaimed
+    """
+    stats = {"rows": 0, "blobs": 0, "bytes_before": 0, "bytes_after": 0}
+    for column in SIGNATURE_COLUMNS:
+        model = column.class_
+        last_id = 0
+        while True:
+            rows = (
+                db.query(model.id, column)
+                .filter(model.id > last_id, column.isnot(None), column != "", ~column.startswith(REF_PREFIX))
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for row_id, value in rows:
+                ref, created = _store(db, value)
+                if created:
+                    stats["blobs"] += 1
+                    stats["bytes_after"] += len(value)
+                db.query(model).filter(model.id == row_id).update({column: ref}, synchronize_session=False)
+                stats["rows"] += 1
+                stats["bytes_before"] += len(value)
+                stats["bytes_after"] += len(ref)
+            db.commit()
+            last_id = rows[-1][0]
+            logger.info(f"  {model.__tablename__}.{column.key}: حتى id={last_id}")
+    stats["reclaimed"] = stats["bytes_before"] - stats["bytes_after"]
+    logger.info(
+        f"✅ تحويل التواقيع: {stats['rows']} صف، {stats['blobs']} توقيع فريد، "
+        f"المساحة المستعادة ≈ {stats['reclaimed'] / 1024:.1f} KB"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    from sqlalchemy import text
+    from ..database import SessionLocal, Base, engine
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    Base.metadata.create_all(bind=engine)
+    db_path = engine.url.database
+    size_before = os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None
+
+    session = SessionLocal()
+    try:
+        result = migrate_signatures(session)
+    finally:
+        session.close()
+
+    if "--vacuum" in sys.argv and result["rows"]:
+        # VACUUM يعيد الصفحات المحررة لنظام الملفات (يحتاج مساحة مؤقتة بحجم القاعدة)
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+        if size_before is not None:
+            size_after = os.path.getsize(db_path)
+            print(f"حجم الملف: {size_before / 1048576:.1f} MB → {size_after / 1048576:.1f} MB")
+    print(
+        f"الصفوف المحوّلة: {result['rows']} | تواقيع فريدة جديدة: {result['blobs']} | "
+        f"المساحة المستعادة (منطقياً): {result['reclaimed'] / 1048576:.2f} MB"
+    )
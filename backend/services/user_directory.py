@@ -0,0 +1,105 @@
+"""
+دليل المستخدمين (User Directory) — نسخة في الذاكرة من جدول users
+مسار الموافقة كان يستعلم عن نفس صف User حتى أربع مرات (الدور الفعلي، فحص القسم،
+اسم المعتمد، التخطي التلقائي) ثم ثلاث مرات أخرى لحساب المتابعين.
+هنا نحمّل المستخدمين مرة واحدة لكل "نسخة" ونفهرسهم بالاسم والدور والقسم.
+
+النسخة = (عدّاد rev:users في workflow_counters، عدد المستخدمين، أكبر id)
+تُقرأ باستعلام واحد مرة لكل طلب HTTP (تُحفظ في flask.g)، فيلاحظ كل worker
+أي تعديل من عملية أخرى. كل تعديل على المستخدمين أو تواقيعهم يستدعي invalidate_users().
+"""
+
+import logging
+from collections import defaultdict, namedtuple
+from flask import g, has_request_context
+from sqlalchemy import func, select
+from ..models import User, WorkflowCounter
+from .counters import bump
+
+logger = logging.getLogger(__name__)
+
+REV_KEY = "rev:users"
+
+DirectoryUser = namedtuple("DirectoryUser", "id username full_name role department is_active")
+
+
+class UserDirectory:
+    """فهارس المستخدمين لنسخة واحدة — للقراءة فقط"""
+
+    def __init__(self, version, users):
+        self.version = version
+        self.by_username = {u.username: u for u in users}
+        self.by_role = defaultdict(list)
+        self._managers = {}
+        for u in users:  # مرتبة حسب id — أول مدير للقسم كما في .first()
+            self.by_role[u.role].append(u)
+            if u.role == "manager":
+                self._managers.setdefault(u.department, u)
+
+    def get(self, username):
+        return self.by_username.get(username)
+
+    def full_name(self, username):
+        """الاسم الكامل أو اسم المستخدم نفسه إذا لم يوجد"""
+        user = self.get(username)
+        return (user.full_name if user else None) or username
+
+    def usernames_with_role(self, role):
+        return [u.username for u in self.by_role.get(role, ())]
+
+    def department_manager(self, department):
+        return self._managers.get(department)
+
+
+_cached = None  # آخر نسخة محمّلة في هذه العملية
+
+
+def _current_version(db):
+    """النسخة الحالية باستعلام واحد (عدّاد التعديلات + عدد المستخدمين + أكبر id)"""
+    row = db.execute(select(
+        select(WorkflowCounter.value).where(WorkflowCounter.key == REV_KEY).scalar_subquery(),
+        select(func.count(User.id)).scalar_subquery(),
+        select(func.max(User.id)).scalar_subquery(),
+    )).one()
+    return tuple(row)
+
+
+def _load(db, version):
+    users = [
+        DirectoryUser(*row)
+        for row in db.query(
+            User.id, User.username, User.full_name, User.role, User.department, User.is_active,
+        ).order_by(User.id)
+    ]
+    logger.debug(f"تحميل دليل المستخدمين: {len(users)} مستخدم (النسخة {version})")
+    return UserDirectory(version, users)
+
+
+def get_user_directory(db):
+    """
+    دليل المستخدمين الحالي. داخل طلب HTTP يُتحقق من النسخة مرة واحدة فقط،
+    وخارجه (سكربتات/اختبارات) مع كل استدعاء.
+    """
+    global _cached
+    if has_request_context():
+        directory = g.get("user_directory")
+        if directory is not None:
+            return directory
+
+    version = _current_version(db)
+    directory = _cached
+    if directory is None or directory.version != version:
+        directory = _cached = _load(db, version)
+
+    if has_request_context():
+        g.user_directory = directory
+    return directory
+
+
+def invalidate_users(db):
+    """
+    رفع نسخة الدليل بعد تعديل مستخدم/توقيع (داخل نفس المعاملة). لا يعمل commit.
+    """
+    bump(db, REV_KEY)
+    if has_request_context():
+        g.pop("user_directory", None)
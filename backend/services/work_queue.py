@@ -0,0 +1,152 @@
+"""
+صندوق العمل لكل دور/قسم (Work Queue)
+جدول work_queue يحوي صفاً لكل طلب بانتظار إجراء: (stage, department).
+- sync_work_queue: تُستدعى بعد أي تغيير على pr.status داخل نفس المعاملة
+- queue_keys_for: تحدد المفاتيح (stage, department) التي يراها المستخدم
+- rebuild_work_queue: إعادة بناء الجدول بالكامل من purchase_requests (للاستعادة)
+
+التشغيل اليدوي لإعادة البناء (الصندوق + جميع العدّادات):
+    python -m backend.services.work_queue
+"""
+
+import logging
+from sqlalchemy import and_, or_, case, insert, select
+from ..models import PurchaseRequest, WorkQueueEntry
+from .counters import (
+    bump, queue_counter_keys, rebuild_queue_counters, rebuild_user_counters, rebuild_unread_counters,
+)
+from ..utils.live_events import mark_changed
+
+logger = logging.getLogger(__name__)
+
+# الحالة → المرحلة في صندوق العمل (الحالات المنتهية لا تظهر)
+STATUS_TO_QUEUE_STAGE = {
+    "pending_manager": "manager",
+    "pending_finance": "finance",
+    "pending_disbursement": "disbursement",
+    "pending_procurement": "procurement",
+}
+
+
+def sync_work_queue(db, pr):
+    """
+    مزامنة صف الطلب في صندوق العمل مع حالته الحالية.
+    يجب استدعاؤها بعد تعديل pr.status وقبل commit (pr.id يجب أن يكون معروفاً).
+    Returns:
+        (old_stage, new_stage) — None يعني غير موجود في الصندوق
+    """
+    new_stage = STATUS_TO_QUEUE_STAGE.get(pr.status)
+    entry = db.get(WorkQueueEntry, pr.id)
+    old_stage = entry.stage if entry else None
+    if old_stage == new_stage:
+        return old_stage, new_stage
+    mark_changed(db, "queue")  # تلميح للوحات المفتوحة بعد commit
+
+    # عدّادات حجم الصندوق تتحرك مع الصف
+    if old_stage:
+        for key in queue_counter_keys(old_stage, entry.department):
+            bump(db, key, -1)
+    if new_stage:
+        for key in queue_counter_keys(new_stage, pr.department):
+            bump(db, key, 1)
+
+    if new_stage is None:
+        if entry:
+            db.delete(entry)
+    elif entry:
+        entry.stage = new_stage
+        entry.department = pr.department
+    else:
+        db.add(WorkQueueEntry(request_id=pr.id, stage=new_stage, department=pr.department))
+
+    return old_stage, new_stage
+
+
+def queue_keys_for(role, username, department):
+    """
+    مفاتيح صندوق العمل التي يراها المستخدم: list من (stage, department أو None لكل الأقسام).
+    تطابق قواعد /api/my/queue (بما فيها المستخدمين ذوي الأدوار المزدوجة).
+    """
+    if role == "admin":
+        return [("manager", None), ("finance", None), ("disbursement", None)]
+    if role == "manager":
+        if not department:
+            return []
+        if username == "manager_finance":
+            # المدير المالي: طلبات إدارته + جميع طلبات المالية
+            return [("manager", "مالية"), ("finance", None)]
+        if username == "manager_exec":
+            # آمر الصرف: طلبات إدارته + جميع طلبات أمر الصرف
+            return [("manager", department), ("disbursement", None)]
+        return [("manager", department)]
+    # finance / disbursement / procurement: كل طلبات مرحلتهم
+    return [(role, None)]
+
+
+def queue_criterion(keys):
+    """تحويل مفاتيح الصندوق إلى شرط WHERE على work_queue"""
+    clauses = []
+    for stage, department in keys:
+        if department is None:
+            clauses.append(WorkQueueEntry.stage == stage)
+        else:
+            clauses.append(and_(WorkQueueEntry.stage == stage, WorkQueueEntry.department == department))
+    return or_(*clauses)
+
+
+def rebuild_work_queue(db):
+    """
+    إعادة بناء صندوق العمل بالكامل من purchase_requests (لا يعمل commit).
+    Returns:
+        عدد الصفوف بعد إعادة البناء
+    """
+    stage_expr = case(
+        *[(PurchaseRequest.status == status, stage) for status, stage in STATUS_TO_QUEUE_STAGE.items()]
+    )
+    db.query(WorkQueueEntry).delete(synchronize_session=False)
+    result = db.execute(
+        insert(WorkQueueEntry).from_select(
+            ["request_id", "stage", "department"],
+            select(PurchaseRequest.id, stage_expr, PurchaseRequest.department)
+            .where(PurchaseRequest.status.in_(list(STATUS_TO_QUEUE_STAGE))),
+        )
+    )
+    count = result.rowcount
+    rebuild_queue_counters(db)
+    logger.info(f"🔁 إعادة بناء صندوق العمل: {count} طلب")
+    return count
+
+
+def ensure_work_queue(db):
+    """
+    تعبئة صندوق العمل إذا كان فارغاً بينما توجد طلبات نشطة
+    (قاعدة بيانات قديمة قبل إضافة الجدول). لا يعمل commit.
+    """
+    has_entries = db.query(WorkQueueEntry.request_id).first() is not None
+    if has_entries:
+        return False
+    has_active = (
+        db.query(PurchaseRequest.id)
+        .filter(PurchaseRequest.status.in_(list(STATUS_TO_QUEUE_STAGE)))
+        .first()
+        is not None
+    )
+    if not has_active:
+        return False
+    rebuild_work_queue(db)
+    return True
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal, Base, engine
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        rebuild_work_queue(session)
+        rebuild_user_counters(session)
+        rebuild_unread_counters(session)
+        session.commit()
+    finally:
+        session.close()
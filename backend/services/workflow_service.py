@@ -4,7 +4,8 @@
 """
 
 import logging
-from ..models import PurchaseRequest, ApprovalHistory, User
+from ..models import PurchaseRequest, ApprovalHistory
+from .user_directory import get_user_directory
 
 logger = logging.getLogger(__name__)
 
@@ -77,8 +78,7 @@ def get_effective_role(actor_user, actor_role, current_status, db):
     if actor_role == "admin":
         return STATUS_TO_REQUIRED_ROLE.get(current_status, actor_role)
 
-    user = db.query(User).filter(User.username == actor_user).first()
-    if not user:
+    if get_user_directory(db).get(actor_user) is None:
         return actor_role
 
     if actor_user == "manager_finance" and current_status == "pending_finance":
@@ -113,7 +113,7 @@ def can_act_on_request(actor_user, actor_role, pr, db):
 
     # التحقق من القسم (للمديرين فقط في مرحلة pending_manager)
     if current_status == "pending_manager" and actor_role == "manager":
-        user = db.query(User).filter(User.username == actor_user).first()
+        user = get_user_directory(db).get(actor_user)
         user_dept = user.department if user else None
 
         if actor_user not in ("manager_finance", "manager_exec"):
@@ -135,8 +135,7 @@ def auto_skip_if_same_approver(db, pr, actor_user, signature, today_str):
 
     # مدير المالية وافق كمدير مباشر → تخطي المالية
     if current == "pending_finance" and actor_user == "manager_finance":
-        user = db.query(User).filter(User.username == actor_user).first()
-        user_full_name = user.full_name if user else actor_user
+        user_full_name = get_user_directory(db).full_name(actor_user)
 
         pr.finance_name = user_full_name
         pr.finance_date = today_str
@@ -155,8 +154,7 @@ def auto_skip_if_same_approver(db, pr, actor_user, signature, today_str):
 
     # آمر الصرف وافق كمدير مباشر/مالي → تخطي أمر الصرف
     if pr.status == "pending_disbursement" and actor_user == "manager_exec":
-        user = db.query(User).filter(User.username == actor_user).first()
-        user_full_name = user.full_name if user else actor_user
+        user_full_name = get_user_directory(db).full_name(actor_user)
 
         pr.disbursement_name = user_full_name
         pr.disbursement_date = today_str
@@ -6,7 +6,7 @@ import logging
 import datetime
 from functools import wraps
 from flask import request, jsonify
-from ..config import JWT_SECRET_KEY, JWT_EXPIRY_HOURS
+from ..config import JWT_SECRET_KEY, JWT_EXPIRY_HOURS, LIVE_STREAM_TOKEN_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -45,14 +45,35 @@ def create_token(user_id, username, role, department=None):
         return None
 
 
-def verify_token(token):
-    """التحقق من صحة الـ token — يُرجع payload أو None"""
+# نطاق توكن البث: يُقبل في ?token= لـ /api/notifications/stream فقط، ولا يُقبل في أي مكان آخر
+STREAM_SCOPE = "stream"
+
+
+def create_stream_token(user):
+    """توكن قصير العمر (LIVE_STREAM_TOKEN_SECONDS) لفتح البث — من payload توكن الجلسة"""
+    if jwt is None:
+        return None
+    payload = {k: user.get(k) for k in ("user_id", "username", "role", "department")}
+    payload["scope"] = STREAM_SCOPE
+    payload["exp"] = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=LIVE_STREAM_TOKEN_SECONDS)
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+
+def verify_token(token, scope=None):
+    """
+    التحقق من صحة الـ token — يُرجع payload أو None.
+    scope: النطاق المطلوب (None = توكن جلسة عادي)؛ توكن بنطاق آخر يُرفض
+    """
     if jwt is None:
         return None
     if not token or token in ("null", "undefined"):
         return None
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        if payload.get("scope") != scope:
+            logger.debug("Token بنطاق غير مناسب")
+            return None
+        return payload
     except jwt.ExpiredSignatureError:
         logger.debug("Token منتهي الصلاحية")
         return None
@@ -65,12 +86,19 @@ def verify_token(token):
 # استخراج التوكن من الطلب
 # ────────────────────────────────────────────
 
-def _extract_token():
-    """استخراج JWT من header Authorization: Bearer ..."""
+def _extract_token(query_token=False):
+    """
+    استخراج JWT من header Authorization: Bearer ...
+    query_token: قبول ?token= أيضاً (EventSource لا يستطيع إرسال headers) — بنطاق البث فقط
+    Returns:
+        (token, scope) — scope هو النطاق الذي يجب أن يحمله التوكن
+    """
     auth_header = request.headers.get("Authorization", "")
     if auth_header.startswith("Bearer "):
-        return auth_header[7:]
-    return None
+        return auth_header[7:], None
+    if query_token:
+        return request.args.get("token"), STREAM_SCOPE
+    return None, None
 
 
 # ────────────────────────────────────────────
@@ -81,11 +109,11 @@ def require_auth(f):
     """ديكوريتر للتحقق من المصادقة فقط (أي دور)"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = _extract_token()
+        token, scope = _extract_token()
         if not token:
             return jsonify({"error": "Token مطلوب"}), 401
 
-        user_data = verify_token(token)
+        user_data = verify_token(token, scope)
         if not user_data:
             return jsonify({"error": "Token غير صالح أو منتهي الصلاحية"}), 401
 
@@ -112,16 +140,16 @@ def require_roles(*allowed_roles):
     return decorator
 
 
-def require_auth_and_roles(*allowed_roles):
+def require_auth_and_roles(*allowed_roles, query_token=False):
     """ديكوريتر مشترك للمصادقة والصلاحيات"""
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            token = _extract_token()
+            token, scope = _extract_token(query_token)
             if not token:
                 return jsonify({"error": "Token مطلوب"}), 401
 
-            user_data = verify_token(token)
+            user_data = verify_token(token, scope)
             if not user_data:
                 return jsonify({"error": "Token غير صالح أو منتهي الصلاحية"}), 401
 
@@ -1,46 +1,151 @@
 """
 نظام النسخ الاحتياطي التلقائي لقاعدة البيانات
 يُنشئ نسخة احتياطية قبل أي migration أو تغيير هيكلي
+
+كل نسخة تمر بأربع مراحل:
+    1. لقطة حيّة عبر sqlite3 backup API على خطوات (BACKUP_PAGES_PER_STEP صفحة ثم استراحة)
+       فلا يُحجب الكتّاب — وإذا أعاد كاتبٌ النسخ من البداية أكثر من BACKUP_MAX_RESTARTS مرة
+       تُؤخذ لقطة بخطوة واحدة (في وضع WAL لا تحجب الكتّاب أيضاً)
+    2. PRAGMA integrity_check على اللقطة — النسخة التالفة تُحذف ولا تُعتمد
+    3. ضغط متدفق (gzip أو lzma) بأجزاء 1 MB — لا تُحمَّل القاعدة في الذاكرة
+    4. ملف manifest بجوار النسخة (<name>.json): sha256 والحجم والضغط ونتيجة الفحص
+
+النسخ التزايدية (incremental=True — يستخدمها المجدول): سلسلة تبدأ بلقطة كاملة مفهرسة
+ثم ملفات .delta تحوي الصفحات المتغيرة فقط منذ النقطة السابقة (utils/backup_delta.py).
+بعد BACKUP_DELTA_CHAIN حلقة تُؤخذ لقطة كاملة جديدة. الاستعادة والتحقق يعيدان بناء
+أي نقطة من القاعدة + الحلقات، ويُطابق الناتج sha256 اللقطة الأصلية (db_sha256).
+
+    python -m backend.utils.backup [create [reason] | list | verify <name> | restore <name>]
 """
 
+import gzip
+import hashlib
+import json
+import lzma
 import os
 import shutil
+import sqlite3
 import logging
+from contextlib import contextmanager
 from datetime import datetime
+from .. import config
+from . import backup_delta
 
 logger = logging.getLogger(__name__)
 
-# مجلد النسخ الاحتياطية
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-BACKUP_DIR = os.path.join(BASE_DIR, "database", "backups")
-DB_FILE = os.path.join(BASE_DIR, "database", "purchase_requests.db")
+# مجلد النسخ الاحتياطية وملف القاعدة (من DATABASE_URL)
+BACKUP_DIR = config.BACKUP_DIR
+DB_FILE = config.DATABASE_FILE
 
 # أقصى عدد نسخ احتياطية للحفاظ على المساحة
-MAX_BACKUPS = 20
+MAX_BACKUPS = config.BACKUP_MAX
+
+# الامتداد → (الاسم، دالة الفتح)
+COMPRESSIONS = {
+    ".db": ("none", open),
+    ".db.gz": ("gzip", gzip.open),
+    ".db.xz": ("lzma", lzma.open),
+}
+_SUFFIX = {name: suffix for suffix, (name, _) in COMPRESSIONS.items()}
+
+# حلقات السلسلة التزايدية — نفس الضغط بامتداد مختلف
+DELTA_COMPRESSIONS = {
+    ".delta": ("none", open),
+    ".delta.gz": ("gzip", gzip.open),
+    ".delta.xz": ("lzma", lzma.open),
+}
+_DELTA_SUFFIX = {name: suffix for suffix, (name, _) in DELTA_COMPRESSIONS.items()}
+
+CHUNK = 1024 * 1024
+MANIFEST_SUFFIX = ".json"
+
+# نسخ المجدول (utils/backup_schedule.py) — لها سياسة احتفاظ زمنية منفصلة عن MAX_BACKUPS
+SCHEDULED_REASON = "scheduled"
+
 
+class BackupError(RuntimeError):
+    """نسخة احتياطية غير صالحة (فحص سلامة أو checksum)"""
 
-def backup_database(reason="auto"):
+
+class _TooManyRestarts(Exception):
+    """النسخ على خطوات يُعاد من البداية باستمرار"""
+
+
+def backup_database(reason="auto", compression=None, extra=None, incremental=False):
     """
     إنشاء نسخة احتياطية من قاعدة البيانات.
     Args:
         reason: سبب النسخ (مثل: migration, manual, startup)
+        compression: none | gzip | lzma (الافتراضي BACKUP_COMPRESSION)
+        extra: حقول إضافية في الـ manifest (مثل بصمة القاعدة)
+        incremental: حلقة delta في سلسلة هذا السبب إن أمكن، وإلا لقطة كاملة مفهرسة
     Returns:
         مسار الملف الاحتياطي أو None في حالة الفشل
     """
-    if not os.path.exists(DB_FILE):
+    if not DB_FILE or not os.path.exists(DB_FILE):
         logger.warning("ملف قاعدة البيانات غير موجود — لا حاجة لنسخ احتياطي")
         return None
 
+    compression = (compression or config.BACKUP_COMPRESSION).lower()
+    if compression not in _SUFFIX:
+        logger.error(f"❌ نوع ضغط غير معروف: {compression}")
+        return None
+
     os.makedirs(BACKUP_DIR, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"purchase_requests_{reason}_{timestamp}.db"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    stem = os.path.splitext(os.path.basename(DB_FILE))[0]
+    backup_name = f"{stem}_{reason}_{timestamp}{_SUFFIX[compression]}"
     backup_path = os.path.join(BACKUP_DIR, backup_name)
+    snapshot = os.path.join(BACKUP_DIR, f".{stem}_{timestamp}.snapshot.db")
 
     try:
-        shutil.copy2(DB_FILE, backup_path)
-        size_mb = os.path.getsize(backup_path) / (1024 * 1024)
-        logger.info(f"✅ نسخة احتياطية: {backup_name} ({size_mb:.2f} MB)")
+        parent = _chain_parent(reason) if incremental else None
+        if parent:
+            # حلقة delta تُقرأ من القاعدة الحية مباشرة — لا لقطة كاملة ولا integrity_check هنا؛
+            # verify_backup يعيد بناء السلسلة ويفحص الناتج
+            backup_name = f"{stem}_{reason}_{timestamp}{_DELTA_SUFFIX[compression]}"
+            backup_path = os.path.join(BACKUP_DIR, backup_name)
+            digest, chain = _store_delta(parent, backup_path, compression)
+            raw_size = chain["page_count"] * chain["page_size"]
+            integrity = "deferred"
+            stats = {"pages": chain["page_count"]}
+        else:
+            stats = _snapshot(DB_FILE, snapshot)
+            integrity = integrity_check(snapshot)
+            if integrity != "ok":
+                raise BackupError(f"فشل فحص السلامة للقطة: {integrity}")
+            raw_size = os.path.getsize(snapshot)
+            chain = {}
+            if incremental:
+                page_size, index, db_sha256 = backup_delta.scan_pages(snapshot)
+                backup_delta.write_index(_index_path(backup_path), index)
+                chain = {"kind": "full", "page_size": page_size,
+                         "page_count": len(index) // backup_delta.DIGEST_SIZE, "db_sha256": db_sha256}
+            if compression == "none":
+                os.replace(snapshot, backup_path)
+                digest = file_sha256(backup_path)
+            else:
+                digest = _compress(snapshot, backup_path, compression)
+        size = os.path.getsize(backup_path)
+
+        _write_manifest(backup_path, {
+            "name": backup_name,
+            "reason": reason,
+            "created": datetime.now().isoformat(),
+            "compression": compression,
+            "sha256": digest,
+            "size": size,
+            "raw_size": raw_size,
+            "integrity": integrity,
+            **stats,
+            **chain,
+            **(extra or {}),
+        })
+        logger.info(
+            f"✅ نسخة احتياطية: {backup_name} ({size / (1024 * 1024):.2f} MB"
+            f"{f' من {raw_size / (1024 * 1024):.2f} MB' if compression != 'none' else ''})"
+        )
 
         # تنظيف النسخ القديمة
         _cleanup_old_backups()
@@ -48,12 +153,273 @@ def backup_database(reason="auto"):
         return backup_path
     except Exception as e:
         logger.error(f"❌ فشل النسخ الاحتياطي: {e}")
+        for leftover in (backup_path, _manifest_path(backup_path), _index_path(backup_path)):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return None
+    finally:
+        for leftover in (snapshot, snapshot + "-wal", snapshot + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def _snapshot(source, target):
+    """
+    لقطة حيّة على خطوات. كتابة من اتصال آخر أثناء النسخ تعيده من البداية؛
+    بعد BACKUP_MAX_RESTARTS إعادة نأخذ لقطة بخطوة واحدة.
+    Returns:
+        {"pages", "steps", "restarts"}
+    """
+    stats = {"pages": 0, "steps": 0, "restarts": 0}
+    last_remaining = [None]
+
+    def progress(status, remaining, total):
+        stats["steps"] += 1
+        stats["pages"] = total
+        if last_remaining[0] is not None and remaining > last_remaining[0]:
+            stats["restarts"] += 1
+            if stats["restarts"] > config.BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last_remaining[0] = remaining
+
+    # للقراءة فقط: إغلاقه لا يعمل checkpoint ولا يحذف -wal، فلا تتغير بصمة القاعدة بسبب النسخ
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        try:
+            _copy_database(src, target, pages=config.BACKUP_PAGES_PER_STEP,
+                           sleep=config.BACKUP_STEP_SLEEP, progress=progress)
+        except _TooManyRestarts:
+            logger.info("النسخ على خطوات يُعاد باستمرار بسبب الكتابات — لقطة بخطوة واحدة")
+            _copy_database(src, target)
+    finally:
+        src.close()
+
+    # اللقطة ترث وضع WAL من المصدر — ملف واحد مكتفٍ بذاته بلا -wal/-shm
+    dst = sqlite3.connect(target)
+    try:
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+    return stats
+
+
+def _copy_database(source, target, pages=-1, sleep=0.25, progress=None):
+    """
+    نسخ عبر sqlite3 backup API بدلاً من نسخ الملف: في وضع WAL قد تكون آخر المعاملات
+    في ملف -wal فقط، والنسخ يجري عبر SQLite نفسه فيحترم الأقفال.
+    source: مسار أو اتصال sqlite3 مفتوح
+    """
+    src = sqlite3.connect(source) if isinstance(source, str) else source
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+    finally:
+        dst.close()
+        if src is not source:
+            src.close()
+
+
+def _index_path(backup_path):
+    return backup_path + backup_delta.INDEX_SUFFIX
+
+
+def is_delta(name):
+    return any(name.endswith(suffix) for suffix in DELTA_COMPRESSIONS)
+
+
+def _chain_parent(reason):
+    """
+    أحدث نقطة لنفس السبب تصلح أباً لحلقة جديدة: مفهرسة، بحجم صفحة القاعدة الحالي،
+    وفي سلسلتها أقل من BACKUP_DELTA_CHAIN حلقة delta — وإلا None (لقطة كاملة جديدة).
+    """
+    latest = next((b for b in list_backups() if b["reason"] == reason), None)
+    if latest is None or not os.path.exists(_index_path(latest["path"])):
+        return None
+    manifest = read_manifest(latest["path"]) or {}
+    if manifest.get("page_size") != backup_delta.page_size_of(DB_FILE):
+        return None
+    try:
+        chain = _chain(latest["path"])
+    except BackupError as e:
+        logger.warning(f"سلسلة النسخ التزايدية مكسورة — لقطة كاملة جديدة: {e}")
         return None
+    if len(chain) - 1 >= config.BACKUP_DELTA_CHAIN:  # chain يشمل اللقطة الكاملة
+        return None
+    return latest
+
+
+def _store_delta(parent, backup_path, compression):
+    """كتابة صفحات القاعدة الحية المتغيرة منذ parent — Returns: (sha256 للملف، حقول الـ manifest)"""
+    parent_index = backup_delta.read_index(_index_path(parent["path"]))
+    opener = DELTA_COMPRESSIONS[_DELTA_SUFFIX[compression]][1]
+    tmp = backup_path + ".tmp"
+    try:
+        with backup_delta.live_pages(DB_FILE) as (page_size, page_count, pages), opener(tmp, "wb") as out:
+            info = backup_delta.write_delta(pages, page_size, page_count, parent_index, out)
+        digest = file_sha256(tmp)
+        os.replace(tmp, backup_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    backup_delta.write_index(_index_path(backup_path), info.pop("index"))
+    logger.info(f"حلقة تزايدية: {info['changed_pages']} من {info['page_count']} صفحة تغيرت منذ {parent['name']}")
+    return digest, {"kind": "delta", "parent": parent["name"], **info}
+
+
+def _chain(backup_path):
+    """
+    مسارات السلسلة من اللقطة الكاملة حتى backup_path (ضمناً).
+    Raises:
+        BackupError إذا فُقدت حلقة
+    """
+    chain = [backup_path]
+    while is_delta(chain[0]):
+        manifest = read_manifest(chain[0])
+        parent = manifest and manifest.get("parent")
+        if not parent or not os.path.exists(os.path.join(os.path.dirname(chain[0]), parent)):
+            raise BackupError(f"حلقة مفقودة قبل {os.path.basename(chain[0])}")
+        chain.insert(0, os.path.join(os.path.dirname(chain[0]), parent))
+    return chain
+
+
+def _rebuild(backup_path, target):
+    """إعادة بناء نقطة في السلسلة: فك القاعدة ثم تطبيق الحلقات بالترتيب، ومطابقة db_sha256"""
+    chain = _chain(backup_path)
+    for link in chain:
+        manifest = read_manifest(link) or {}
+        if manifest.get("sha256") and file_sha256(link) != manifest["sha256"]:
+            raise BackupError(f"checksum لا يطابق الـ manifest: {os.path.basename(link)}")
+
+    opener = _backup_format(chain[0])[1]
+    with opener(chain[0], "rb") as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, CHUNK)
+    for link in chain[1:]:
+        with _backup_format(link)[1](link, "rb") as f:
+            backup_delta.apply_delta(f, target)
+
+    expected = (read_manifest(backup_path) or {}).get("db_sha256")
+    if expected and file_sha256(target) != expected:
+        raise BackupError(f"إعادة البناء لا تطابق اللقطة الأصلية: {os.path.basename(backup_path)}")
+
+
+def integrity_check(path):
+    """نتيجة PRAGMA integrity_check لملف قاعدة ("ok" عند السلامة)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "; ".join(str(r[0]) for r in rows[:10])
+
+
+def _compress(source, target, compression):
+    """ضغط متدفق مع حساب sha256 للملف الناتج — يُكتب إلى .tmp ثم يُعاد تسميته"""
+    opener = COMPRESSIONS[_SUFFIX[compression]][1]
+    tmp = target + ".tmp"
+    try:
+        with open(source, "rb") as src, opener(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK)
+        digest = file_sha256(tmp)
+        os.replace(tmp, target)
+        return digest
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _backup_format(name):
+    """(اسم الضغط، دالة الفتح) حسب الامتداد — None لغير ملفات النسخ"""
+    for suffix in (".db.gz", ".db.xz", ".db"):
+        if name.endswith(suffix):
+            return COMPRESSIONS[suffix]
+    for suffix in (".delta.gz", ".delta.xz", ".delta"):
+        if name.endswith(suffix):
+            return DELTA_COMPRESSIONS[suffix]
+    return None
+
+
+def _manifest_path(backup_path):
+    return backup_path + MANIFEST_SUFFIX
+
+
+def _write_manifest(backup_path, manifest):
+    tmp = _manifest_path(backup_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _manifest_path(backup_path))
+
+
+def read_manifest(backup_path):
+    """manifest النسخة أو None (نسخ قديمة بلا manifest)"""
+    try:
+        with open(_manifest_path(backup_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def verify_backup(backup_path):
+    """
+    التحقق من نسخة: sha256 مقابل الـ manifest (إن وجد) ثم integrity_check بعد فك الضغط.
+    Returns:
+        {"name", "checksum": True/False/None, "integrity": "ok" أو الخطأ}
+    """
+    manifest = read_manifest(backup_path)
+    checksum = None
+    if manifest and manifest.get("sha256"):
+        checksum = file_sha256(backup_path) == manifest["sha256"]
+    result = {"name": os.path.basename(backup_path), "checksum": checksum, "integrity": None}
+    if checksum is False:
+        result["integrity"] = "checksum mismatch"
+        return result
+    try:
+        with _expanded(backup_path) as plain:
+            result["integrity"] = integrity_check(plain)
+    except (BackupError, backup_delta.DeltaFormatError) as e:
+        result["integrity"] = str(e)
+    return result
+
+
+@contextmanager
+def _expanded(backup_path):
+    """
+    مسار ملف .db قابل للفتح — النسخ المضغوطة تُفك إلى ملف مؤقت يُحذف عند الخروج،
+    وحلقات delta يُعاد بناؤها من سلسلتها.
+    """
+    fmt = _backup_format(backup_path)
+    if fmt is None:
+        raise BackupError(f"صيغة نسخة غير معروفة: {backup_path}")
+    compression, opener = fmt
+    if compression == "none" and not is_delta(backup_path):
+        yield backup_path
+        return
+    tmp = os.path.join(
+        os.path.dirname(os.path.abspath(backup_path)),
+        f".{os.path.basename(backup_path)}.{os.getpid()}.expand.db",
+    )
+    try:
+        if is_delta(backup_path):
+            _rebuild(backup_path, tmp)
+        else:
+            with opener(backup_path, "rb") as src, open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK)
+        yield tmp
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 
 def restore_database(backup_path):
     """
-    استعادة قاعدة البيانات من نسخة احتياطية.
+    استعادة قاعدة البيانات من نسخة احتياطية (مضغوطة أو لا).
     Args:
         backup_path: مسار ملف النسخة الاحتياطية
     Returns:
@@ -62,12 +428,24 @@ def restore_database(backup_path):
     if not os.path.exists(backup_path):
         logger.error(f"ملف النسخة الاحتياطية غير موجود: {backup_path}")
         return False
+    if not DB_FILE:
+        logger.error("لا يوجد ملف قاعدة بيانات للاستعادة إليه")
+        return False
 
     try:
-        # نسخة احتياطية من الحالة الحالية قبل الاستعادة
-        backup_database("pre_restore")
+        manifest = read_manifest(backup_path)
+        if manifest and manifest.get("sha256") and file_sha256(backup_path) != manifest["sha256"]:
+            raise BackupError("checksum لا يطابق الـ manifest")
+
+        with _expanded(backup_path) as plain:
+            integrity = integrity_check(plain)
+            if integrity != "ok":
+                raise BackupError(f"فشل فحص السلامة: {integrity}")
 
-        shutil.copy2(backup_path, DB_FILE)
+            # نسخة احتياطية من الحالة الحالية قبل الاستعادة
+            backup_database("pre_restore")
+
+            _copy_database(plain, DB_FILE)
         logger.info(f"✅ تم استعادة قاعدة البيانات من: {os.path.basename(backup_path)}")
         return True
     except Exception as e:
@@ -75,39 +453,147 @@ def restore_database(backup_path):
         return False
 
 
-def list_backups():
-    """إرجاع قائمة النسخ الاحتياطية المتوفرة"""
+def _backup_files():
+    """أسماء ملفات النسخ (كل الصيغ) في BACKUP_DIR"""
     if not os.path.exists(BACKUP_DIR):
         return []
+    return [
+        f for f in os.listdir(BACKUP_DIR)
+        if not f.startswith(".") and _backup_format(f) is not None
+    ]
 
+
+def list_backups():
+    """إرجاع قائمة النسخ الاحتياطية المتوفرة"""
     backups = []
-    for f in sorted(os.listdir(BACKUP_DIR), reverse=True):
-        if f.endswith(".db"):
-            path = os.path.join(BACKUP_DIR, f)
-            size_mb = os.path.getsize(path) / (1024 * 1024)
-            backups.append({
-                "name": f,
-                "path": path,
-                "size_mb": round(size_mb, 2),
-                "created": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
-            })
+    for f in _backup_files():
+        path = os.path.join(BACKUP_DIR, f)
+        manifest = read_manifest(path) or {}
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        backups.append({
+            "name": f,
+            "path": path,
+            "size_mb": round(size_mb, 2),
+            "created": manifest.get("created") or datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            "compression": _backup_format(f)[0],
+            "raw_size_mb": round(manifest["raw_size"] / (1024 * 1024), 2) if "raw_size" in manifest else None,
+            "reason": manifest.get("reason") or _reason_from_name(f),
+            "sha256": manifest.get("sha256"),
+            "kind": manifest.get("kind") or ("delta" if is_delta(f) else "full"),
+            "parent": manifest.get("parent"),
+        })
+    backups.sort(key=lambda b: b["created"], reverse=True)  # الأحدث أولاً
     return backups
 
 
+def _reason_from_name(name):
+    """<stem>_<reason>_<YYYYmmdd>_<HHMMSS>[_ms].db — للنسخ القديمة بلا manifest"""
+    parts = name.split(".")[0].split("_")
+    while parts and parts[-1].isdigit():
+        parts.pop()
+    stem = os.path.splitext(os.path.basename(DB_FILE or ""))[0]
+    joined = "_".join(parts)
+    return joined[len(stem) + 1:] if stem and joined.startswith(stem + "_") else (parts[-1] if parts else None)
+
+
+def remove_backup(name):
+    """
+    حذف نسخة مع الـ manifest والفهرس الخاصين بها.
+    حلقة delta لها تابع تُدمج صفحاتها فيه أولاً فتبقى السلسلة صالحة؛
+    اللقطة الكاملة التي تقوم عليها حلقات لا تُحذف.
+    Returns:
+        True إذا حُذفت
+    """
+    path = os.path.join(BACKUP_DIR, name)
+    children = [b for b in list_backups() if b["parent"] == name]
+    try:
+        if children and not is_delta(name):
+            logger.info(f"لقطة {name} أساس لسلسلة تزايدية — تبقى")
+            return False
+        for child in children:
+            _fold_into(path, child["path"])
+        os.remove(path)
+        for sidecar in (_manifest_path(path), _index_path(path)):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+        logger.info(f"🗑️ حذف نسخة قديمة: {name}")
+        return True
+    except Exception as e:
+        logger.warning(f"تعذر حذف النسخة {name}: {e}")
+        return False
+
+
+def _fold_into(delta_path, child_path):
+    """دمج حلقة في تابعها — التابع يصبح الفرق عن أب الحلقة المحذوفة"""
+    manifest = read_manifest(child_path)
+    opener = _backup_format(child_path)[1]
+    tmp = child_path + ".tmp"
+    try:
+        with _backup_format(delta_path)[1](delta_path, "rb") as older, \
+                opener(child_path, "rb") as newer, opener(tmp, "wb") as out:
+            changed = backup_delta.merge_deltas(older, newer, out)
+        manifest.update({
+            "parent": read_manifest(delta_path)["parent"],
+            "changed_pages": changed,
+            "sha256": file_sha256(tmp),
+            "size": os.path.getsize(tmp),
+        })
+        os.replace(tmp, child_path)
+        _write_manifest(child_path, manifest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
 def _cleanup_old_backups():
-    """حذف النسخ الاحتياطية القديمة (الاحتفاظ بآخر MAX_BACKUPS)"""
-    if not os.path.exists(BACKUP_DIR):
-        return
+    """
+    حذف النسخ غير المجدولة القديمة (الاحتفاظ بآخر MAX_BACKUPS).
+    النسخ المجدولة لا تُعدّ هنا — إعادة تشغيل متكررة لا تمسح تاريخها.
+    """
+    adhoc = [b for b in list_backups() if b["reason"] != SCHEDULED_REASON]
+    for old in adhoc[MAX_BACKUPS:]:
+        remove_backup(old["name"])
 
-    backups = sorted(
-        [f for f in os.listdir(BACKUP_DIR) if f.endswith(".db")],
-        key=lambda f: os.path.getmtime(os.path.join(BACKUP_DIR, f)),
-        reverse=True,
-    )
 
-    for old_file in backups[MAX_BACKUPS:]:
-        try:
-            os.remove(os.path.join(BACKUP_DIR, old_file))
-            logger.info(f"🗑️ حذف نسخة قديمة: {old_file}")
-        except Exception:
-            pass
+def database_fingerprint(path=None):
+    """
+    بصمة رخيصة لآخر كتابة: عدّاد تغيير الملف (بايتات 24..27 في الترويسة)
+    + حجم ووقت تعديل الملف و -wal. في وضع WAL لا يتغير العدّاد حتى checkpoint،
+    لذا يدخل ملف -wal في البصمة. تطابق البصمتين = لا كتابة منذ النسخة السابقة.
+    (PRAGMA data_version لا يصلح هنا: قيمته خاصة بكل اتصال ولا تبقى بين العمليات)
+    """
+    path = path or DB_FILE
+    with open(path, "rb") as f:
+        header = f.read(100)
+    parts = [int.from_bytes(header[24:28], "big")]
+    for candidate in (path, path + "-wal"):
+        if os.path.exists(candidate):
+            st = os.stat(candidate)
+            if st.st_size:  # -wal فارغ (أنشأه قارئ) = لا كتابات
+                parts += [st.st_size, st.st_mtime_ns]
+    return ":".join(str(p) for p in parts)
+
+
+def _resolve(name):
+    return name if os.path.sep in name else os.path.join(BACKUP_DIR, name)
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "create"
+    if command == "create":
+        path = backup_database(sys.argv[2] if len(sys.argv) > 2 else "manual")
+        sys.exit(0 if path else 1)
+    elif command == "list":
+        for b in list_backups():
+            print(f"{b['name']:<60} {b['size_mb']:>9.2f} MB  {b['kind']:<5} {b['compression']:<5} {b['created']}")
+    elif command == "verify" and len(sys.argv) > 2:
+        result = verify_backup(_resolve(sys.argv[2]))
+        print(json.dumps(result, ensure_ascii=False))
+        sys.exit(0 if result["integrity"] == "ok" and result["checksum"] is not False else 1)
+    elif command == "restore" and len(sys.argv) > 2:
+        sys.exit(0 if restore_database(_resolve(sys.argv[2])) else 1)
+    else:
+        print("الاستخدام: python -m backend.utils.backup [create [reason] | list | verify <name> | restore <name>]")
+        sys.exit(2)
@@ -0,0 +1,279 @@
+"""
+صيغة النسخ التزايدية على مستوى الصفحات (page delta)
+
+ملف القاعدة مصفوفة صفحات بحجم ثابت (page_size من ترويسة الملف)، ولقطة backup API
+تنسخ الصفحات كما هي — فالصفحة التي لم تُكتب منذ النسخة السابقة تبقى بايتاتها نفسها.
+لكل نقطة في السلسلة فهرس (<name>.pages): بصمة blake2b بطول 16 بايت لكل صفحة.
+الـ delta يحوي فقط الصفحات التي تغيرت بصمتها عن فهرس النقطة السابقة:
+
+    MAGIC(8) page_size(4) page_count(4)
+    ثم سجلات: pgno(4) + بايتات الصفحة — مرتبة تصاعدياً، وتنتهي بـ pgno = 0
+
+كل الأعداد big-endian. الملف يُكتب عبر دالة فتح (open / gzip.open / lzma.open)
+فالضغط يعمل كما في النسخ الكاملة. تنسيق السلسلة (الأب، التحقق، الاستعادة) في backup.py.
+
+الحلقة لا تحتاج لقطة كاملة أولاً: live_pages يقرأ صفحات القاعدة الحية في مكانها —
+الملف الرئيسي + أحدث إطار لكل صفحة في -wal حتى آخر commit صالح — داخل معاملة قراءة
+تمنع الكتابة إلى الملف (rollback) أو checkpoint فوقها وإعادة بدء -wal (WAL).
+الكلفة قراءة الصفحات وبصمتها فقط، والكتابة بقدر الصفحات المتغيرة.
+"""
+
+import hashlib
+import os
+import sqlite3
+import struct
+from contextlib import contextmanager, nullcontext
+
+MAGIC = b"PRDELTA1"
+DIGEST_SIZE = 16
+INDEX_SUFFIX = ".pages"
+
+_HEADER = struct.Struct(">8sII")  # magic, page_size, page_count
+_PGNO = struct.Struct(">I")
+
+# ملف -wal: ترويسة 32 بايت ثم إطارات (ترويسة 24 بايت + الصفحة) — https://sqlite.org/fileformat.html#wal_file_format
+_WAL_HEADER = struct.Struct(">IIIIIIII")  # magic, version, page_size, checkpoint_seq, salt1, salt2, cksum1, cksum2
+_WAL_FRAME = struct.Struct(">IIIIII")     # pgno, db_size (commit فقط), salt1, salt2, cksum1, cksum2
+_WAL_MAGIC = (0x377F0682, 0x377F0683)     # checksum بترتيب little / big-endian
+
+
+class DeltaFormatError(ValueError):
+    """ملف delta أو فهرس صفحات غير صالح"""
+
+
+def page_size_of(path):
+    """حجم الصفحة من ترويسة ملف SQLite (القيمة 1 تعني 65536)"""
+    with open(path, "rb") as f:
+        header = f.read(100)
+    if len(header) < 100 or not header.startswith(b"SQLite format 3\x00"):
+        raise DeltaFormatError(f"ليس ملف SQLite: {path}")
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+
+def _pages(path, page_size):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(page_size), b""):
+            yield chunk
+
+
+def _digest(page):
+    return hashlib.blake2b(page, digest_size=DIGEST_SIZE).digest()
+
+
+def scan_pages(path):
+    """
+    مرور واحد على ملف قاعدة.
+    Returns:
+        (page_size, فهرس البصمات bytes, sha256 للملف)
+    """
+    page_size = page_size_of(path)
+    index = bytearray()
+    sha = hashlib.sha256()
+    for page in _pages(path, page_size):
+        sha.update(page)
+        index += _digest(page)
+    return page_size, bytes(index), sha.hexdigest()
+
+
+def write_index(path, index):
+    with open(path, "wb") as f:
+        f.write(index)
+
+
+def read_index(path):
+    with open(path, "rb") as f:
+        index = f.read()
+    if len(index) % DIGEST_SIZE:
+        raise DeltaFormatError(f"فهرس صفحات تالف: {path}")
+    return index
+
+
+def _wal_checksum(data, s0, s1, big_endian):
+    words = struct.unpack(f"{'>' if big_endian else '<'}{len(data) // 4}I", data)
+    for i in range(0, len(words), 2):
+        s0 = (s0 + words[i] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[i + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def wal_frames(path, page_size):
+    """
+    أحدث إطار لكل صفحة في ملف -wal حتى آخر commit صالح (salt + checksum متسلسل) —
+    إطارات commit لم يكتمل أو من جيل سابق للملف تُتجاهل.
+    Returns:
+        ({pgno: موضع بايتات الصفحة}, عدد صفحات القاعدة عند آخر commit أو None)
+    """
+    with open(path, "rb") as f:
+        header = f.read(_WAL_HEADER.size)
+        if len(header) < _WAL_HEADER.size:
+            return {}, None
+        magic, _, wal_page_size, _, salt1, salt2, c0, c1 = _WAL_HEADER.unpack(header)
+        if magic not in _WAL_MAGIC or wal_page_size != page_size:
+            return {}, None
+        big_endian = magic & 1
+        if _wal_checksum(header[:24], 0, 0, big_endian) != (c0, c1):
+            return {}, None
+
+        committed, pending, db_size = {}, {}, None
+        s0, s1 = c0, c1
+        offset = _WAL_HEADER.size
+        while True:
+            frame = f.read(_WAL_FRAME.size + page_size)
+            if len(frame) < _WAL_FRAME.size + page_size:
+                break
+            pgno, commit_size, f_salt1, f_salt2, f0, f1 = _WAL_FRAME.unpack_from(frame)
+            if (f_salt1, f_salt2) != (salt1, salt2):
+                break
+            s0, s1 = _wal_checksum(frame[:8], s0, s1, big_endian)
+            s0, s1 = _wal_checksum(frame[_WAL_FRAME.size:], s0, s1, big_endian)
+            if (s0, s1) != (f0, f1):
+                break
+            pending[pgno] = offset + _WAL_FRAME.size
+            if commit_size:
+                committed.update(pending)
+                pending.clear()
+                db_size = commit_size
+            offset += len(frame)
+    return committed, db_size
+
+
+@contextmanager
+def live_pages(path):
+    """
+    صفحات قاعدة حية كما في commit واحد، دون نسخها إلى لقطة.
+    الصفحة 1 تُكتب بوضع rollback (البايتان 18-19) كاللقطة الكاملة: الناتج ملف مكتفٍ بذاته.
+    Yields:
+        (page_size, page_count, مولّد بايتات الصفحات بالترتيب)
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # تثبيت معاملة القراءة
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        frames, wal_size = {}, None
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal" and os.path.exists(path + "-wal"):
+            frames, wal_size = wal_frames(path + "-wal", page_size)
+        if wal_size:
+            page_count = wal_size
+
+        def pages():
+            with open(path, "rb") as db, (open(path + "-wal", "rb") if frames else nullcontext()) as wal:
+                for pgno in range(1, page_count + 1):
+                    source = wal if pgno in frames else db
+                    source.seek(frames[pgno] if pgno in frames else (pgno - 1) * page_size)
+                    page = source.read(page_size)
+                    if len(page) != page_size:
+                        raise DeltaFormatError(f"صفحة ناقصة {pgno} في {path}")
+                    if pgno == 1:
+                        page = page[:18] + b"\x01\x01" + page[20:]
+                    yield page
+
+        yield page_size, page_count, pages()
+    finally:
+        conn.close()
+
+
+def write_delta(pages, page_size, page_count, parent_index, out):
+    """
+    كتابة الصفحات التي تغيرت عن parent_index إلى out (ملف مفتوح للكتابة الثنائية).
+    pages: مولّد بايتات الصفحات بالترتيب (live_pages) — مرور واحد يحسب أيضاً الفهرس الجديد و sha256.
+    Returns:
+        {"page_size", "page_count", "changed_pages", "index", "db_sha256"}
+    """
+    index = bytearray()
+    sha = hashlib.sha256()
+    changed = 0
+    out.write(_HEADER.pack(MAGIC, page_size, page_count))
+    for pgno, page in enumerate(pages, start=1):
+        sha.update(page)
+        digest = _digest(page)
+        index += digest
+        offset = (pgno - 1) * DIGEST_SIZE
+        if parent_index[offset:offset + DIGEST_SIZE] != digest:
+            out.write(_PGNO.pack(pgno) + page)
+            changed += 1
+    out.write(_PGNO.pack(0))
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "changed_pages": changed,
+        "index": bytes(index),
+        "db_sha256": sha.hexdigest(),
+    }
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise DeltaFormatError("ملف delta مقطوع")
+    return data
+
+
+def read_delta(f):
+    """
+    قراءة delta من ملف مفتوح.
+    Returns:
+        (page_size, page_count, مولّد (pgno, page))
+    """
+    magic, page_size, page_count = _HEADER.unpack(_read_exact(f, _HEADER.size))
+    if magic != MAGIC:
+        raise DeltaFormatError("ليس ملف delta")
+
+    def pages():
+        while True:
+            (pgno,) = _PGNO.unpack(_read_exact(f, _PGNO.size))
+            if pgno == 0:
+                return
+            yield pgno, _read_exact(f, page_size)
+
+    return page_size, page_count, pages()
+
+
+def apply_delta(f, target):
+    """
+    تطبيق delta (ملف مفتوح للقراءة) على ملف قاعدة target في مكانه.
+    Returns:
+        عدد الصفحات المكتوبة
+    """
+    page_size, page_count, pages = read_delta(f)
+    written = 0
+    with open(target, "r+b") as db:
+        for pgno, page in pages:
+            db.seek((pgno - 1) * page_size)
+            db.write(page)
+            written += 1
+        db.truncate(page_count * page_size)
+    return written
+
+
+def merge_deltas(older, newer, out):
+    """
+    دمج delta أقدم في التالي له (ملفان مفتوحان للقراءة) إلى out: الصفحة في الأحدث تغلب،
+    وصفحات الأقدم بعد page_count الأحدث تُسقط. دمج متدفق — كلاهما مرتب حسب pgno.
+    الناتج = الفرق بين أب الأقدم والأحدث، فيمكن حذف الأقدم من السلسلة.
+    Returns:
+        عدد الصفحات في الناتج
+    """
+    old_size, _, old_pages = read_delta(older)
+    page_size, page_count, new_pages = read_delta(newer)
+    if old_size != page_size:
+        raise DeltaFormatError("حجم صفحة مختلف بين حلقتين في السلسلة")
+    out.write(_HEADER.pack(MAGIC, page_size, page_count))
+
+    old_next, new_next = next(old_pages, None), next(new_pages, None)
+    count = 0
+    while old_next or new_next:
+        if new_next and (not old_next or new_next[0] <= old_next[0]):
+            if old_next and old_next[0] == new_next[0]:
+                old_next = next(old_pages, None)
+            record, new_next = new_next, next(new_pages, None)
+        else:
+            record, old_next = old_next, next(old_pages, None)
+            if record[0] > page_count:
+                continue
+        out.write(_PGNO.pack(record[0]) + record[1])
+        count += 1
+    out.write(_PGNO.pack(0))
+    return count
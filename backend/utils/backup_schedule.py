@@ -0,0 +1,143 @@
+"""
+جدولة النسخ الاحتياطي مع احتفاظ متدرّج (grandfather-father-son)
+كل BACKUP_SCHEDULE_MINUTES دقيقة تُؤخذ نسخة "scheduled" — إلا إذا لم تتغير القاعدة
+منذ آخر نسخة مجدولة (database_fingerprint في الـ manifest) فيُتخطى التشغيل بلا I/O.
+
+الاحتفاظ (للنسخ المجدولة فقط — نسخ الإقلاع والترحيل لها MAX_BACKUPS مستقل):
+    أحدث نسخة في كل ساعة لآخر BACKUP_KEEP_HOURLY ساعة
+    أحدث نسخة في كل يوم لآخر BACKUP_KEEP_DAILY يوم
+    أحدث نسخة في كل أسبوع لآخر BACKUP_KEEP_WEEKLY أسبوع
+    أحدث نسخة في كل شهر لآخر BACKUP_KEEP_MONTHLY شهر
+
+التشغيل:
+    - داخل التطبيق: thread في worker واحد فقط (قفل ملف بجوار القاعدة)
+    - أو من cron:  python run.py backup [--force]
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from .. import config
+from . import backup
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover — Windows: المجدول داخل التطبيق معطّل، استخدم cron/Task Scheduler
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+
+
+def _tiers():
+    """(اسم الطبقة، عدد الفترات، دالة مفتاح الفترة)"""
+    return (
+        ("hourly", config.BACKUP_KEEP_HOURLY, lambda t: (t.date(), t.hour)),
+        ("daily", config.BACKUP_KEEP_DAILY, lambda t: t.date()),
+        ("weekly", config.BACKUP_KEEP_WEEKLY, lambda t: t.isocalendar()[:2]),
+        ("monthly", config.BACKUP_KEEP_MONTHLY, lambda t: (t.year, t.month)),
+    )
+
+
+def select_retained(backups):
+    """
+    أسماء النسخ التي تبقى وفق GFS.
+    backups: [{"name", "created" (ISO)}] — لكل طبقة: أحدث نسخة في كل فترة، لأحدث N فترة.
+    Returns:
+        {name: [الطبقات التي تحتفظ بها]}
+    """
+    dated = sorted(
+        ((datetime.fromisoformat(b["created"]), b["name"]) for b in backups),
+        reverse=True,
+    )
+    retained = {}
+    for tier, keep, period_of in _tiers():
+        seen = []
+        for created, name in dated:
+            period = period_of(created)
+            if period in seen:
+                continue
+            if len(seen) >= keep:
+                break
+            seen.append(period)
+            retained.setdefault(name, []).append(tier)
+    return retained
+
+
+def prune_scheduled_backups():
+    """حذف النسخ المجدولة خارج مجموعة GFS — يُرجع أسماء المحذوف"""
+    scheduled = [b for b in backup.list_backups() if b["reason"] == backup.SCHEDULED_REASON]
+    retained = select_retained(scheduled)
+    removed = [b["name"] for b in scheduled if b["name"] not in retained]
+    for name in removed:
+        backup.remove_backup(name)
+    return removed
+
+
+def run_scheduled_backup(force=False):
+    """
+    تشغيل واحد: نسخة إذا تغيرت القاعدة منذ آخر نسخة مجدولة، ثم تقليم GFS.
+    Returns:
+        {"status": "created" | "unchanged" | "skipped" | "failed", "path", "removed"}
+    """
+    if not backup.DB_FILE or not os.path.exists(backup.DB_FILE):
+        return {"status": "skipped", "path": None, "removed": []}
+
+    fingerprint = backup.database_fingerprint()
+    latest = next(
+        (b for b in backup.list_backups() if b["reason"] == backup.SCHEDULED_REASON), None
+    )
+    previous = backup.read_manifest(latest["path"]) if latest else None
+    if not force and previous and previous.get("fingerprint") == fingerprint:
+        logger.info("لا كتابات منذ آخر نسخة مجدولة — تم التخطي")
+        return {"status": "unchanged", "path": latest["path"], "removed": prune_scheduled_backups()}
+
+    # البصمة قبل اللقطة: كتابة أثناء النسخ تجعل التشغيل التالي ينسخ مجدداً (لا العكس)
+    path = backup.backup_database(backup.SCHEDULED_REASON, extra={"fingerprint": fingerprint},
+                                  incremental=config.BACKUP_INCREMENTAL)
+    return {
+        "status": "created" if path else "failed",
+        "path": path,
+        "removed": prune_scheduled_backups(),
+    }
+
+
+class _Scheduler(threading.Thread):
+
+    def __init__(self, interval, lock_file):
+        super().__init__(name="backup-scheduler", daemon=True)
+        self.interval = interval
+        self.lock_file = lock_file  # يبقى مفتوحاً (ومقفلاً) طوال عمر العملية
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                run_scheduled_backup()
+            except Exception as e:
+                logger.warning(f"فشل النسخ المجدول: {e}")
+
+
+def start_backup_scheduler():
+    """
+    تشغيل المجدول في هذه العملية إن كان مفعّلاً ولم يسبقها worker آخر إليه.
+    Returns:
+        True إذا بدأ هنا
+    """
+    global _scheduler
+    minutes = config.BACKUP_SCHEDULE_MINUTES
+    if _scheduler is not None or minutes <= 0 or fcntl is None or not backup.DB_FILE:
+        return False
+    lock_file = open(f"{backup.DB_FILE}.backup.lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()  # worker آخر يشغّل المجدول
+        return False
+    _scheduler = _Scheduler(minutes * 60, lock_file)
+    _scheduler.start()
+    logger.info(f"مجدول النسخ الاحتياطي: كل {minutes} دقيقة")
+    return True
+
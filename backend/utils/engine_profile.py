@@ -0,0 +1,83 @@
+"""
+ملف تعريف محرك SQLite للإنتاج (Engine Profile)
+الإعدادات الافتراضية لـ SQLite تترك القاعدة في وضع rollback journal (الكاتب يحجب القرّاء
+أثناء commit)، و foreign_keys معطلة فتُتجاهل ondelete="CASCADE".
+هنا تُطبَّق PRAGMAs على كل اتصال جديد عبر حدث connect:
+
+    journal_mode  WAL     القرّاء يقرؤون لقطة ثابتة بينما يكتب المعتمد
+    synchronous   NORMAL  fsync عند checkpoint فقط — آمن مع WAL
+    busy_timeout  مللي ثانية انتظار القفل بدلاً من "database is locked" فوراً
+    cache_size / mmap_size / temp_store
+    foreign_keys  ON
+
+كل قيمة قابلة للتغيير من متغيرات البيئة (config.py: SQLITE_*).
+"""
+
+import logging
+from sqlalchemy import event
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+    "foreign_keys": {"ON", "OFF"},
+}
+
+# لا معنى لها لقاعدة في الذاكرة
+_FILE_ONLY = ("journal_mode", "mmap_size")
+
+
+def profile_pragmas():
+    """PRAGMAs الملف الحالي بالترتيب — القيم النصية من قائمة مسموحة والرقمية int"""
+    pragmas = [
+        ("busy_timeout", int(config.SQLITE_BUSY_TIMEOUT_MS)),
+        ("journal_mode", config.SQLITE_JOURNAL_MODE),
+        ("synchronous", config.SQLITE_SYNCHRONOUS),
+        ("cache_size", int(config.SQLITE_CACHE_SIZE)),
+        ("mmap_size", int(config.SQLITE_MMAP_SIZE)),
+        ("temp_store", config.SQLITE_TEMP_STORE),
+        ("foreign_keys", config.SQLITE_FOREIGN_KEYS),
+    ]
+    result = []
+    for name, value in pragmas:
+        if name in _CHOICES:
+            value = str(value).strip().upper()
+            if value not in _CHOICES[name]:
+                raise ValueError(f"قيمة غير صالحة لـ PRAGMA {name}: {value}")
+        result.append((name, value))
+    return result
+
+
+def configure_connection(dbapi_conn, pragmas=None, in_memory=False):
+    """تطبيق PRAGMAs على اتصال sqlite3 (خارج أي معاملة)"""
+    cursor = dbapi_conn.cursor()
+    try:
+        for name, value in (profile_pragmas() if pragmas is None else pragmas):
+            if in_memory and name in _FILE_ONLY:
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def apply_engine_profile(engine):
+    """تسجيل حدث connect على محرك SQLite (لا شيء لغير SQLite)"""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = profile_pragmas()
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, connection_record):
+        configure_connection(dbapi_conn, pragmas, in_memory)
+
+    logger.debug(f"ملف تعريف SQLite: {dict(pragmas)}")
+
+
+def describe(conn):
+    """القيم الفعلية على اتصال (للتشخيص والاختبارات)"""
+    names = [name for name, _ in profile_pragmas()]
+    return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
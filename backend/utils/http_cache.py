@@ -0,0 +1,54 @@
+"""
+الاستجابات الشرطية (ETag / If-None-Match)
+المتصفح يخزّن الاستجابة ويُعيد إرسال ETag تلقائياً مع كل fetch،
+فإذا لم يتغير المُتحقِّق (validator) نُرجع 304 بلا استعلام كامل ولا تحويل JSON.
+"""
+
+import gzip
+import hashlib
+from flask import request, make_response
+
+# private: البيانات خاصة بالمستخدم — no-cache: التحقق مع الخادم في كل مرة
+REVALIDATE = "private, no-cache"
+
+# للمحتوى المعنون بالبصمة (content-addressed): لا يتغير أبداً لنفس العنوان
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def compute_etag(*parts):
+    """ETag ثابت من أجزاء المُتحقِّق (النطاق + الأعداد + آخر تحديث)"""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def not_modified(etag, cache_control=REVALIDATE):
+    """إرجاع استجابة 304 إذا طابق If-None-Match، وإلا None"""
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        return response
+    return None
+
+
+def with_etag(response, etag, cache_control=REVALIDATE):
+    """إرفاق ETag و Cache-Control بالاستجابة"""
+    response = make_response(response)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def gzip_json_response(payload):
+    """
+    استجابة JSON من محتوى مضغوط مسبقاً بـ gzip:
+    يُرسل كما هو إذا قبل العميل gzip، وإلا يُفك ضغطه.
+    """
+    if "gzip" in request.accept_encodings:
+        response = make_response(payload)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = make_response(gzip.decompress(payload))
+    response.mimetype = "application/json"
+    response.vary.add("Accept-Encoding")
+    return response
@@ -1,51 +1,137 @@
 """
 فحص سلامة البيانات — يمنع رجوع الطلبات المعتمدة للحالة الأولية
-يُستدعى عند تشغيل التطبيق وبعد كل migration
+يُستدعى بعد كل migration (وعند كل إقلاع مع FAST_START=0)، ومن POST /api/admin/integrity
 """
 
+import json
 import logging
-from sqlalchemy import text
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import DateTime, bindparam, text
+from .. import config
 from ..database import SessionLocal
+from ..models import IntegrityRun
+from ..services.work_queue import rebuild_work_queue
+from ..services.request_details import drop_snapshots
+from .write_queue import write_session
 
 logger = logging.getLogger(__name__)
 
+# updated_at في الإصلاحات بنفس صيغة ORM ("YYYY-MM-DD HH:MM:SS.ffffff" UTC) لا CURRENT_TIMESTAMP:
+# العلامة المائية تقارن القيم نصاً، و CURRENT_TIMESTAMP بلا كسور ثانية يقع قبل كتابة ORM في نفس الثانية
+_NOW = bindparam("now", type_=DateTime())
+
+
+def _repair(sql):
+    """UPDATE إصلاح يضبط updated_at = :now"""
+    return text(sql).bindparams(_NOW)
+
 # الحالات التي تعني أن الطلب تجاوز المدير المباشر
 ADVANCED_STATUSES = (
     "pending_finance", "pending_disbursement", "pending_procurement",
     "completed", "approved",
 )
 
+# ترتيب المراحل — حالة أقل من حالة الـ snapshot = تراجع (حالة غير مذكورة = -1)
+STATUS_LEVELS = {
+    "pending_manager": 0,
+    "pending_finance": 1,
+    "pending_disbursement": 2,
+    "pending_procurement": 3,
+    "completed": 4,
+    "approved": 4,
+}
+
+# سطر سجل لكل طلب متراجع حتى هذا الحد، ثم ملخص
+REGRESSION_LOG_LIMIT = 20
+
+# التحذيرات المحفوظة لكل تشغيل في integrity_runs
+RUN_WARNINGS_LIMIT = 200
+
 
-def verify_data_integrity():
+def _last_run(db, mode=None):
+    """آخر تشغيل ناجح (بلا أخطاء) — اختيارياً من نوع معيّن"""
+    q = db.query(IntegrityRun).filter(IntegrityRun.errors.is_(None))
+    if mode:
+        q = q.filter(IntegrityRun.mode == mode)
+    return q.order_by(IntegrityRun.id.desc()).first()
+
+
+def _full_sweep_due(db):
+    """فحص كامل إذا لم يسبق تشغيل ناجح، أو مضى INTEGRITY_FULL_SWEEP_DAYS على آخر فحص كامل"""
+    last_full = _last_run(db, "full")
+    if last_full is None or config.INTEGRITY_FULL_SWEEP_DAYS <= 0:
+        return True
+    started = last_full.started_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - started >= timedelta(days=config.INTEGRITY_FULL_SWEEP_DAYS)
+
+
+def verify_data_integrity(full=None):
     """
-    فحص شامل لسلامة البيانات.
+    فحص سلامة البيانات — تزايدي افتراضياً.
     يتحقق من:
     1. عدم وجود طلبات معتمدة تحولت لـ pending_manager
     2. تناسق status مع current_stage و next_role
     3. عدم وجود approved_history بدون تحديث الحالة
-    
+
+    التزايدي يفحص فقط الطلبات التي تغيّر updated_at لها أو أُضيف لها سجل في approval_history
+    منذ العلامة المائية لآخر تشغيل ناجح (ix_pr_updated_at + المفتاح الأساسي للسجل).
+    التعديلات بـ SQL مباشر لا تحدّث updated_at — لذلك فحص كامل دوري (INTEGRITY_FULL_SWEEP_DAYS).
+    كل تشغيل يُسجَّل في integrity_runs مع زمنه ونتائجه (GET /api/admin/integrity).
+
+    Args:
+        full: True فحص كامل، False تزايدي، None حسب موعد الفحص الكامل
     Returns:
         dict مع نتائج الفحص
     """
-    db = SessionLocal()
+    started_at, start = datetime.now(timezone.utc), time.perf_counter()
+    db = write_session()  # القراءة والإصلاح وتسجيل التشغيل في لقطة واحدة
     results = {
+        "mode": None,
         "checked": 0,
+        "scanned": 0,
         "fixed": 0,
         "errors": [],
         "warnings": [],
+        "seconds": 0.0,
     }
 
     try:
+        last = _last_run(db)
+        if full is None:
+            full = _full_sweep_due(db)
+        full = full or last is None
+        results["mode"] = "full" if full else "incremental"
+
+        # العلامة الجديدة تُقرأ قبل الفحوص في نفس المعاملة — ما يُكتب بعدها يتجاوزها
+        watermark = db.execute(text("""
+            SELECT (SELECT MAX(updated_at) FROM purchase_requests),
+                   (SELECT MAX(id) FROM approval_history)
+        """)).one()
+
+        # التزايدي: مجموعة الطلبات المعنية تقود كل فحص — CROSS JOIN يثبّت ترتيب الربط في SQLite
+        # فلا يختار المخطِّط فهرس الحالة ويمسح الجدول كله (فحص 2 شروطه OR على status)
+        source, params = "purchase_requests pr", {}
+        if not full:
+            source = """(
+                SELECT id FROM purchase_requests WHERE updated_at >= :since
+                UNION
+                SELECT request_id FROM approval_history WHERE id > :history_id
+            ) AS scope CROSS JOIN purchase_requests pr ON pr.id = scope.id"""
+            params = {"since": last.watermark_updated_at or "", "history_id": last.watermark_history_id or 0}
+
+        results["scanned"] = db.execute(text(f"SELECT COUNT(*) FROM {source}"), params).scalar()
+
         # ============ فحص 1: طلبات لها سجل موافقة لكن حالتها pending_manager ============
-        orphaned = db.execute(text("""
+        orphaned = db.execute(text(f"""
             SELECT pr.id, pr.order_number, pr.status, pr.current_stage, pr.next_role,
                    ah.action, ah.actor_role, ah.actor_user
-            FROM purchase_requests pr
+            FROM {source}
             INNER JOIN approval_history ah ON pr.id = ah.request_id
             WHERE pr.status = 'pending_manager'
               AND ah.action IN ('approve', 'auto-approve')
               AND ah.actor_role = 'manager'
-        """)).fetchall()
+        """), params).fetchall()
         results["checked"] += 1
 
         for row in orphaned:
@@ -56,30 +142,32 @@ def verify_data_integrity():
                 f"رغم وجود موافقة المدير! → يتم إصلاحه..."
             )
 
-            # إصلاح: نقله للمرحلة الصحيحة (المالية)
-            db.execute(text("""
+            # إصلاح: نقله للمرحلة الصحيحة (المالية) — مع updated_at و version كأي تعديل
+            db.execute(_repair("""
                 UPDATE purchase_requests 
                 SET status = 'pending_finance', 
                     current_stage = 'finance', 
-                    next_role = 'finance'
+                    next_role = 'finance',
+                    updated_at = :now,
+                    version = version + 1
                 WHERE id = :id AND status = 'pending_manager'
-            """), {"id": req_id})
+            """), {"id": req_id, "now": datetime.now(timezone.utc)})
             results["fixed"] += 1
             results["warnings"].append(
                 f"طلب #{order_num}: تم تصحيح الحالة من pending_manager → pending_finance"
             )
 
         # ============ فحص 2: تناسق status ↔ current_stage ↔ next_role ============
-        inconsistent = db.execute(text("""
-            SELECT id, order_number, status, current_stage, next_role
-            FROM purchase_requests
-            WHERE (status = 'pending_manager' AND current_stage != 'manager')
-               OR (status = 'pending_finance' AND current_stage != 'finance')
-               OR (status = 'pending_disbursement' AND current_stage != 'disbursement')
-               OR (status = 'pending_procurement' AND current_stage != 'procurement')
-               OR (status IN ('completed', 'approved') AND current_stage != 'done')
-               OR (status = 'rejected' AND current_stage NOT IN ('done', 'rejected', 'manager', 'finance', 'disbursement'))
-        """)).fetchall()
+        inconsistent = db.execute(text(f"""
+            SELECT pr.id, pr.order_number, pr.status, pr.current_stage, pr.next_role
+            FROM {source}
+            WHERE ((pr.status = 'pending_manager' AND pr.current_stage != 'manager')
+               OR (pr.status = 'pending_finance' AND pr.current_stage != 'finance')
+               OR (pr.status = 'pending_disbursement' AND pr.current_stage != 'disbursement')
+               OR (pr.status = 'pending_procurement' AND pr.current_stage != 'procurement')
+               OR (pr.status IN ('completed', 'approved') AND pr.current_stage != 'done')
+               OR (pr.status = 'rejected' AND pr.current_stage NOT IN ('done', 'rejected', 'manager', 'finance', 'disbursement')))
+        """), params).fetchall()
         results["checked"] += 1
 
         for row in inconsistent:
@@ -96,36 +184,47 @@ def verify_data_integrity():
             }
             if status in corrections:
                 new_stage, new_role = corrections[status]
-                db.execute(text("""
+                db.execute(_repair("""
                     UPDATE purchase_requests 
-                    SET current_stage = :stage, next_role = :role
+                    SET current_stage = :stage, next_role = :role,
+                        updated_at = :now, version = version + 1
                     WHERE id = :id
-                """), {"stage": new_stage, "role": new_role, "id": req_id})
+                """), {"stage": new_stage, "role": new_role, "id": req_id, "now": datetime.now(timezone.utc)})
                 results["fixed"] += 1
                 results["warnings"].append(
                     f"طلب #{order_num}: تصحيح stage ({stage}→{new_stage}), role ({role}→{new_role})"
                 )
 
         # ============ فحص 3: طلبات مرفوضة لكن بدون rejection_note ============
-        rejected_no_note = db.execute(text("""
+        rejected_no_note = db.execute(text(f"""
             SELECT pr.id, pr.order_number
-            FROM purchase_requests pr
+            FROM {source}
             WHERE pr.status = 'rejected' AND (pr.rejection_note IS NULL OR pr.rejection_note = '')
               AND NOT EXISTS (
                   SELECT 1 FROM approval_history ah 
                   WHERE ah.request_id = pr.id AND ah.action = 'reject' AND ah.note IS NOT NULL AND ah.note != ''
               )
-        """)).fetchall()
+        """), params).fetchall()
         results["checked"] += 1
 
         for row in rejected_no_note:
             results["warnings"].append(f"طلب #{row[1]}: مرفوض بدون سبب!")
 
         if results["fixed"] > 0:
-            db.commit()
+            # الإصلاحات تمت بـ SQL مباشر → إعادة مزامنة صندوق العمل والنسخ المجمّدة
+            rebuild_work_queue(db)
+            drop_snapshots(db)
+
+        results["seconds"] = round(time.perf_counter() - start, 3)
+        _record_run(db, results, watermark, started_at)
+        db.commit()
+        if results["fixed"] > 0:
             logger.info(f"✅ فحص السلامة: تم إصلاح {results['fixed']} مشكلة")
         else:
-            logger.info("✅ فحص السلامة: البيانات سليمة")
+            logger.info(
+                f"✅ فحص السلامة ({results['mode']}، {results['scanned']} طلب، "
+                f"{results['seconds'] * 1000:.0f} ms): البيانات سليمة"
+            )
 
         return results
 
@@ -133,11 +232,56 @@ def verify_data_integrity():
         db.rollback()
         logger.error(f"❌ خطأ في فحص السلامة: {e}", exc_info=True)
         results["errors"].append(str(e))
+        results["seconds"] = round(time.perf_counter() - start, 3)
+        try:
+            _record_run(db, results, (None, None), started_at)
+            db.commit()
+        except Exception:
+            db.rollback()
         return results
     finally:
         db.close()
 
 
+def _record_run(db, results, watermark, started_at):
+    """تسجيل التشغيل (وتقليم السجل القديم). تشغيل فاشل يُسجَّل بلا علامة ولا يُعتمد كأساس"""
+    db.add(IntegrityRun(
+        started_at=started_at,
+        mode=results["mode"] or "full",
+        seconds=results["seconds"],
+        scanned=results["scanned"],
+        fixed=results["fixed"],
+        warnings=json.dumps(results["warnings"][:RUN_WARNINGS_LIMIT], ensure_ascii=False) if results["warnings"] else None,
+        errors=json.dumps(results["errors"], ensure_ascii=False) if results["errors"] else None,
+        watermark_updated_at=str(watermark[0]) if watermark[0] is not None else None,
+        watermark_history_id=watermark[1],
+    ))
+    db.flush()
+    keep_from = db.query(IntegrityRun.id).order_by(IntegrityRun.id.desc()) \
+        .offset(max(config.INTEGRITY_RUNS_KEEP, 1) - 1).limit(1).scalar()
+    if keep_from:
+        db.query(IntegrityRun).filter(IntegrityRun.id < keep_from).delete(synchronize_session=False)
+
+
+def serialize_run(run):
+    return {
+        "id": run.id,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "mode": run.mode,
+        "seconds": run.seconds,
+        "scanned": run.scanned,
+        "fixed": run.fixed,
+        "warnings": json.loads(run.warnings) if run.warnings else [],
+        "errors": json.loads(run.errors) if run.errors else [],
+        "watermark": {"updated_at": run.watermark_updated_at, "history_id": run.watermark_history_id},
+    }
+
+
+def recent_runs(db, limit=20):
+    """آخر تشغيلات الفحص (الأحدث أولاً)"""
+    return [serialize_run(r) for r in db.query(IntegrityRun).order_by(IntegrityRun.id.desc()).limit(limit)]
+
+
 def protect_approved_requests():
     """
     حماية الطلبات المعتمدة من التعديل العرضي.
@@ -160,57 +304,79 @@ def protect_approved_requests():
         db.close()
 
 
+def _level_sql(column):
+    """مستوى الحالة في SQL (CASE من STATUS_LEVELS — ثوابت لا مدخلات مستخدم)"""
+    whens = " ".join(f"WHEN '{status}' THEN {level}" for status, level in STATUS_LEVELS.items())
+    return f"CASE {column} {whens} ELSE -1 END"
+
+
 def check_status_regression(snapshot):
     """
     التحقق من أن الطلبات المتقدمة لم ترجع لمراحل سابقة.
+    الـ snapshot يُحمَّل في جدول مؤقت (executemany واحد)، ثم join واحد يكشف التراجع
+    و UPDATE ... FROM واحد يصلحه — عدد الاستعلامات ثابت مهما كبر عدد الطلبات.
     Args:
         snapshot: dict من protect_approved_requests()
     Returns:
         list من الطلبات المتضررة
     """
-    db = SessionLocal()
+    # حالة قديمة بلا مستوى (-1) لا يمكن أن "تتراجع" — لا داعي لتحميلها
+    rows = [
+        {"id": req_id, "status": status, "level": STATUS_LEVELS[status]}
+        for req_id, status in snapshot.items() if status in STATUS_LEVELS
+    ]
+    if not rows:
+        return []
+
+    db = write_session()  # قراءة ثم كتابة في نفس اللقطة: BEGIN IMMEDIATE
     regressions = []
     try:
-        for req_id, old_status in snapshot.items():
-            row = db.execute(text(
-                "SELECT status FROM purchase_requests WHERE id = :id"
-            ), {"id": req_id}).fetchone()
-
-            if row and row[0] != old_status:
-                # تحقق إذا الحالة الجديدة أقل من القديمة
-                status_order = {
-                    "pending_manager": 0,
-                    "pending_finance": 1,
-                    "pending_disbursement": 2,
-                    "pending_procurement": 3,
-                    "completed": 4,
-                    "approved": 4,
-                }
-                old_level = status_order.get(old_status, -1)
-                new_level = status_order.get(row[0], -1)
-
-                if new_level < old_level:
-                    regressions.append({
-                        "id": req_id,
-                        "old_status": old_status,
-                        "new_status": row[0],
-                    })
-                    logger.error(
-                        f"🚨 تراجع حالة الطلب #{req_id}: {old_status} → {row[0]}!"
-                    )
-                    # إصلاح تلقائي: إعادة الحالة القديمة
-                    db.execute(text(
-                        "UPDATE purchase_requests SET status = :status WHERE id = :id"
-                    ), {"status": old_status, "id": req_id})
+        db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS status_snapshot "
+            "(id INTEGER PRIMARY KEY, status TEXT NOT NULL, level INTEGER NOT NULL)"
+        ))
+        db.execute(text("DELETE FROM temp.status_snapshot"))
+        db.execute(text(
+            "INSERT INTO temp.status_snapshot (id, status, level) VALUES (:id, :status, :level)"
+        ), rows)
+
+        regressed = db.execute(text(f"""
+            SELECT s.id, s.status, pr.status
+            FROM temp.status_snapshot s
+            JOIN purchase_requests pr ON pr.id = s.id
+            WHERE {_level_sql("pr.status")} < s.level
+            ORDER BY s.id
+        """)).fetchall()
+        regressions = [
+            {"id": req_id, "old_status": old_status, "new_status": new_status}
+            for req_id, old_status, new_status in regressed
+        ]
 
         if regressions:
-            db.commit()
-            logger.warning(f"🛡️ تم حماية {len(regressions)} طلب من تراجع الحالة")
+            for r in regressions[:REGRESSION_LOG_LIMIT]:
+                logger.error(f"🚨 تراجع حالة الطلب #{r['id']}: {r['old_status']} → {r['new_status']}!")
+            if len(regressions) > REGRESSION_LOG_LIMIT:
+                logger.error(f"🚨 ... و {len(regressions) - REGRESSION_LOG_LIMIT} طلب آخر")
+            # إصلاح تلقائي: إعادة الحالة القديمة — مع updated_at و version كأي تعديل
+            # (يُبطل ETag التفاصيل، ويرد العميل الذي يحمل النسخة المتراجعة بـ 409)
+            db.execute(_repair(f"""
+                UPDATE purchase_requests
+                SET status = s.status, updated_at = :now, version = version + 1
+                FROM temp.status_snapshot s
+                WHERE purchase_requests.id = s.id
+                  AND {_level_sql("purchase_requests.status")} < s.level
+            """), {"now": datetime.now(timezone.utc)})
+            rebuild_work_queue(db)
+            drop_snapshots(db)
 
+        db.execute(text("DROP TABLE temp.status_snapshot"))
+        db.commit()
+        if regressions:
+            logger.warning(f"🛡️ تم حماية {len(regressions)} طلب من تراجع الحالة")
         return regressions
     except Exception as e:
         db.rollback()
         logger.error(f"خطأ في فحص التراجع: {e}")
-        return regressions
+        return []
     finally:
         db.close()
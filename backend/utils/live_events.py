@@ -0,0 +1,125 @@
+"""
+إشارات التحديث الحي (SSE) — بلا وسيط رسائل
+
+القناة (notifications / queue) تُعلَّم داخل المعاملة عبر mark_changed(db, channel)،
+وتُنشر بعد commit فقط (after_commit على SessionLocal):
+    - داخل العملية: threading.Condition يوقظ كل اتصالات البث فوراً
+    - بين العمليات (عدة workers): ملف صغير لكل قناة في LIVE_SIGNAL_DIR يُستبدل عند النشر،
+      و thread واحد لكل عملية يفحص stat كل LIVE_POLL_SECONDS
+الإشارة لا تحمل بيانات — المستمع يقرأ الجديد من القاعدة بنفسه.
+"""
+
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+from .. import config
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("notifications", "queue")
+
+_PENDING_KEY = "live_channels"
+
+_cond = threading.Condition()
+_versions = dict.fromkeys(CHANNELS, 0)  # رقم تسلسلي محلي لكل قناة
+_stamps = {}                            # آخر stat معروف لملف كل قناة
+_watcher = None
+
+
+def mark_changed(db, channel):
+    """تعليم قناة كمتغيرة — تُنشر بعد commit وتُلغى مع rollback"""
+    db.info.setdefault(_PENDING_KEY, set()).add(channel)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_after_commit(session):
+    channels = session.info.pop(_PENDING_KEY, None)
+    if channels:
+        publish(*channels)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _signal_path(channel):
+    return os.path.join(config.LIVE_SIGNAL_DIR, f"live-{channel}.signal")
+
+
+def _stamp(channel):
+    try:
+        st = os.stat(_signal_path(channel))
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _wake(channels):
+    with _cond:
+        for channel in channels:
+            _versions[channel] += 1
+        _cond.notify_all()
+
+
+def publish(*channels):
+    """إيقاظ المستمعين في هذه العملية وإشعار العمليات الأخرى عبر ملف الإشارة"""
+    _wake(channels)
+    for channel in channels:
+        path = _signal_path(channel)
+        try:
+            os.makedirs(config.LIVE_SIGNAL_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp, "w") as f:
+                f.write(f"{os.getpid()}:{time.time_ns()}")
+            os.replace(tmp, path)  # inode جديد مع كل نشر
+            _stamps[channel] = _stamp(channel)
+        except OSError as e:
+            logger.warning(f"تعذر كتابة إشارة {channel}: {e}")
+
+
+def _watch():
+    while True:
+        time.sleep(config.LIVE_POLL_SECONDS)
+        changed = []
+        for channel in CHANNELS:
+            stamp = _stamp(channel)
+            if stamp != _stamps.get(channel):
+                _stamps[channel] = stamp
+                changed.append(channel)
+        if changed:
+            _wake(changed)
+
+
+def _ensure_watcher():
+    global _watcher
+    if _watcher is not None:
+        return
+    with _cond:
+        if _watcher is None:
+            for channel in CHANNELS:
+                _stamps.setdefault(channel, _stamp(channel))
+            _watcher = threading.Thread(target=_watch, name="live-events-watcher", daemon=True)
+            _watcher.start()
+
+
+def versions():
+    """لقطة الأرقام التسلسلية الحالية — نقطة البداية لـ wait_for_change"""
+    _ensure_watcher()
+    with _cond:
+        return dict(_versions)
+
+
+def wait_for_change(seen, timeout):
+    """
+    انتظار تغيّر أي قناة عن اللقطة seen (أو انتهاء المهلة).
+    Returns:
+        (اللقطة الجديدة، مجموعة القنوات التي تغيرت — فارغة عند انتهاء المهلة)
+    """
+    with _cond:
+        _cond.wait_for(lambda: _versions != seen, timeout)
+        current = dict(_versions)
+    return current, {c for c in CHANNELS if current[c] != seen.get(c)}
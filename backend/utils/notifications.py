@@ -1,6 +1,14 @@
+
+from collections import Counter
 from typing import Iterable, Optional
 from datetime import datetime, timezone
+from sqlalchemy import insert
+from .. import config
 from ..models import Notification
+from ..services.counters import bump_many, unread_counter_key
+from ..services.notification_events import add_events
+from .live_events import mark_changed
+from .watchers import expand_audience
 
 
 def create_notification(
@@ -15,26 +23,60 @@ def create_notification(
     actor_role: Optional[str] = None,
     note: Optional[str] = None,
 ):
-    """إنشاء إشعارات متعددة وتخزينها في قاعدة البيانات."""
-    created = []
-    now = datetime.now(timezone.utc)
-    for recipient in recipients:
-        if not recipient:
-            continue
-        notif = Notification(
-            request_id=request_id,
-            recipient_username=recipient,
-            title=title,
-            message=message,
-            action_type=action_type,
-            actor_username=actor_username,
-            actor_role=actor_role,
-            note=note,
-            created_at=now,
-        )
-        db.add(notif)
-        created.append(notif)
-    return created
+    """
+    إنشاء إشعار وتخزينه في قاعدة البيانات (لا يعمل commit).
+    recipients: أسماء مستخدمين أو Audience (مستخدمون + أدوار) من utils/watchers.py
+    """
+    return create_notifications(db, [dict(
+        request_id=request_id, recipients=recipients, title=title, message=message,
+        action_type=action_type, actor_username=actor_username,
+        actor_role=actor_role, note=note,
+    )])
 
 
+def create_notifications(db, notifications):
+    """
+    كتابة عدة إشعارات دفعة واحدة حسب NOTIFICATIONS_MODE:
+      rows   → صف لكل مستلم بأمر INSERT واحد (executemany)
+      events → حدث واحد لكل إشعار + جمهوره
+    Returns:
+        int: عدد الصفوف/الأحداث المكتوبة
+    """
+    unread = Counter()
+    if config.NOTIFICATIONS_MODE == "events":
+        count = add_events(db, notifications)
+        for n in notifications:
+            unread.update(set(expand_audience(db, n["recipients"])))
+    else:
+        rows = _notification_rows(db, notifications)
+        if rows:
+            db.execute(insert(Notification), rows)
+        count = len(rows)
+        unread.update(row["recipient_username"] for row in rows)
+    if count:
+        # عدّاد unread:<username> لكل مستلم — UPSERT واحد
+        bump_many(db, {unread_counter_key(u): n for u, n in unread.items() if u})
+        mark_changed(db, "notifications")
+    return count
 
+
+def _notification_rows(db, notifications):
+    """صف لكل مستلم"""
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "request_id": n["request_id"],
+            "recipient_username": recipient,
+            "title": n["title"],
+            "message": n["message"],
+            "action_type": n["action_type"],
+            "actor_username": n.get("actor_username"),
+            "actor_role": n.get("actor_role"),
+            "note": n.get("note"),
+            "is_read": False,
+            "created_at": now,
+        }
+        for n in notifications
+        for recipient in expand_audience(db, n["recipients"])
+        if recipient
+    ]
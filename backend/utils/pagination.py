@@ -0,0 +1,81 @@
+"""
+ترقيم الصفحات بالمؤشر (Keyset Pagination)
+بدلاً من OFFSET: العميل يُرسل مؤشراً معتماً (opaque) يمثل آخر صف استلمه،
+والاستعلام يبدأ بعده مباشرة عبر الفهرس — تكلفة الصفحة ثابتة مهما كبر الجدول.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+# حجم الصفحة الافتراضي والحد الأقصى
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PageArgsError(ValueError):
+    """معاملات ترقيم غير صالحة (limit أو cursor)"""
+
+
+def encode_cursor(*values):
+    """ترميز قيم المفتاح (مثل id أو action_at, id) في مؤشر معتم"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, types):
+    """
+    فك ترميز المؤشر وتحويل قيمه حسب types (مثل (int,) أو (datetime, int)).
+    يرفع PageArgsError إذا كان المؤشر تالفاً أو لا يطابق الشكل المتوقع.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(token)
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for t, v in zip(types, values)
+        ]
+    except (TypeError, ValueError, UnicodeError):
+        raise PageArgsError("مؤشر الصفحة غير صالح")
+
+
+def parse_page_args(args, cursor_types=(int,)):
+    """
+    قراءة ?limit=&cursor= من معاملات الطلب.
+    Returns:
+        None إذا لم يطلب العميل الترقيم (السلوك القديم: القائمة كاملة)،
+        وإلا (limit, cursor_values أو None للصفحة الأولى)
+    """
+    raw_limit = args.get("limit")
+    raw_cursor = args.get("cursor")
+    if raw_limit is None and raw_cursor is None:
+        return None
+
+    try:
+        limit = int(raw_limit) if raw_limit not in (None, "") else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise PageArgsError("قيمة limit غير صالحة")
+    if limit < 1:
+        raise PageArgsError("قيمة limit غير صالحة")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = decode_cursor(raw_cursor, cursor_types) if raw_cursor else None
+    return limit, cursor
+
+
+def fetch_page(query, limit):
+    """
+    جلب صفحة واحدة فقط (limit + 1 صف لمعرفة وجود صفحة تالية).
+    Returns:
+        (rows, has_more)
+    """
+    rows = query.limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def page_response(items, next_cursor):
+    """الشكل الموحّد لاستجابة الصفحة"""
+    return {"requests": items, "next_cursor": next_cursor}
@@ -0,0 +1,61 @@
+"""
+التحكم المتفائل بالتزامن (Optimistic Concurrency) على طلبات الشراء
+PurchaseRequest.version هو version_id_col: كل UPDATE عبر ORM يصبح compare-and-swap
+(WHERE id = ? AND version = ?) ويرفع StaleDataError إذا سبقه تعديل آخر.
+
+العميل يرسل النسخة التي رآها ("version" في الجسم أو If-Match):
+    - لا تطابق النسخة الحالية  → 409 مع الحالة الحالية، دون أي تعديل
+    - بلا نسخة               → يبقى CAS عند الكتابة يحمي من التعديلين المتزامنين
+"""
+
+from flask import request, jsonify
+from ..models import PurchaseRequest
+
+STALE_REQUEST_ERROR = "تم تعديل الطلب من مستخدم آخر، حدّث الصفحة وأعد المحاولة"
+
+
+def expected_version(data):
+    """
+    النسخة المتوقعة من الجسم أو من If-Match (مثل "3" أو W/"3").
+    None إن لم تُرسل — ValueError إن لم تكن رقماً.
+    """
+    value = data.get("version")
+    if value is None:
+        header = (request.headers.get("If-Match") or "").strip()
+        if not header or header == "*":
+            return None
+        value = header.removeprefix("W/").strip('"')
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return int(value)
+
+
+def is_stale(pr, expected):
+    return expected is not None and pr.version != expected
+
+
+def version_conflict(db, request_id):
+    """
+    استجابة 409 بالحالة الحالية للطلب — تعيد المعاملة (rollback) أولاً
+    لتقرأ ما كتبه الطرف الآخر لا ما في الجلسة.
+    """
+    db.rollback()
+    current = db.query(
+        PurchaseRequest.id, PurchaseRequest.version, PurchaseRequest.status,
+        PurchaseRequest.current_stage, PurchaseRequest.next_role,
+        PurchaseRequest.procurement_status, PurchaseRequest.total_amount,
+        PurchaseRequest.updated_at,
+    ).filter(PurchaseRequest.id == request_id).first()
+    body = {"error": STALE_REQUEST_ERROR}
+    if current is not None:
+        body["current"] = {
+            "id": current.id,
+            "version": current.version,
+            "status": current.status,
+            "current_stage": current.current_stage,
+            "next_role": current.next_role,
+            "procurement_status": current.procurement_status,
+            "total_amount": float(current.total_amount or 0.0),
+            "updated_at": current.updated_at.isoformat() if current.updated_at else None,
+        }
+    return jsonify(body), 409
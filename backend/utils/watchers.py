@@ -1,30 +1,39 @@
-from ..models import PurchaseRequest, User
+from collections import namedtuple
+from ..models import PurchaseRequest
+from ..services.user_directory import get_user_directory
 
+# جمهور إشعار: مستخدمون بأسمائهم + أدوار كاملة (تُحل إلى مستخدمين عند الحاجة)
+Audience = namedtuple("Audience", "users roles")
 
-def get_request_watchers(db, pr: PurchaseRequest):
-    """إرجاع قائمة المستخدمين الذين يجب إعلامهم بالتغييرات على الطلب."""
-    recipients = set()
+# الأدوار التي تُعلَم بكل تغيير على أي طلب
+WATCHER_ROLES = ("finance", "disbursement")
+
+
+def get_request_audience(db, pr: PurchaseRequest):
+    """جمهور الطلب: المنشئ + المدير المباشر لنفس الإدارة + أدوار المالية وأمر الصرف."""
+    users = set()
     if pr.created_by:
-        recipients.add(pr.created_by)
+        users.add(pr.created_by)
 
     # المدير المباشر لنفس الإدارة
-    manager = (
-        db.query(User)
-        .filter(User.role == "manager", User.department == pr.department)
-        .first()
-    )
+    manager = get_user_directory(db).department_manager(pr.department)
     if manager:
-        recipients.add(manager.username)
+        users.add(manager.username)
 
-    # جميع مستخدمي المالية
-    for finance_user in db.query(User).filter(User.role == "finance"):
-        recipients.add(finance_user.username)
+    return Audience(frozenset(users), WATCHER_ROLES)
 
-    # أمر الصرف
-    for disbursement_user in db.query(User).filter(User.role == "disbursement"):
-        recipients.add(disbursement_user.username)
 
+def expand_audience(db, audience):
+    """تحويل Audience (أو قائمة أسماء) إلى قائمة أسماء مستخدمين."""
+    if not isinstance(audience, Audience):
+        return list(audience)
+    directory = get_user_directory(db)
+    recipients = set(audience.users)
+    for role in audience.roles:
+        recipients.update(directory.usernames_with_role(role))
     return list(recipients)
 
 
-
+def get_request_watchers(db, pr: PurchaseRequest):
+    """إرجاع قائمة المستخدمين الذين يجب إعلامهم بالتغييرات على الطلب."""
+    return expand_audience(db, get_request_audience(db, pr))
@@ -0,0 +1,261 @@
+"""
+تنسيق الكتابة على SQLite (Write Queue)
+مع عدة workers كانت معاملات الكتابة تبدأ DEFERRED (قراءة أولاً ثم ترقية القفل عند أول
+INSERT/UPDATE)، والترقية تفشل فوراً بـ "database is locked" إذا سبقها كاتب آخر —
+فلا ينفع busy_timeout. هنا:
+
+    - pysqlite لا يبدأ المعاملات بنفسه (isolation_level=None)، وحدث begin يرسل BEGIN صراحة
+    - write_session(): كل معاملاتها BEGIN IMMEDIATE — قفل الكتابة يُحجز في البداية
+      (ينتظر حتى busy_timeout) ثم لا تفشل المعاملة في منتصفها
+    - فشل BEGIN IMMEDIATE يُعاد WRITE_RETRY_ATTEMPTS مرة بتراجع أسّي مع jitter،
+      ثم WriteBusyError (503 بدلاً من 500)
+    - run_write(fn, group=True): الكتابات الصغيرة (مثل تعليم إشعار كمقروء) تُجمع خلال
+      WRITE_GROUP_COMMIT_MS في معاملة واحدة و commit واحد، كل عملية داخل SAVEPOINT
+    - write_metrics(): زمن انتظار القفل والمحاولات والدفعات (لكل عملية/worker)
+"""
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+BEGIN_OPTION = "sqlite_begin"
+
+# حدود مدرّج زمن انتظار القفل (مللي ثانية)
+WAIT_BUCKETS_MS = (1, 10, 100, 1000, 5000)
+
+
+class WriteBusyError(RuntimeError):
+    """تعذر حجز قفل الكتابة بعد كل المحاولات"""
+
+
+class WriteMetrics:
+    """مقاييس الكتابة في هذه العملية"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.begins = 0
+            self.retries = 0
+            self.failures = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.group_batches = 0
+            self.group_ops = 0
+
+    def record_begin(self, wait, retries):
+        wait_ms = wait * 1000
+        with self._lock:
+            self.begins += 1
+            self.retries += retries
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.buckets[next((i for i, b in enumerate(WAIT_BUCKETS_MS) if wait_ms <= b), -1)] += 1
+
+    def record_failure(self, retries):
+        with self._lock:
+            self.failures += 1
+            self.retries += retries
+
+    def record_group(self, ops):
+        with self._lock:
+            self.group_batches += 1
+            self.group_ops += ops
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "pid": os.getpid(),
+                "begins": self.begins,
+                "retries": self.retries,
+                "failures": self.failures,
+                "lock_wait_total_ms": round(self.wait_total * 1000, 2),
+                "lock_wait_avg_ms": round(self.wait_total * 1000 / self.begins, 3) if self.begins else 0.0,
+                "lock_wait_max_ms": round(self.wait_max * 1000, 2),
+                "lock_wait_histogram": dict(zip(labels, self.buckets)),
+                "group_batches": self.group_batches,
+                "group_ops": self.group_ops,
+            }
+
+
+metrics = WriteMetrics()
+_write_engine = None
+
+
+def _is_busy(exc):
+    text = str(getattr(exc, "orig", exc)).lower()
+    return "locked" in text or "busy" in text
+
+
+def _begin_immediate(conn):
+    attempts = max(1, config.WRITE_RETRY_ATTEMPTS)
+    start = time.perf_counter()
+    for attempt in range(attempts):
+        try:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            metrics.record_begin(time.perf_counter() - start, attempt)
+            return
+        except OperationalError as e:
+            if not _is_busy(e) or attempt == attempts - 1:
+                metrics.record_failure(attempt)
+                if _is_busy(e):
+                    logger.warning(f"تعذر حجز قفل الكتابة بعد {attempts} محاولة")
+                    raise WriteBusyError("قاعدة البيانات مشغولة") from e
+                raise
+            backoff = config.WRITE_RETRY_BACKOFF_MS / 1000 * (2 ** attempt)
+            time.sleep(backoff * (0.5 + random.random()))
+
+
+def install_write_coordination(engine):
+    """BEGIN صريح لكل معاملة (IMMEDIATE لجلسات الكتابة). لـ SQLite فقط. يُرجع محرك الكتابة."""
+    global _write_engine
+    if engine.dialect.name != "sqlite":
+        _write_engine = engine
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_conn, connection_record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        if conn.get_execution_options().get(BEGIN_OPTION) == "IMMEDIATE":
+            _begin_immediate(conn)
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+    _write_engine = engine.execution_options(**{BEGIN_OPTION: "IMMEDIATE"})
+    return _write_engine
+
+
+def write_session():
+    """
+    جلسة SessionLocal مرتبطة بمحرك الكتابة — كل معاملة فيها BEGIN IMMEDIATE.
+    المعاملة الأولى تبدأ هنا فوراً: WriteBusyError تخرج قبل try الخاص بالمسار
+    فيحوّلها معالج التطبيق إلى 503 بدلاً من except Exception → 500.
+    """
+    from ..database import SessionLocal
+    db = SessionLocal(bind=_write_engine)
+    try:
+        db.connection()
+    except Exception:
+        db.close()
+        raise
+    return db
+
+
+class GroupCommitter:
+    """
+    يجمع عمليات الكتابة الصغيرة خلال window ثوانٍ (أو max_ops عملية) في معاملة واحدة.
+    كل عملية fn(db) داخل SAVEPOINT: فشلها لا يُسقط بقية الدفعة.
+    """
+
+    def __init__(self, session_factory, window, max_ops=200):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_ops = max_ops
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn):
+        future = Future()
+        self._queue.put((fn, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                    self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_ops:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            db = self.session_factory()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        done = []
+        try:
+            for fn, future in batch:
+                savepoint = db.begin_nested()
+                try:
+                    result = fn(db)
+                    savepoint.commit()
+                    done.append((future, result))
+                except Exception as e:
+                    savepoint.rollback()
+                    future.set_exception(e)
+            db.commit()
+            metrics.record_group(len(batch))
+            for future, result in done:
+                future.set_result(result)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"فشل commit الدفعة ({len(batch)} عملية): {e}")
+            for future, _ in done:
+                future.set_exception(e)
+        finally:
+            db.close()
+
+
+_committer = None
+
+
+def _group_committer():
+    global _committer
+    if _committer is None:
+        _committer = GroupCommitter(
+            write_session, config.WRITE_GROUP_COMMIT_MS / 1000, config.WRITE_GROUP_MAX_OPS,
+        )
+    return _committer
+
+
+def run_write(fn, group=False):
+    """
+    تنفيذ fn(db) في معاملة كتابة وإرجاع نتيجتها بعد commit.
+    group=True مع WRITE_GROUP_COMMIT_MS > 0: تشارك الكتابات المتزامنة commit واحداً.
+    """
+    if group and config.WRITE_GROUP_COMMIT_MS > 0:
+        return _group_committer().submit(fn).result(timeout=config.WRITE_GROUP_TIMEOUT_SECONDS)
+    db = write_session()
+    try:
+        result = fn(db)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def write_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+قياس النسخ التزايدية: لقطة كاملة مقابل حلقة delta بعد يوم عمل صغير، مع حجم القاعدة.
+
+لكل حجم تُنشأ قاعدة مؤقتة فيها N طلب (بأصنافها وسجلها)، ثم:
+    full    backup_database — لقطة كاملة مضغوطة (كما قبل النسخ التزايدية)
+    delta   backup_database(incremental=True) بعد تعديل --touch طلب على قاعدة سلسلة موجودة
+ويُطبع لكل منهما الزمن وحجم الملف الناتج، وعدد الصفحات المتغيرة في الحلقة.
+
+التشغيل:
+    python benchmarks/bench_backup.py --rows 10000 100000 --touch 200
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def seed(path, rows):
+    from sqlalchemy import create_engine, insert
+    from backend.database import Base
+    from backend.models import PurchaseRequest, PurchaseItem, ApprovalHistory
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(PurchaseRequest), [{
+            "requester": f"موظف {i}", "department": "مالية", "delivery_address": "المكتب",
+            "delivery_date": "2026-03-01", "project_code": "BACKUP", "order_number": f"BACKUP-{i:07d}",
+            "currency": "SYP", "total_amount": 30.0, "status": "pending_finance",
+            "current_stage": "finance", "next_role": "finance", "created_by": "requester_finance",
+        } for i in range(rows)])
+        conn.execute(insert(PurchaseItem), [{
+            "request_id": i + 1, "item_name": "صنف", "specification": "", "unit": "قطعة",
+            "quantity": 3, "price": 10.0, "total": 30.0,
+        } for i in range(rows)])
+        conn.execute(insert(ApprovalHistory), [{
+            "request_id": i + 1, "actor_role": "manager", "actor_user": "manager_finance", "action": "approve",
+        } for i in range(rows)])
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+
+def touch(path, rows, count):
+    """يوم عمل: تغيير حالة count طلب متفرقة + سطر سجل لكل منها"""
+    conn = sqlite3.connect(path)
+    step = max(rows // count, 1)
+    ids = list(range(1, rows + 1, step))[:count]
+    conn.executemany("UPDATE purchase_requests SET status = 'approved_finance' WHERE id = ?", [(i,) for i in ids])
+    conn.executemany(
+        "INSERT INTO approval_history (request_id, actor_role, actor_user, action, created_at) "
+        "VALUES (?, 'finance', 'finance', 'approve', CURRENT_TIMESTAMP)",
+        [(i,) for i in ids],
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--touch", type=int, default=200, help="طلبات معدّلة بين نسختين")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    from backend.utils import backup
+
+    workdir = tempfile.mkdtemp(prefix="bench_backup_")
+    print(f"{'طلبات':>8}  {'قاعدة (MB)':>10}  {'full (ms)':>10}  {'full (KB)':>10}  "
+          f"{'delta (ms)':>10}  {'delta (KB)':>10}  {'صفحات':>12}")
+    try:
+        for rows in args.rows:
+            path = os.path.join(workdir, f"backup_{rows}.db")
+            seed(path, rows)
+            backup.DB_FILE = path
+            backup.BACKUP_DIR = os.path.join(workdir, f"backups_{rows}")
+
+            backup.backup_database("scheduled", incremental=True)  # أساس السلسلة
+            touch(path, rows, args.touch)
+            full, full_ms = timed(lambda: backup.backup_database("manual"))
+            delta, delta_ms = timed(lambda: backup.backup_database("scheduled", incremental=True))
+            manifest = backup.read_manifest(delta)
+            print(f"{rows:>8}  {os.path.getsize(path) / 2**20:>10.1f}  {full_ms:>10.1f}  "
+                  f"{os.path.getsize(full) / 1024:>10.1f}  {delta_ms:>10.1f}  "
+                  f"{os.path.getsize(delta) / 1024:>10.1f}  "
+                  f"{manifest['changed_pages']:>5}/{manifest['page_count']:<6}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
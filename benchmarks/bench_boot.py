@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+قياس زمن إقلاع worker (create_app) مع حجم القاعدة: الإقلاع الكامل مقابل FAST_START.
+
+لكل حجم تُنشأ قاعدة مؤقتة فيها N طلب (بأصنافها وسجلها)، ثم يُقاس create_app()
+في عملية مستقلة (كما يقلع gunicorn worker):
+    full   FAST_START=0  نسخ احتياطي + inspect + فحص السلامة عند كل إقلاع
+    fast   FAST_START=1  استعلام واحد على schema_version حين يكون المخطط حديثاً
+
+التشغيل:
+    python benchmarks/bench_boot.py --rows 1000 10000 100000
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SEED_SCRIPT = """
+import sys
+from sqlalchemy import insert
+from backend.database import engine
+from backend.migrate_db import run_migrations
+from backend.models import PurchaseRequest, PurchaseItem, ApprovalHistory
+
+rows = int(sys.argv[1])
+run_migrations(force=False)
+with engine.begin() as conn:
+    conn.execute(insert(PurchaseRequest), [{
+        "requester": f"موظف {i}", "department": "مالية", "delivery_address": "المكتب",
+        "delivery_date": "2026-03-01", "project_code": "BOOT", "order_number": f"BOOT-{i:07d}",
+        "currency": "SYP", "total_amount": 30.0, "status": "pending_finance",
+        "current_stage": "finance", "next_role": "finance", "created_by": "requester_finance",
+    } for i in range(rows)])
+    conn.execute(insert(PurchaseItem), [{
+        "request_id": i + 1, "item_name": "صنف", "specification": "", "unit": "قطعة",
+        "quantity": 3, "price": 10.0, "total": 30.0,
+    } for i in range(rows)])
+    conn.execute(insert(ApprovalHistory), [{
+        "request_id": i + 1, "actor_role": "manager", "actor_user": "manager_finance", "action": "approve",
+    } for i in range(rows)])
+"""
+
+BOOT_SCRIPT = """
+import logging, time
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+from backend.app import create_app
+create_app()
+print(f"{(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+
+def _run(script, db_path, *args, fast_start="1"):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", FAST_START=fast_start,
+               JWT_SECRET_KEY="bench-secret")
+    out = subprocess.run([sys.executable, "-c", script, *args], cwd=PROJECT_ROOT, env=env,
+                         check=True, capture_output=True, text=True)
+    return out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_boot_")
+    print(f"{'طلبات':>8}  {'full (ms)':>10}  {'fast (ms)':>10}")
+    try:
+        for rows in args.rows:
+            path = os.path.join(workdir, f"boot_{rows}.db")
+            _run(SEED_SCRIPT, path, str(rows))
+            full = min(float(_run(BOOT_SCRIPT, path, fast_start="0")) for _ in range(args.repeat))
+            fast = min(float(_run(BOOT_SCRIPT, path, fast_start="1")) for _ in range(args.repeat))
+            print(f"{rows:>8}  {full:>10.1f}  {fast:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
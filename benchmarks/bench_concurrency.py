@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+قياس تزامن القرّاء مع الموافقات: إعدادات SQLite الافتراضية مقابل ملف تعريف الإنتاج.
+
+لكل ملف تعريف تُنشأ قاعدة مؤقتة مستقلة فيها N طلب، ثم تعمل لمدة محددة:
+    - كاتب واحد يحاكي الموافقة: UPDATE للطلب + صفوف إشعارات + commit
+    - عدة قرّاء يكررون استعلام قائمة الطلبات وعدّ الإشعارات
+ويُطبع لكل ملف: عدد القراءات، زمن القراءة (p50 / p99 / أقصى)، وأخطاء "database is locked".
+
+    legacy      sqlite3.connect الافتراضي (rollback journal، بلا PRAGMAs)
+    production  utils/engine_profile.py (WAL، synchronous=NORMAL، busy_timeout...)
+
+التشغيل (يُفضّل مجلد على قرص حقيقي لا tmpfs):
+    python benchmarks/bench_concurrency.py --rows 20000 --readers 8 --seconds 10 --dir /var/tmp
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+LIST_SQL = (
+    "SELECT id, order_number, status, total_amount FROM purchase_requests "
+    "WHERE status = 'pending_manager' ORDER BY id DESC LIMIT 50"
+)
+COUNT_SQL = "SELECT COUNT(*) FROM notifications WHERE recipient_username = ? AND is_read = 0"
+
+
+def seed(path, rows):
+    from sqlalchemy import create_engine, insert
+    from backend.database import Base
+    from backend.models import PurchaseRequest
+
+    engine = create_engine(f"sqlite:///{path}")  # بلا ملف التعريف — نفس المخطط فقط
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(PurchaseRequest), [{
+            "requester": f"موظف {i}", "department": "مالية",
+            "delivery_address": "المكتب", "delivery_date": "2026-03-01",
+            "project_code": "BENCH", "order_number": f"BENCH-{i:07d}",
+            "currency": "SYP", "total_amount": 1000.0 + i,
+            "status": "pending_manager", "current_stage": "manager", "next_role": "manager",
+            "created_by": "requester_finance",
+        } for i in range(rows)])
+    engine.dispose()
+
+
+def connect(path, profile):
+    from backend.utils.engine_profile import configure_connection
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    if profile == "production":
+        configure_connection(conn)
+    return conn
+
+
+def writer(path, profile, rows, stop, stats, hold):
+    conn = connect(path, profile)
+    i = 0
+    while not stop.is_set():
+        i += 1
+        try:
+            conn.execute(
+                "UPDATE purchase_requests SET status = 'pending_finance', updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = ?", (1 + i % rows,),
+            )
+            conn.executemany(
+                "INSERT INTO notifications (recipient_username, title, message, action_type, is_read, created_at) "
+                "VALUES (?, 'تحديث', 'تمت الموافقة', 'approve', 0, CURRENT_TIMESTAMP)",
+                [(f"user_{k}",) for k in range(20)],
+            )
+            time.sleep(hold)  # عمل التطبيق داخل المعاملة
+            conn.commit()
+            stats["writes"] += 1
+        except sqlite3.OperationalError:
+            conn.rollback()
+            stats["write_errors"] += 1
+    conn.close()
+
+
+def reader(path, profile, stop, latencies, errors):
+    conn = connect(path, profile)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            conn.execute(LIST_SQL).fetchall()
+            conn.execute(COUNT_SQL, ("user_1",)).fetchone()
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors.append(1)
+    conn.close()
+
+
+def run(profile, workdir, args):
+    path = os.path.join(workdir, f"{profile}.db")
+    seed(path, args.rows)
+    stop = threading.Event()
+    stats = {"writes": 0, "write_errors": 0}
+    latencies, errors = [], []
+    threads = [threading.Thread(target=writer, args=(path, profile, args.rows, stop, stats, args.hold_ms / 1000))]
+    threads += [
+        threading.Thread(target=reader, args=(path, profile, stop, latencies, errors))
+        for _ in range(args.readers)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    n = len(latencies) or 1
+
+    def pct(p):
+        return latencies[min(int(n * p), n - 1)] * 1000 if latencies else 0.0
+
+    print(f"{profile:<11} reads={len(latencies):>7}  p50={pct(0.5):7.2f} ms  p99={pct(0.99):8.2f} ms  "
+          f"max={pct(1.0):8.2f} ms  read_errors={len(errors):>5}  writes={stats['writes']:>5}  "
+          f"write_errors={stats['write_errors']}")
+    return pct(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--hold-ms", type=float, default=5, help="زمن عمل الكاتب داخل المعاملة")
+    parser.add_argument("--dir", default=None, help="مجلد القواعد المؤقتة")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_concurrency_", dir=args.dir)
+    print(f"{args.readers} قارئ + كاتب واحد لمدة {args.seconds} ث على {args.rows} طلب ({workdir})")
+    try:
+        before = run("legacy", workdir, args)
+        after = run("production", workdir, args)
+        print(f"p99 للقراءة: ×{before / max(after, 1e-9):.1f} أسرع")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+قياس أداء قوائم الطلبات: تحميل كيانات PurchaseRequest كاملة مقابل إسقاط الأعمدة.
+
+يُنشئ قاعدة SQLite مؤقتة فيها N طلب موقّع (ثلاثة تواقيع base64 لكل طلب)،
+ثم يقيس لكل طريقة: الزمن لكل صف، وحجم البيانات المقروءة من القاعدة.
+
+التشغيل:
+    python benchmarks/bench_list_projection.py --rows 50000 --sig-bytes 20000
+"""
+
+import argparse
+import base64
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _value_bytes(values):
+    """تقدير حجم القيم المقروءة (نصوص بطولها، والباقي 8 بايت)"""
+    total = 0
+    for v in values:
+        if v is None:
+            continue
+        total += len(v) if isinstance(v, (str, bytes)) else 8
+    return total
+
+
+def seed(rows, sig_bytes):
+    from sqlalchemy import insert
+    from backend.database import Base, engine
+    from backend.models import PurchaseRequest
+
+    Base.metadata.create_all(bind=engine)
+    sig = "data:image/png;base64," + base64.b64encode(os.urandom(sig_bytes * 3 // 4)).decode()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "requester": f"موظف {i}", "department": "مالية",
+                "delivery_address": "المكتب", "delivery_date": "2026-03-01",
+                "project_code": "BENCH", "order_number": f"BENCH-{i:07d}",
+                "currency": "SYP", "total_amount": 1000.0 + i,
+                "status": "completed", "current_stage": "done", "next_role": None,
+                "created_by": "requester_finance",
+                "manager_signature": sig, "finance_signature": sig,
+                "disbursement_signature": sig,
+            })
+            if len(batch) == 2000:
+                conn.execute(insert(PurchaseRequest), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(PurchaseRequest), batch)
+
+
+def run(label, fetch, to_values):
+    from backend.database import SessionLocal
+    from backend.routes.workflow import _serialize_request_summary
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        rows = fetch(db)
+        out = [_serialize_request_summary(r) for r in rows]
+        elapsed = time.perf_counter() - start
+        read = sum(_value_bytes(to_values(r)) for r in rows)
+    finally:
+        db.close()
+    n = len(out) or 1
+    print(f"{label:<12} rows={len(out):>7}  total={elapsed * 1000:9.1f} ms  "
+          f"per-row={elapsed / n * 1e6:8.2f} µs  read={read / 1024 / 1024:9.2f} MB")
+    return elapsed, read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--sig-bytes", type=int, default=20000, help="حجم كل توقيع base64 بالبايت")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_projection_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    print(f"تجهيز {args.rows} طلب موقّع (توقيع {args.sig_bytes} بايت × 3)...")
+    try:
+        seed(args.rows, args.sig_bytes)
+        _compare()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _compare():
+    from sqlalchemy import inspect
+    from backend.models import PurchaseRequest
+    from backend.services.request_projections import project_requests
+
+    def entity_values(pr):
+        state = inspect(pr)
+        return [state.attrs[c.key].loaded_value for c in state.mapper.column_attrs]
+
+    before = run(
+        "ORM entity",
+        lambda db: db.query(PurchaseRequest).order_by(PurchaseRequest.id.desc()).all(),
+        entity_values,
+    )
+    after = run(
+        "projection",
+        lambda db: project_requests(db).order_by(PurchaseRequest.id.desc()).all(),
+        lambda row: tuple(row),
+    )
+    print(f"التسريع: ×{before[0] / max(after[0], 1e-9):.1f}   "
+          f"تقليل البيانات المقروءة: ×{before[1] / max(after[1], 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+قياس نموذجي الإشعارات: صف لكل مستلم (rows) مقابل حدث + جمهور (events).
+
+يُنشئ قاعدة SQLite مؤقتة فيها N تغيير على طلبات، ويكتب كل تغيير بالنموذجين:
+    rows   → صف notifications لكل من المنشئ والمدير وكل مستخدمي المالية وأمر الصرف
+    events → حدث واحد + أربعة صفوف جمهور (منشئ، مدير، role:finance، role:disbursement)
+ثم يقارن: حجم القاعدة، زمن قائمة /api/notifications، وزمن "تعليم الكل كمقروء".
+
+التشغيل:
+    python benchmarks/bench_notifications.py --events 1000000 --watchers 6
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+REQUESTERS = 50
+DEPARTMENTS = 5
+BATCH = 5000
+
+ROWS_TABLES = ("notifications",)
+EVENTS_TABLES = ("notification_audience", "notification_read_marks",
+                 "notification_read_state", "notification_events")
+
+
+def _watchers(count):
+    half = max(count // 2, 1)
+    return ([f"finance_{i}" for i in range(half)]
+            + [f"disbursement_{i}" for i in range(count - half)])
+
+
+def seed(events, watchers):
+    from sqlalchemy import insert
+    from backend.database import Base, engine
+    from backend.models import Notification, NotificationEvent, NotificationAudience
+
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows, evs, audience = [], [], []
+
+    def flush(conn):
+        if rows:
+            conn.execute(insert(Notification), rows)
+        if evs:
+            conn.execute(insert(NotificationEvent), evs)
+            conn.execute(insert(NotificationAudience), audience)
+        rows.clear(), evs.clear(), audience.clear()
+
+    with engine.begin() as conn:
+        for i in range(1, events + 1):
+            creator = f"requester_{i % REQUESTERS}"
+            manager = f"manager_{i % DEPARTMENTS}"
+            common = {
+                "request_id": None, "title": "تحديث حالة طلب الشراء",
+                "message": f"تمت الموافقة على طلب الشراء #BENCH-{i // 4:07d}.",
+                "action_type": "approve", "actor_username": manager, "actor_role": "manager",
+                "note": None, "created_at": start + timedelta(seconds=i),
+            }
+            for recipient in [creator, manager] + watchers:
+                rows.append({**common, "recipient_username": recipient, "is_read": False})
+            evs.append({**common, "id": i})
+            audience += [
+                {"event_id": i, "kind": "user", "value": creator},
+                {"event_id": i, "kind": "user", "value": manager},
+                {"event_id": i, "kind": "role", "value": "finance"},
+                {"event_id": i, "kind": "role", "value": "disbursement"},
+            ]
+            if len(evs) >= BATCH:
+                flush(conn)
+        flush(conn)
+
+
+def file_size_without(db_path, tables):
+    """حجم نسخة من القاعدة بعد حذف جداول النموذج الآخر و VACUUM"""
+    copy = db_path + ".copy"
+    if os.path.exists(copy):
+        os.remove(copy)
+    con = sqlite3.connect(db_path)
+    con.execute(f"VACUUM INTO '{copy}'")
+    con.close()
+    con = sqlite3.connect(copy)
+    for t in tables:
+        con.execute(f"DROP TABLE IF EXISTS {t}")
+    con.commit()
+    con.execute("VACUUM")
+    con.close()
+    size = os.path.getsize(copy)
+    os.remove(copy)
+    return size
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _compare(db_path, watchers):
+    from backend.database import SessionLocal
+    from backend.models import Notification
+    from backend.services.notification_events import list_events, mark_all_events_read
+
+    size_rows = file_size_without(db_path, EVENTS_TABLES)
+    size_events = file_size_without(db_path, ROWS_TABLES)
+    print(f"{'الحجم':<10} rows={size_rows / 1024 / 1024:9.1f} MB   "
+          f"events={size_events / 1024 / 1024:9.1f} MB   ×{size_rows / max(size_events, 1):.1f}")
+
+    db = SessionLocal()
+    try:
+        def list_rows(username):
+            # نفس استعلام routes/notifications.py في الوضع rows
+            return (
+                db.query(Notification)
+                .filter(Notification.recipient_username == username)
+                .order_by(Notification.created_at.desc())
+                .limit(100)
+                .all()
+            )
+
+        for username, role in ((watchers[0], "finance"), ("requester_1", "requester")):
+            t_rows, a = timed(lambda: list_rows(username))
+            t_events, b = timed(lambda: list_events(db, username, role))
+            db.expunge_all()
+            print(f"{'القائمة':<10} {username:<16} rows={t_rows * 1000:8.2f} ms ({len(a)})   "
+                  f"events={t_events * 1000:8.2f} ms ({len(b)})")
+
+        username = watchers[0]
+        start = time.perf_counter()
+        updated = db.query(Notification).filter(
+            Notification.recipient_username == username, Notification.is_read.is_(False),
+        ).update({"is_read": True}, synchronize_session=False)
+        db.commit()
+        t_rows = time.perf_counter() - start
+        start = time.perf_counter()
+        mark_all_events_read(db, username)
+        db.commit()
+        t_events = time.perf_counter() - start
+        print(f"{'قراءة الكل':<10} {username:<16} rows={t_rows * 1000:8.2f} ms ({updated} صف)   "
+              f"events={t_events * 1000:8.2f} ms")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--watchers", type=int, default=6, help="عدد مستخدمي المالية وأمر الصرف")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_notifications_")
+    db_path = os.path.join(tmp, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    watchers = _watchers(args.watchers)
+    print(f"تجهيز {args.events} تغيير × {len(watchers) + 2} مستلم...")
+    try:
+        start = time.perf_counter()
+        seed(args.events, watchers)
+        print(f"التجهيز: {time.perf_counter() - start:.1f} s")
+        _compare(db_path, watchers)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
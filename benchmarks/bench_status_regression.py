@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+قياس فحص تراجع الحالة عند الترحيل: استعلام لكل طلب مقابل جدول مؤقت + join + UPDATE ... FROM.
+
+تُنشأ قاعدة مؤقتة فيها N طلب متقدم (بعد المدير)، ويؤخذ snapshot بـ protect_approved_requests()،
+ثم يُرجَع --regress طلب إلى pending_manager قبل كل تشغيل:
+    legacy  SELECT status لكل صف في الـ snapshot ثم UPDATE لكل متراجع (التنفيذ السابق)
+    set     check_status_regression — عدد ثابت من الاستعلامات
+ويُطبع لكل منهما الزمن وعدد أوامر SQL وعدد التراجعات المكتشفة.
+
+التشغيل:
+    python benchmarks/bench_status_regression.py --rows 10000 100000 --regress 100
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+ADVANCED = ("pending_finance", "pending_disbursement", "pending_procurement", "completed")
+
+
+def seed(rows):
+    from sqlalchemy import insert, text
+    from backend.database import Base, engine
+    from backend.models import PurchaseRequest
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM purchase_requests"))
+        conn.execute(insert(PurchaseRequest), [{
+            "requester": f"موظف {i}", "department": "مالية", "delivery_address": "المكتب",
+            "delivery_date": "2026-03-01", "project_code": "REGRESS", "order_number": f"REGRESS-{i:07d}",
+            "currency": "SYP", "total_amount": 30.0, "status": ADVANCED[i % len(ADVANCED)],
+            "current_stage": "finance", "next_role": "finance", "created_by": "requester_finance",
+        } for i in range(rows)])
+
+
+def regress(rows, count):
+    from sqlalchemy import text
+    from backend.database import engine
+
+    step = max(rows // count, 1)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE purchase_requests SET status = 'pending_manager' WHERE id % :step = 0"),
+                     {"step": step})
+
+
+def legacy_check(snapshot):
+    """التنفيذ السابق: استعلام لكل صف في الـ snapshot"""
+    from sqlalchemy import text
+    from backend.database import SessionLocal
+    from backend.services.request_details import drop_snapshots
+    from backend.services.work_queue import rebuild_work_queue
+    from backend.utils.integrity import STATUS_LEVELS
+
+    db = SessionLocal()
+    regressions = []
+    try:
+        for req_id, old_status in snapshot.items():
+            row = db.execute(text("SELECT status FROM purchase_requests WHERE id = :id"), {"id": req_id}).fetchone()
+            if row and row[0] != old_status and STATUS_LEVELS.get(row[0], -1) < STATUS_LEVELS.get(old_status, -1):
+                regressions.append(req_id)
+                db.execute(text("UPDATE purchase_requests SET status = :status WHERE id = :id"),
+                           {"status": old_status, "id": req_id})
+        if regressions:
+            rebuild_work_queue(db)
+            drop_snapshots(db)
+            db.commit()
+        return regressions
+    finally:
+        db.close()
+
+
+def measure(fn, snapshot):
+    from sqlalchemy import event
+    from backend.database import engine
+
+    statements = [0]
+
+    def _count(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        start = time.perf_counter()
+        found = fn(snapshot)
+        return (time.perf_counter() - start) * 1000, statements[0], len(found)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--regress", type=int, default=100, help="طلبات تُرجَع قبل كل تشغيل")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_regress_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'regress.db')}"
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+    logging.disable(logging.CRITICAL)
+    from backend.utils.integrity import check_status_regression, protect_approved_requests
+
+    print(f"{'طلبات':>8}  {'legacy (ms)':>12}  {'أوامر':>8}  {'set (ms)':>10}  {'أوامر':>6}  {'تراجعات':>8}")
+    try:
+        for rows in args.rows:
+            seed(rows)
+            snapshot = protect_approved_requests()
+            regress(rows, args.regress)
+            legacy_ms, legacy_stmts, legacy_found = measure(legacy_check, snapshot)
+            regress(rows, args.regress)
+            set_ms, set_stmts, set_found = measure(check_status_regression, snapshot)
+            assert legacy_found == set_found
+            print(f"{rows:>8}  {legacy_ms:>12.1f}  {legacy_stmts:>8}  {set_ms:>10.1f}  {set_stmts:>6}  {set_found:>8}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -353,7 +353,7 @@ async function updateStatus(action, note = '', signature = null) {
     try {
         const res = await apiFetch(`/requests/${currentRequestId}/status`, {
             method: 'PATCH',
-            body: JSON.stringify({ action, note: note.trim(), signature }),
+            body: JSON.stringify({ action, note: note.trim(), signature, version: requestVersion(allRequests, currentRequestId) }),
         });
         if (res.ok) {
             const result = await res.json();
@@ -368,6 +368,7 @@ async function updateStatus(action, note = '', signature = null) {
         } else {
             const error = await res.json();
             alert(`خطأ: ${error.error}`);
+            if (res.status === 409) { closeModal(); await loadRequests(); }  // عدّله مستخدم آخر
         }
     } catch (error) {
         alert('خطأ في تحديث حالة الطلب');
@@ -384,7 +384,7 @@ async function updateStatus(action, note = '', signature = null) {
     try {
         const res = await apiFetch(`/requests/${currentRequestId}/status`, {
             method: 'PATCH',
-            body: JSON.stringify({ action, note: note.trim(), signature }),
+            body: JSON.stringify({ action, note: note.trim(), signature, version: requestVersion(allRequests, currentRequestId) }),
         });
         if (res.ok) {
             const result = await res.json();
@@ -400,6 +400,7 @@ async function updateStatus(action, note = '', signature = null) {
         } else {
             const error = await res.json();
             alert(`خطأ: ${error.error}`);
+            if (res.status === 409) { closeModal(); await loadRequests(); }  // عدّله مستخدم آخر
         }
     } catch (error) {
         alert('خطأ في تحديث حالة الطلب');
@@ -644,6 +645,7 @@ async function approveItem(requestId, itemId) {
             const result = await res.json();
             updateItemUI(itemId, 'approved');
             if (result.request && result.request.total_amount !== undefined) updateTotalAmountUI(result.request.total_amount);
+            rememberRequestVersion(allRequests, result.request);
         } else { const e = await res.json(); alert(`خطأ: ${e.error}`); }
     } catch (e) { alert('حدث خطأ أثناء الاتصال بالخادم'); }
 }
@@ -661,6 +663,7 @@ async function rejectItem(requestId, itemId) {
             const result = await res.json();
             updateItemUI(itemId, 'rejected', reason);
             if (result.request && result.request.total_amount !== undefined) updateTotalAmountUI(result.request.total_amount);
+            rememberRequestVersion(allRequests, result.request);
         } else { const e = await res.json(); alert(`خطأ: ${e.error}`); }
     } catch (e) { alert('حدث خطأ أثناء الاتصال بالخادم'); }
 }
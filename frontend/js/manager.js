@@ -440,7 +440,7 @@ async function updateStatus(action, note = '', signature = null) {
   try {
     const res = await apiFetch(`/requests/${currentRequestId}/status`, {
       method: 'PATCH',
-      body: JSON.stringify({ action, note: note.trim(), signature }),
+      body: JSON.stringify({ action, note: note.trim(), signature, version: requestVersion(allRequests, currentRequestId) }),
     });
     if (res.ok) {
       alert(`تم ${action === 'approve' ? 'الموافقة على' : 'رفض'} الطلب بنجاح`);
@@ -449,6 +449,7 @@ async function updateStatus(action, note = '', signature = null) {
     } else {
       const error = await res.json();
       alert(`خطأ: ${error.error}`);
+      if (res.status === 409) { closeModal(); await loadRequests(); }  // عدّله مستخدم آخر
     }
   } catch (error) {
     alert('خطأ في تحديث حالة الطلب');
@@ -833,8 +834,10 @@ async function approveItem(requestId, itemId) {
       method: 'POST', body: JSON.stringify({ action: 'approve' }),
     });
     if (res.ok) {
+      const result = await res.json();
       updateItemUI(itemId, 'approved');
       updateLocalRequestData(requestId, itemId, 'approved');
+      rememberRequestVersion(allRequests, result.request);
     } else { const e = await res.json(); alert(`خطأ: ${e.error}`); }
   } catch (e) { alert('حدث خطأ أثناء الاتصال بالخادم'); }
 }
@@ -849,8 +852,10 @@ async function rejectItem(requestId, itemId) {
       method: 'POST', body: JSON.stringify({ action: 'reject', reason }),
     });
     if (res.ok) {
+      const result = await res.json();
       updateItemUI(itemId, 'rejected', reason);
       updateLocalRequestData(requestId, itemId, 'rejected', reason);
+      rememberRequestVersion(allRequests, result.request);
     } else { const e = await res.json(); alert(`خطأ: ${e.error}`); }
   } catch (e) { alert('حدث خطأ أثناء الاتصال بالخادم'); }
 }
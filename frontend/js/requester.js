@@ -410,10 +410,12 @@ function closeRequestModal() {
 
 // ==================== الطباعة ====================
 
-function printCurrentRequest() {
+async function printCurrentRequest() {
     if (!currentRequestForModal) return;
     const request = currentRequestForModal;
-    const signatures = request.signatures || {};
+    // النافذة تُفتح قبل أي await حتى لا يحجبها مانع النوافذ المنبثقة
+    const printWindow = window.open('', '_blank');
+    const signatures = await loadSignatureImages(request.signature_refs);
     const approval = request.approval_data || {};
     const approvalDates = request.approval_dates || {};
 
@@ -541,7 +543,6 @@ function printCurrentRequest() {
 </body>
 </html>`;
 
-    const printWindow = window.open('', '_blank');
     printWindow.document.write(printContent);
     printWindow.document.close();
 
@@ -71,6 +71,51 @@ async function apiFetch(endpoint, options = {}) {
     return response;
 }
 
+/**
+ * رقم نسخة الطلب كما عُرض للمستخدم — الخادم يرد 409 إن عدّله غيره بعدها
+ */
+function requestVersion(list, requestId) {
+    const found = (list || []).find(r => r.id === requestId);
+    return found ? found.version : undefined;
+}
+
+/**
+ * حفظ رقم النسخة الذي أعاده الخادم بعد تعديل جزئي (قرار على بند مثلاً)
+ * كي لا يُرسل الإجراء التالي على الطلب نسخة قديمة فيُرد بـ 409
+ */
+function rememberRequestVersion(list, request) {
+    if (!request || request.version === undefined) return;
+    const found = (list || []).find(r => r.id === request.id);
+    if (found) found.version = request.version;
+}
+
+// ==================== Signatures ====================
+
+const _signatureImages = new Map();  // digest → Promise<data URL | null>
+
+/**
+ * صور التواقيع من /api/signatures/<digest> حسب signature_refs في تفاصيل الطلب
+ * الاستجابة immutable فيخدمها المتصفح من ذاكرته؛ data URL لأن <img> لا يرسل Authorization
+ */
+async function loadSignatureImages(refs) {
+    const entries = await Promise.all(Object.entries(refs || {}).map(async ([role, digest]) => {
+        if (!digest) return [role, null];
+        if (!_signatureImages.has(digest)) {
+            _signatureImages.set(digest, apiFetch(`/signatures/${digest}`)
+                .then(res => res.ok ? res.blob() : null)
+                .then(blob => blob && new Promise(resolve => {
+                    const reader = new FileReader();
+                    reader.onload = () => resolve(reader.result);
+                    reader.onerror = () => resolve(null);
+                    reader.readAsDataURL(blob);
+                }))
+                .catch(() => null));
+        }
+        return [role, await _signatureImages.get(digest)];
+    }));
+    return Object.fromEntries(entries);
+}
+
 // ==================== Status Helpers ====================
 
 /**
@@ -133,6 +178,14 @@ function formatDate(dateStr) {
 
 let _notifications = [];
 let _notificationInterval = null;
+let _notificationStream = null;
+let _queueReloadTimer = null;
+let _streamRetryTimer = null;
+let _unreadCount = null;  // من /notifications/unread-count (يشمل ما بعد أول 100 إشعار)
+
+function _latestNotificationId() {
+    return _notifications.reduce((max, n) => Math.max(max, n.id), 0);
+}
 
 /**
  * تحميل الإشعارات
@@ -142,18 +195,49 @@ async function loadNotifications() {
         const res = await apiFetch('/notifications');
         if (!res.ok) return;
         _notifications = await res.json();
-        updateNotificationBadge();
+        await loadUnreadCount();
         renderNotificationsList();
     } catch (e) {
         console.warn('خطأ في تحميل الإشعارات:', e);
     }
 }
 
+/**
+ * الاستطلاع الدوري: الجديد فقط (since_id) + عدد غير المقروء من العدّاد
+ */
+async function pollNotifications() {
+    try {
+        const res = await apiFetch(`/notifications?since_id=${_latestNotificationId()}`);
+        if (!res.ok) return;
+        const fresh = await res.json();
+        if (fresh.length) {
+            _notifications = fresh.concat(_notifications).slice(0, 100);
+            renderNotificationsList();
+        }
+        await loadUnreadCount();
+    } catch (e) {
+        console.warn('خطأ في تحميل الإشعارات:', e);
+    }
+}
+
+/**
+ * عدد غير المقروء للشارة
+ */
+async function loadUnreadCount() {
+    try {
+        const res = await apiFetch('/notifications/unread-count');
+        if (res.ok) _unreadCount = (await res.json()).unread;
+    } catch (e) {
+        console.warn('خطأ في تحميل عدد الإشعارات:', e);
+    }
+    updateNotificationBadge();
+}
+
 /**
  * تحديث عداد الإشعارات
  */
 function updateNotificationBadge() {
-    const unread = _notifications.filter(n => !n.is_read).length;
+    const unread = _unreadCount ?? _notifications.filter(n => !n.is_read).length;
     const badge = document.getElementById('notificationBadge');
     if (badge) {
         badge.textContent = unread;
@@ -202,6 +286,7 @@ async function markNotificationRead(id) {
     try {
         await apiFetch(`/notifications/${id}/read`, { method: 'POST' });
         const n = _notifications.find(x => x.id === id);
+        if (n && !n.is_read && _unreadCount) _unreadCount--;
         if (n) n.is_read = true;
         updateNotificationBadge();
     } catch (e) {
@@ -216,6 +301,7 @@ async function markAllNotificationsRead() {
     try {
         await apiFetch('/notifications/read-all', { method: 'POST' });
         _notifications.forEach(n => n.is_read = true);
+        _unreadCount = 0;
         updateNotificationBadge();
         renderNotificationsList();
     } catch (e) {
@@ -225,10 +311,80 @@ async function markAllNotificationsRead() {
 
 /**
  * بدء التحديث التلقائي للإشعارات
+ * البث الحي (SSE) أولاً، والاستطلاع الدوري كل intervalMs عند تعذره
  */
 function startNotificationPolling(intervalMs = 30000) {
-    loadNotifications();
-    _notificationInterval = setInterval(loadNotifications, intervalMs);
+    loadNotifications()
+        .then(() => startNotificationStream(intervalMs))
+        .then(started => {
+            if (!started) _fallbackToPolling(intervalMs);
+        });
+}
+
+function _fallbackToPolling(intervalMs) {
+    _notificationStream = null;
+    if (!_notificationInterval) {
+        _notificationInterval = setInterval(pollNotifications, intervalMs);
+    }
+}
+
+/**
+ * الاشتراك في /notifications/stream — يُرجع false إذا تعذر (لا EventSource، لا توكن بث، ...)
+ * ?token= توكن قصير العمر خاص بالبث (POST /notifications/stream-token) لا توكن الجلسة،
+ * لذلك إعادة الاتصال يدوية بتوكن جديد بدلاً من إعادة المتصفح للرابط نفسه.
+ * بعد 3 إخفاقات متتالية (الخادم ممتلئ مثلاً) نعود للاستطلاع الدوري.
+ */
+async function startNotificationStream(intervalMs = 30000, failures = 0) {
+    if (!window.EventSource || !getToken()) return false;
+
+    let streamToken;
+    try {
+        const res = await apiFetch('/notifications/stream-token', { method: 'POST' });
+        if (!res.ok) return false;
+        streamToken = (await res.json()).token;
+    } catch (e) {
+        return false;
+    }
+
+    const url = `${API_BASE}/notifications/stream?token=${encodeURIComponent(streamToken)}&last_id=${_latestNotificationId()}`;
+    const stream = new EventSource(url);
+    _notificationStream = stream;
+
+    stream.addEventListener('open', () => { failures = 0; });
+
+    stream.addEventListener('notification', (e) => {
+        const n = JSON.parse(e.data);
+        if (_notifications.some(x => x.id === n.id)) return;
+        _notifications.unshift(n);
+        if (!n.is_read && _unreadCount !== null) _unreadCount++;
+        updateNotificationBadge();
+        renderNotificationsList();
+    });
+
+    stream.addEventListener('queue', () => {
+        // تجميع التلميحات المتتالية في إعادة تحميل واحدة
+        clearTimeout(_queueReloadTimer);
+        _queueReloadTimer = setTimeout(() => {
+            window.dispatchEvent(new CustomEvent('queue-changed'));
+            if (typeof loadRequests === 'function') loadRequests();
+        }, 300);
+    });
+
+    stream.onerror = () => {
+        stream.close();
+        if (_notificationStream !== stream) return;  // أُوقف أو استُبدل
+        _notificationStream = null;
+        if (failures + 1 >= 3) {
+            _fallbackToPolling(intervalMs);
+            return;
+        }
+        _streamRetryTimer = setTimeout(() => {
+            startNotificationStream(intervalMs, failures + 1).then(started => {
+                if (!started) _fallbackToPolling(intervalMs);
+            });
+        }, 3000);
+    };
+    return true;
 }
 
 /**
@@ -239,6 +395,11 @@ function stopNotificationPolling() {
         clearInterval(_notificationInterval);
         _notificationInterval = null;
     }
+    clearTimeout(_streamRetryTimer);
+    if (_notificationStream) {
+        _notificationStream.close();
+        _notificationStream = null;
+    }
 }
 
 /**
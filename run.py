@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 نقطة تشغيل التطبيق — Purchase Request System
+
+    python run.py                   تشغيل الخادم
+    python run.py backup [--force]  نسخة مجدولة واحدة (cron) — تُتخطى إن لم تتغير القاعدة
 """
 
 import sys
@@ -37,5 +40,15 @@ def main():
     app.run(host=HOST, port=PORT, debug=DEBUG)
 
 
+def backup(force=False):
+    """تشغيل واحد للنسخ المجدول (لـ cron): نسخة إذا تغيرت القاعدة + تقليم GFS"""
+    from backend.utils.backup_schedule import run_scheduled_backup
+    result = run_scheduled_backup(force=force)
+    logger.info(f"النسخ المجدول: {result['status']} — حُذف {len(result['removed'])} نسخة")
+    return 1 if result["status"] == "failed" else 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "backup":
+        sys.exit(backup(force="--force" in sys.argv))
     main()
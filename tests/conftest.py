@@ -4,7 +4,10 @@
 
 import os
 import sys
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 
 # ضمان أن مجلد المشروع في مسار البحث
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -94,3 +97,45 @@ def login(client, username, password):
 def auth_header(token):
     """إنشاء header المصادقة"""
     return {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def count_statements():
+    """عدّ أوامر SQL المنفذة على المحرك داخل الكتلة"""
+    from backend.database import engine
+    statements = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
+
+
+def request_payload(order_number, department="موارد بشرية", lines=1, price=100, **fields):
+    """جسم POST /api/requests صالح: lines أصناف بكمية 1 وسعر price — fields تستبدل أي حقل"""
+    return {
+        "requester": f"موظف {department}",
+        "department": department,
+        "delivery_address": "المكتب",
+        "delivery_date": "2026-03-01",
+        "project_code": "TEST",
+        "order_number": order_number,
+        "currency": "SYP",
+        "total_amount": lines * price,
+        "items": [
+            {"item_name": f"صنف {i}", "unit": "قطعة", "quantity": 1, "price": price}
+            for i in range(lines)
+        ],
+        **fields,
+    }
+
+
+def create_request(client, token, order_number, **payload):
+    """إنشاء طلب شراء وإرجاع رقمه"""
+    res = client.post("/api/requests", json=request_payload(order_number, **payload), headers=auth_header(token))
+    assert res.status_code == 201, res.get_json()
+    return res.get_json()["id"]
@@ -0,0 +1,71 @@
+"""
+اختبار النسخ الاحتياطي — لقطة حيّة مضغوطة مع manifest وفحص سلامة، واستعادة كل الصيغ
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def live_db(tmp_path, monkeypatch):
+    """قاعدة ملف في وضع WAL مع مجلد نسخ مؤقت"""
+    from backend.utils import backup
+
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO t (payload) VALUES (?)", [("x" * 200,) for _ in range(2000)])
+    conn.commit()
+    monkeypatch.setattr(backup, "DB_FILE", path)
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("compression, suffix", [("gzip", ".db.gz"), ("lzma", ".db.xz"), ("none", ".db")])
+def test_backup_roundtrip(live_db, compression, suffix):
+    from backend.utils import backup
+
+    path = backup.backup_database("test", compression=compression)
+    assert path and path.endswith(suffix)
+    manifest = backup.read_manifest(path)
+    assert manifest["sha256"] == backup.file_sha256(path)
+    assert manifest["integrity"] == "ok" and manifest["compression"] == compression
+    if compression != "none":
+        assert manifest["size"] < manifest["raw_size"]
+    # ملف واحد + manifest — بلا لقطات مؤقتة أو -wal
+    assert sorted(os.listdir(backup.BACKUP_DIR)) == sorted([os.path.basename(path), os.path.basename(path) + ".json"])
+
+    listed = backup.list_backups()
+    assert [(b["name"], b["compression"]) for b in listed] == [(os.path.basename(path), compression)]
+    assert backup.verify_backup(path) == {"name": os.path.basename(path), "checksum": True, "integrity": "ok"}
+
+    live_db.execute("DELETE FROM t")
+    live_db.commit()
+    assert backup.restore_database(path)
+    assert live_db.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2000
+
+
+def test_corrupted_backup_is_rejected(live_db):
+    from backend.utils import backup
+
+    path = backup.backup_database("test", compression="gzip")
+    with open(path, "r+b") as f:
+        f.seek(100)
+        f.write(b"\x00" * 16)
+    assert backup.verify_backup(path)["checksum"] is False
+
+    live_db.execute("DELETE FROM t WHERE id > 10")
+    live_db.commit()
+    assert backup.restore_database(path) is False
+    assert live_db.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 10  # لم تُمس
+
+
+def test_database_file_follows_database_url():
+    from backend import config
+
+    # الاختبارات تعمل على sqlite:///:memory: — لا ملف ولا نسخ لقاعدة التطوير
+    assert config.DATABASE_FILE is None
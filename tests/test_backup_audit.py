@@ -0,0 +1,101 @@
+"""
+اختبار تدقيق النسخ في مكانها — تفاصيل الطلب من نسخة للقراءة فقط مقارنةً بالصف الحي
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+
+class TestBackupAudit:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client, tmp_path, monkeypatch):
+        from backend.services import backup_audit
+        from backend.utils import backup
+
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+        self.admin_token = login(seeded_client, "admin", "Admin@2024")
+        monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+        yield
+        backup_audit.close_all()
+
+    def _backup(self, name, drop_version=False):
+        """لقطة من القاعدة الحية (في الذاكرة) إلى BACKUP_DIR — اختيارياً بمخطط أقدم ومضغوطة"""
+        from backend.database import engine
+        from backend.utils import backup
+
+        path = os.path.join(backup.BACKUP_DIR, name.removesuffix(".gz"))
+        raw = engine.raw_connection()
+        try:
+            dst = sqlite3.connect(path)
+            raw.driver_connection.backup(dst)
+            if drop_version:  # كما قبل الترحيل الذي أضاف العمود
+                dst.execute("DROP INDEX IF EXISTS ix_pr_status_department_updated")
+                dst.execute("ALTER TABLE purchase_requests DROP COLUMN version")
+                dst.commit()
+            dst.close()
+        finally:
+            raw.close()
+        if name.endswith(".gz"):
+            with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as out:
+                shutil.copyfileobj(src, out)
+            os.remove(path)
+        return name
+
+    def _audit(self, name, req_id):
+        return self.client.get(f"/api/admin/backups/{name}/requests/{req_id}",
+                               headers=auth_header(self.admin_token))
+
+    def test_backup_state_diffed_against_live(self):
+        req_id = create_request(self.client, self.requester_token, f"AUDIT-{os.urandom(3).hex()}")
+        name = self._backup("app_manual_20260101_000000.db")
+
+        res = self.client.patch(f"/api/requests/{req_id}/status", json={"action": "approve"},
+                                headers=auth_header(self.manager_token))
+        assert res.status_code == 200
+
+        res = self._audit(name, req_id)
+        assert res.status_code == 200
+        body = res.get_json()
+        assert body["backup"]["name"] == name
+        assert body["backup_state"]["status"] == "pending_manager"
+        assert body["backup_state"]["items"][0]["item_name"] == "صنف 0"
+        assert "signatures" not in body["backup_state"]
+        changed = {c["path"]: c for c in body["changes"]}
+        assert changed["status"]["backup"] == "pending_manager"
+        assert changed["status"]["live"] == body["live"]["status"] != "pending_manager"
+        assert changed["version"]["live"] > changed["version"]["backup"]
+
+        later = create_request(self.client, self.requester_token, f"AUDIT-{os.urandom(3).hex()}")  # أُنشئ بعد النسخة
+        body = self._audit(name, later).get_json()
+        assert body["backup_state"] is None and body["live"]["id"] == later
+
+        assert self._audit("missing.db", req_id).status_code == 404
+        listed = self.client.get("/api/admin/backups", headers=auth_header(self.admin_token)).get_json()
+        assert [b["name"] for b in listed] == [name] and "path" not in listed[0]
+
+    def test_older_schema_and_lru_eviction(self, monkeypatch):
+        from backend import config
+        from backend.services import backup_audit
+
+        req_id = create_request(self.client, self.requester_token, f"AUDIT-{os.urandom(3).hex()}")
+        old = self._backup("app_startup_20250101_000000.db.gz", drop_version=True)
+        plain = self._backup("app_manual_20260101_000000.db")
+
+        body = self._audit(old, req_id).get_json()
+        assert body["backup_state"]["version"] == 1  # server_default عبر TEMP VIEW
+        assert body["changes"] == []
+
+        monkeypatch.setattr(config, "BACKUP_AUDIT_CACHE", 1)
+        expanded = backup_audit.open_backup(old)
+        assert backup_audit.open_backup(old) is expanded
+        self._audit(plain, req_id)
+        assert list(backup_audit._cache) == [plain]
+        assert not any(f.endswith(".expand.db") for f in os.listdir(os.path.dirname(expanded.info["path"])))
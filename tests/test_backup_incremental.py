@@ -0,0 +1,139 @@
+"""
+اختبار النسخ التزايدية — حلقات delta صغيرة، وإعادة بناء كل نقطة تطابق لقطة كاملة بايتاً ببايت
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def live_db(tmp_path, monkeypatch):
+    from backend.utils import backup
+
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO t (payload) VALUES (?)", [(f"{i:06d}" * 40,) for i in range(5000)])
+    conn.commit()
+    monkeypatch.setattr(backup, "DB_FILE", path)
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    yield conn
+    conn.close()
+
+
+def _bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _point(backup, conn, sql, *params):
+    """كتابة ثم حلقة تزايدية + لقطة كاملة مرجعية من الحالة نفسها"""
+    conn.execute(sql, params)
+    conn.commit()
+    delta = backup.backup_database("scheduled", incremental=True)
+    full = backup.backup_database("reference", compression="none")
+    return delta, full
+
+
+def _rebuilt(backup, path):
+    with backup._expanded(path) as plain:
+        return _bytes(plain)
+
+
+def test_chain_rebuilds_every_point(live_db):
+    from backend.utils import backup
+
+    base = backup.backup_database("scheduled", incremental=True)
+    assert backup.read_manifest(base)["kind"] == "full"
+
+    points = [
+        _point(backup, live_db, "UPDATE t SET payload = 'x' WHERE id IN (10, 2500)"),
+        _point(backup, live_db, "INSERT INTO t (payload) SELECT payload FROM t WHERE id <= 300"),
+        _point(backup, live_db, "DELETE FROM t WHERE id > 3000"),
+    ]
+    for delta, full in points:
+        manifest = backup.read_manifest(delta)
+        assert manifest["kind"] == "delta" and delta.endswith(".delta.gz")
+        assert manifest["changed_pages"] < manifest["page_count"]
+        assert _rebuilt(backup, delta) == _bytes(full)
+        assert backup.verify_backup(delta)["integrity"] == "ok"
+
+    first = backup.read_manifest(points[0][0])
+    assert first["parent"] == os.path.basename(base)
+    assert os.path.getsize(points[0][0]) < os.path.getsize(base) / 20
+
+    live_db.execute("DELETE FROM t")
+    live_db.commit()
+    assert backup.restore_database(points[1][0])
+    assert live_db.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 5300
+
+
+def test_pruning_folds_delta_into_child(live_db):
+    from backend.utils import backup
+
+    base = backup.backup_database("scheduled", incremental=True)
+    d1, _ = _point(backup, live_db, "UPDATE t SET payload = 'a' WHERE id <= 50")
+    d2, full2 = _point(backup, live_db, "UPDATE t SET payload = 'b' WHERE id BETWEEN 4000 AND 4050")
+
+    assert backup.remove_backup(os.path.basename(base)) is False  # أساس السلسلة
+    assert backup.remove_backup(os.path.basename(d1)) is True
+    assert not os.path.exists(d1)
+    assert backup.read_manifest(d2)["parent"] == os.path.basename(base)
+    assert _rebuilt(backup, d2) == _bytes(full2)
+
+
+def test_chain_limit_and_broken_link(live_db, monkeypatch):
+    from backend import config
+    from backend.utils import backup
+
+    monkeypatch.setattr(config, "BACKUP_DELTA_CHAIN", 1)
+    backup.backup_database("scheduled", incremental=True)
+    d1, _ = _point(backup, live_db, "UPDATE t SET payload = 'a' WHERE id = 1")
+    fresh, _ = _point(backup, live_db, "UPDATE t SET payload = 'b' WHERE id = 2")
+    assert backup.read_manifest(d1)["kind"] == "delta"
+    assert backup.read_manifest(fresh)["kind"] == "full"  # السلسلة بلغت حدها
+
+    os.remove(os.path.join(backup.BACKUP_DIR, backup.read_manifest(d1)["parent"]))
+    assert "مفقودة" in backup.verify_backup(d1)["integrity"]
+    assert backup.restore_database(d1) is False
+
+
+def test_delta_reads_live_pages_without_snapshot(live_db, monkeypatch):
+    from backend.utils import backup
+
+    backup.backup_database("scheduled", incremental=True)
+    live_db.execute("UPDATE t SET payload = 'c' WHERE id <= 20")
+    live_db.commit()
+
+    # معاملة كتابة مفتوحة تفيض إطارات غير مثبتة إلى -wal — لا تدخل الحلقة
+    writer = sqlite3.connect(backup.DB_FILE)
+    writer.execute("PRAGMA cache_size=1")
+    writer.execute("BEGIN")
+    writer.execute("UPDATE t SET payload = 'uncommitted'")
+    snapshot = backup._snapshot
+    monkeypatch.setattr(backup, "_snapshot", lambda *a: pytest.fail("حلقة delta لا تحتاج لقطة كاملة"))
+    try:
+        delta = backup.backup_database("scheduled", incremental=True)
+    finally:
+        writer.rollback()
+        writer.close()
+    monkeypatch.setattr(backup, "_snapshot", snapshot)
+
+    manifest = backup.read_manifest(delta)
+    assert manifest["kind"] == "delta" and manifest["integrity"] == "deferred"
+    assert _rebuilt(backup, delta) == _bytes(backup.backup_database("reference", compression="none"))
+    assert backup.verify_backup(delta)["integrity"] == "ok"
+
+
+def test_chain_limit_counts_deltas(live_db, monkeypatch):
+    from backend import config
+    from backend.utils import backup
+
+    monkeypatch.setattr(config, "BACKUP_DELTA_CHAIN", 2)
+    backup.backup_database("scheduled", incremental=True)
+    kinds = [backup.read_manifest(_point(backup, live_db, "UPDATE t SET payload = ? WHERE id = 1", str(i))[0])["kind"]
+             for i in range(3)]
+    assert kinds == ["delta", "delta", "full"]
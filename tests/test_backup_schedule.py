@@ -0,0 +1,69 @@
+"""
+اختبار النسخ المجدول — تخطي التشغيل بلا كتابات، واحتفاظ GFS منفصل عن نسخ الإقلاع
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def live_db(tmp_path, monkeypatch):
+    from backend.utils import backup
+
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.commit()
+    monkeypatch.setattr(backup, "DB_FILE", path)
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    yield conn
+    conn.close()
+
+
+def test_gfs_keeps_one_per_period():
+    from backend.utils.backup_schedule import select_retained
+
+    now = datetime(2026, 6, 30, 23, 30)
+    backups = [
+        {"name": f"b{h}", "created": (now - timedelta(hours=h)).isoformat()}
+        for h in range(24 * 120)  # نسخة كل ساعة لأربعة أشهر
+    ]
+    retained = select_retained(backups)
+
+    assert set(retained["b0"]) == {"hourly", "daily", "weekly", "monthly"}
+    assert all(f"b{h}" in retained for h in range(24))  # آخر 24 ساعة كاملة
+    assert "b24" in retained and retained["b24"] == ["daily"]  # آخر نسخة في يوم أمس
+    assert "b25" not in retained
+    assert len(retained) <= 24 + 7 + 4 + 6
+    oldest_kept = max(int(name[1:]) for name in retained)
+    assert oldest_kept > 24 * 90  # النسخة الشهرية الأقدم ما زالت موجودة
+
+
+def test_quiet_database_skips_run(live_db):
+    from backend.utils.backup_schedule import run_scheduled_backup
+
+    first = run_scheduled_backup()
+    assert first["status"] == "created"
+    assert run_scheduled_backup()["status"] == "unchanged"
+
+    live_db.execute("INSERT INTO t (payload) VALUES ('x')")
+    live_db.commit()
+    assert run_scheduled_backup()["status"] == "created"
+    assert run_scheduled_backup(force=True)["status"] == "created"
+
+
+def test_restarts_do_not_evict_scheduled_history(live_db, monkeypatch):
+    from backend.utils import backup
+    from backend.utils.backup_schedule import run_scheduled_backup
+
+    monkeypatch.setattr(backup, "MAX_BACKUPS", 2)
+    run_scheduled_backup()
+    for _ in range(4):
+        backup.backup_database("startup")
+
+    reasons = [b["reason"] for b in backup.list_backups()]
+    assert reasons.count("startup") == 2
+    assert reasons.count("scheduled") == 1
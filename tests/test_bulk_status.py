@@ -0,0 +1,99 @@
+"""
+اختبار الموافقة/الرفض الجماعي POST /api/requests/bulk-status
+"""
+
+import pytest
+from tests.conftest import login, auth_header, count_statements, create_request
+
+
+class TestBulkStatus:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.hr_requester = login(seeded_client, "requester_hr", "Hr2024!")
+        self.bizdev_requester = login(seeded_client, "requester_bizdev", "Biz2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+        self.finance_token = login(seeded_client, "manager_finance", "Finance@24")
+
+    def _bulk(self, token, **body):
+        return self.client.post("/api/requests/bulk-status", json=body, headers=auth_header(token))
+
+    def test_per_id_results_in_one_transaction(self):
+        mine = [create_request(self.client, self.hr_requester, f"PR-BULK-{i}") for i in range(3)]
+        other = create_request(self.client, self.bizdev_requester, "PR-BULK-OTHER", department="تطوير الأعمال")
+
+        with count_statements() as statements:
+            res = self._bulk(self.manager_token, ids=mine + [other, 999999], action="approve", signature="sig")
+        assert res.status_code == 200
+        data = res.get_json()
+        assert (data["succeeded"], data["failed"]) == (3, 2)
+
+        by_id = {r["id"]: r for r in data["results"]}
+        assert [r["id"] for r in data["results"]] == mine + [other, 999999]
+        assert all(by_id[i]["ok"] and by_id[i]["status"] == "pending_finance" for i in mine)
+        assert not by_id[other]["ok"]
+        assert by_id[999999]["error"] == "الطلب غير موجود"
+
+        # إشعارات كل الطلبات في INSERT واحد ومعاملة واحدة
+        notif_inserts = [s for s in statements if s.startswith("INSERT INTO notifications")]
+        assert len(notif_inserts) == 1
+        assert sum(s == "COMMIT" for s in statements) <= 1
+
+        queue = self.client.get("/api/my/queue", headers=auth_header(self.finance_token)).get_json()
+        assert set(mine) <= {r["id"] for r in queue}
+
+        # رفض جماعي يتطلب ملاحظة
+        assert self._bulk(self.finance_token, ids=mine, action="reject").status_code == 400
+        res = self._bulk(self.finance_token, ids=mine, action="reject", note="تجاوز الميزانية")
+        assert res.get_json()["succeeded"] == 3
+        details = self.client.get(f"/api/requests/{mine[0]}", headers=auth_header(self.hr_requester)).get_json()
+        assert details["status"] == "rejected"
+
+    def test_version_conflict_fails_only_that_id(self, monkeypatch):
+        from sqlalchemy import text
+        from backend.routes import workflow
+
+        mine = [create_request(self.client, self.hr_requester, f"PR-BULK-CAS-{i}") for i in range(3)]
+        apply = workflow._apply_status_action
+
+        def concurrent_edit(db, pr, *args):
+            # تعديل "من مستخدم آخر" بين القراءة والكتابة — CAS على version يفشل
+            if pr.id == mine[1]:
+                db.execute(text("UPDATE purchase_requests SET version = version + 1 WHERE id = :id"), {"id": pr.id})
+            return apply(db, pr, *args)
+
+        monkeypatch.setattr(workflow, "_apply_status_action", concurrent_edit)
+        res = self._bulk(self.manager_token, ids=mine, action="approve", signature="sig")
+        assert res.status_code == 200
+        data = res.get_json()
+        assert (data["succeeded"], data["failed"]) == (2, 1)
+        by_id = {r["id"]: r for r in data["results"]}
+        assert not by_id[mine[1]]["ok"] and "مستخدم آخر" in by_id[mine[1]]["error"]
+
+        statuses = {
+            i: self.client.get(f"/api/requests/{i}", headers=auth_header(self.hr_requester)).get_json()["status"]
+            for i in mine
+        }
+        assert statuses == {mine[0]: "pending_finance", mine[1]: "pending_manager", mine[2]: "pending_finance"}
+
+    def test_notification_failure_rolls_back_batch(self, monkeypatch):
+        from backend.routes import workflow
+
+        mine = [create_request(self.client, self.hr_requester, f"PR-BULK-NOTIF-{i}") for i in range(2)]
+
+        def broken(db, notifications):
+            raise RuntimeError("notifications down")
+
+        monkeypatch.setattr(workflow, "create_notifications", broken)
+        res = self._bulk(self.manager_token, ids=mine, action="approve", signature="sig")
+        assert res.status_code == 500
+        for i in mine:
+            details = self.client.get(f"/api/requests/{i}", headers=auth_header(self.hr_requester)).get_json()
+            assert details["status"] == "pending_manager"
+
+    def test_rejects_bad_payload(self):
+        assert self._bulk(self.manager_token, ids=[], action="approve").status_code == 400
+        assert self._bulk(self.manager_token, ids=["x"], action="approve").status_code == 400
+        assert self._bulk(self.manager_token, ids=[1], action="archive").status_code == 400
+        assert self._bulk(self.hr_requester, ids=[1], action="approve").status_code == 403
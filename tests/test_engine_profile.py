@@ -0,0 +1,40 @@
+"""
+اختبار ملف تعريف SQLite — PRAGMAs على كل اتصال و foreign_keys مفعّلة
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+
+def test_file_database_gets_production_pragmas(tmp_path):
+    from backend.utils.engine_profile import apply_engine_profile, describe
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    apply_engine_profile(engine)
+    try:
+        with engine.connect() as conn:
+            values = describe(conn)
+    finally:
+        engine.dispose()
+    assert values["journal_mode"] == "wal"
+    assert values["foreign_keys"] == 1
+    assert values["busy_timeout"] == 5000
+    assert values["synchronous"] == 1  # NORMAL
+
+
+def test_overrides_are_validated(monkeypatch):
+    from backend import config
+    from backend.utils.engine_profile import profile_pragmas
+
+    monkeypatch.setattr(config, "SQLITE_SYNCHRONOUS", "full")
+    assert ("synchronous", "FULL") in profile_pragmas()
+    monkeypatch.setattr(config, "SQLITE_JOURNAL_MODE", "wal; DROP TABLE users")
+    with pytest.raises(ValueError):
+        profile_pragmas()
+
+
+def test_app_engine_enforces_cascade(app):
+    from backend.database import engine
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
@@ -0,0 +1,78 @@
+"""
+اختبار الاستجابات الشرطية (ETag / If-None-Match)
+"""
+
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+
+class TestConditionalResponses:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    def _get(self, url, token, etag=None):
+        headers = auth_header(token)
+        if etag:
+            headers["If-None-Match"] = f'"{etag}"'
+        return self.client.get(url, headers=headers)
+
+    @pytest.mark.parametrize("url", ["/api/requests", "/api/my/queue"])
+    def test_list_not_modified_until_change(self, url):
+        first = self._get(url, self.manager_token)
+        assert first.status_code == 200
+        etag = first.headers["ETag"].strip('"')
+
+        again = self._get(url, self.manager_token, etag)
+        assert again.status_code == 304
+        assert again.data == b""
+
+        create_request(self.client, self.requester_token, f"PR-ETAG-{url.rsplit('/', 1)[-1]}")
+        changed = self._get(url, self.manager_token, etag)
+        assert changed.status_code == 200
+        assert changed.headers["ETag"].strip('"') != etag
+
+    def test_detail_not_modified_until_transition(self):
+        req_id = create_request(self.client, self.requester_token, "PR-ETAG-DETAIL")
+        url = f"/api/requests/{req_id}"
+        etag = self._get(url, self.requester_token).headers["ETag"].strip('"')
+        assert self._get(url, self.requester_token, etag).status_code == 304
+
+        self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "signature": "sig"},
+            headers=auth_header(self.manager_token),
+        )
+        res = self._get(url, self.requester_token, etag)
+        assert res.status_code == 200
+        assert res.get_json()["status"] == "pending_finance"
+
+    def test_validators_are_index_only(self):
+        """مُتحقِّقات القوائم تُقرأ من فهرس التغطية دون الجدول"""
+        from sqlalchemy import func, text
+        from backend.database import SessionLocal
+        from backend.models import PurchaseRequest
+        from backend.services.request_projections import queue_status_criterion
+
+        db = SessionLocal()
+        try:
+            cases = [
+                (PurchaseRequest.department == "موارد بشرية",),
+                (PurchaseRequest.status == "pending_finance", PurchaseRequest.department == "مالية"),
+                (queue_status_criterion([("manager", "مالية"), ("finance", None)]),),
+            ]
+            for criteria in cases:
+                stmt = (
+                    db.query(func.count(), func.max(PurchaseRequest.updated_at), func.max(PurchaseRequest.id))
+                    .filter(*criteria)
+                    .statement
+                )
+                sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+                steps = [row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+                reads = [s for s in steps if s.startswith(("SCAN", "SEARCH"))]
+                assert reads and all("COVERING INDEX" in s for s in reads), steps
+        finally:
+            db.close()
@@ -0,0 +1,112 @@
+"""
+اختبار فحص السلامة التزايدي — العلامة المائية في integrity_runs والفحص الكامل الدوري
+"""
+
+import re
+
+import pytest
+from sqlalchemy import text
+from tests.conftest import login, auth_header, create_request
+
+
+class TestIntegrityRuns:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.admin_token = login(seeded_client, "admin", "Admin@2024")
+
+    def _run(self, **body):
+        res = self.client.post("/api/admin/integrity", json=body, headers=auth_header(self.admin_token))
+        assert res.status_code == 200, res.get_json()
+        return res.get_json()
+
+    def _stage(self, req_id, stage, touch):
+        from backend.database import SessionLocal
+        from backend.models import PurchaseRequest
+
+        db = SessionLocal()
+        try:
+            if touch:  # عبر الـ ORM: onupdate يحدّث updated_at
+                db.query(PurchaseRequest).filter(PurchaseRequest.id == req_id).update({"current_stage": stage})
+            else:  # SQL مباشر لا يلمس updated_at
+                db.execute(text("UPDATE purchase_requests SET current_stage = :s WHERE id = :id"),
+                           {"s": stage, "id": req_id})
+            db.commit()
+            return db.execute(text("SELECT current_stage FROM purchase_requests WHERE id = :id"),
+                              {"id": req_id}).scalar()
+        finally:
+            db.close()
+
+    def _version(self, req_id):
+        from backend.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return db.execute(text("SELECT version FROM purchase_requests WHERE id = :id"), {"id": req_id}).scalar()
+        finally:
+            db.close()
+
+    def _updated_at(self, req_id):
+        from backend.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return db.execute(text("SELECT updated_at FROM purchase_requests WHERE id = :id"), {"id": req_id}).scalar()
+        finally:
+            db.close()
+
+    def test_incremental_run_scans_only_touched_requests(self):
+        ids = [create_request(self.client, self.requester_token, f"INTEGRITY-{n}") for n in range(5)]
+        full = self._run(full=True)
+        assert full["mode"] == "full" and full["scanned"] >= 5
+
+        quiet = self._run()
+        assert quiet["mode"] == "incremental" and quiet["scanned"] <= 1  # >= العلامة: آخر صف فقط
+
+        self._stage(ids[1], "finance", touch=True)
+        touched = self._run()
+        assert touched["mode"] == "incremental" and touched["scanned"] <= 2
+        assert touched["fixed"] == 1
+        assert self._stage(ids[1], "manager", touch=False) == "manager"
+
+        # تعديل بـ SQL مباشر لا يراه التزايدي — يلتقطه الفحص الكامل
+        self._stage(ids[2], "disbursement", touch=False)
+        version = self._version(ids[2])
+        assert self._run()["fixed"] == 0
+        repaired = self._run(full=True)
+        assert repaired["fixed"] == 1
+        assert self._version(ids[2]) == version + 1  # الإصلاح يرفع النسخة (عملاء يحملون القديمة يُردّون بـ 409)
+        # updated_at الإصلاح بصيغة ORM فيدخل العلامة المائية ويراه التشغيل التزايدي التالي
+        assert re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{6}", self._updated_at(ids[2]))
+
+        runs = self.client.get("/api/admin/integrity?limit=5", headers=auth_header(self.admin_token)).get_json()
+        assert [r["mode"] for r in runs] == ["full", "incremental", "incremental", "incremental", "full"]
+        assert runs[0]["fixed"] == 1 and runs[0]["warnings"] and runs[0]["seconds"] >= 0
+        assert runs[0]["watermark"]["updated_at"] and runs[0]["watermark"]["history_id"]
+        assert self._updated_at(ids[2]) >= runs[0]["watermark"]["updated_at"]
+
+    def test_full_sweep_when_due(self, monkeypatch):
+        from backend import config
+
+        self._run(full=True)
+        monkeypatch.setattr(config, "INTEGRITY_FULL_SWEEP_DAYS", 0)
+        assert self._run()["mode"] == "full"
+        monkeypatch.setattr(config, "INTEGRITY_FULL_SWEEP_DAYS", 7)
+        assert self._run()["mode"] == "incremental"
+
+        res = self.client.post("/api/admin/integrity", json={"full": "yes"}, headers=auth_header(self.admin_token))
+        assert res.status_code == 400
+
+    def test_runs_limit_is_parsed_and_clamped(self):
+        self._run(full=True)
+        self._run()
+
+        def listed(limit):
+            res = self.client.get(f"/api/admin/integrity?limit={limit}", headers=auth_header(self.admin_token))
+            assert res.status_code == 200
+            return len(res.get_json())
+
+        assert listed("abc") >= 2  # قيمة غير صالحة → الافتراضي لا 500
+        assert listed(0) == listed(-5) == listed(1) == 1
@@ -0,0 +1,82 @@
+"""
+اختبار الموافقة/الرفض على مستوى البنود — عدد ثابت من أوامر SQL مهما كثرت البنود
+"""
+
+import pytest
+from tests.conftest import login, auth_header, count_statements, create_request
+
+
+class TestItemActions:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    def _create(self, order_number, lines):
+        req_id = create_request(self.client, self.requester_token, order_number, lines=lines, price=10)
+        items = self.client.get(f"/api/requests/{req_id}/items", headers=auth_header(self.manager_token))
+        return req_id, items.get_json()["items"]
+
+    def test_bulk_action_is_set_based(self):
+        req_id, items = self._create("PR-ITEMS-300", 300)
+        actions = (
+            [{"id": it["id"], "action": "approve"} for it in items[:150]]
+            + [{"id": it["id"], "action": "reject", "reason": "مكرر"} for it in items[150:250]]
+            + [{"id": it["id"], "action": "reject", "reason": "غالي"} for it in items[250:]]
+        )
+        with count_statements() as statements:
+            res = self.client.post(
+                f"/api/requests/{req_id}/items/bulk-action",
+                json={"items": actions}, headers=auth_header(self.manager_token),
+            )
+        assert res.status_code == 200
+        data = res.get_json()
+        assert len(data["results"]) == 300
+        assert data["new_total"] == sum(it["total"] for it in items[:150])
+
+        updates = [s for s in statements if s.startswith("UPDATE purchase_items")]
+        assert len(updates) == 3  # موافقة + سببا رفض
+        assert len(statements) < 12
+
+        after = {
+            it["id"]: it for it in self.client.get(
+                f"/api/requests/{req_id}/items", headers=auth_header(self.manager_token)
+            ).get_json()["items"]
+        }
+        assert after[items[0]["id"]]["status"] == "approved"
+        assert after[items[200]["id"]]["rejection_reason"] == "مكرر"
+        assert after[items[299]["id"]]["rejected_by"]
+
+    def test_duplicate_item_takes_last_action(self):
+        req_id, items = self._create("PR-ITEMS-DUP", 2)
+        first, second = items[0]["id"], items[1]["id"]
+        res = self.client.post(
+            f"/api/requests/{req_id}/items/bulk-action",
+            json={"items": [
+                {"id": first, "action": "reject", "reason": "مكرر"},
+                {"id": second, "action": "approve"},
+                {"id": first, "action": "approve"},
+                {"id": second, "action": "reject", "reason": "غالي"},
+            ]}, headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        data = res.get_json()
+        assert [(r["id"], r["status"]) for r in data["results"]] == [(first, "approved"), (second, "rejected")]
+        assert data["new_total"] == items[0]["total"]
+
+    def test_single_item_action_recomputes_total(self):
+        req_id, items = self._create("PR-ITEMS-ONE", 3)
+        res = self.client.post(
+            f"/api/requests/{req_id}/items/{items[0]['id']}/action",
+            json={"action": "reject", "reason": "غير مطلوب"}, headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        assert res.get_json()["request"]["total_amount"] == items[1]["total"] + items[2]["total"]
+
+        res = self.client.post(
+            f"/api/requests/{req_id}/items/999999/action",
+            json={"action": "approve"}, headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 404
@@ -0,0 +1,79 @@
+"""
+اختبار جلب الإشعارات الجديدة فقط (?since_id=) وعدّاد غير المقروء /api/notifications/unread-count
+"""
+
+import pytest
+from tests.conftest import login, auth_header, count_statements, create_request
+
+
+@pytest.mark.parametrize("mode", ["rows", "events"])
+class TestNotificationCounts:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client, monkeypatch, mode):
+        from backend import config
+        monkeypatch.setattr(config, "NOTIFICATIONS_MODE", mode)
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+        self.client.post("/api/notifications/read-all", headers=auth_header(self.requester_token))
+
+    def _create_and_approve(self, order_number):
+        req_id = create_request(self.client, self.requester_token, order_number)
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "signature": "sig"},
+            headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        return req_id
+
+    def _unread(self):
+        res = self.client.get("/api/notifications/unread-count", headers=auth_header(self.requester_token))
+        assert res.status_code == 200
+        return res.get_json()["unread"]
+
+    def _list(self, **params):
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        res = self.client.get(f"/api/notifications?{query}", headers=auth_header(self.requester_token))
+        assert res.status_code == 200
+        return res.get_json()
+
+    def test_counter_tracks_create_read_and_read_all(self, mode):
+        assert self._unread() == 0
+        latest = max((n["id"] for n in self._list()), default=0)
+
+        first = self._create_and_approve(f"PR-CNT-{mode}-1")
+        second = self._create_and_approve(f"PR-CNT-{mode}-2")
+        assert self._unread() == 2
+
+        fresh = self._list(since_id=latest)
+        assert [n["request_id"] for n in fresh] == [second, first]
+        assert self._list(since_id=fresh[0]["id"]) == []
+
+        read = f"/api/notifications/{fresh[1]['id']}/read"
+        assert self.client.post(read, headers=auth_header(self.requester_token)).status_code == 200
+        assert self._unread() == 1
+        # قراءة مكررة لا تُنقص العدّاد مرة أخرى
+        assert self.client.post(read, headers=auth_header(self.requester_token)).status_code == 200
+        assert self._unread() == 1
+
+        self.client.post("/api/notifications/read-all", headers=auth_header(self.requester_token))
+        assert self._unread() == 0
+
+    def test_unread_count_is_one_lookup(self, mode):
+        with count_statements() as statements:
+            self._unread()
+        assert len([s for s in statements if s.startswith("SELECT")]) == 1
+
+    def test_since_id_pages_ascending_without_gaps(self, mode, monkeypatch):
+        from backend.routes import notifications
+
+        latest = max((n["id"] for n in self._list()), default=0)
+        created = [self._create_and_approve(f"PR-CNT-{mode}-P{i}") for i in range(3)]
+        monkeypatch.setattr(notifications, "LIST_LIMIT", 2)
+
+        page = self._list(since_id=latest)
+        assert [n["request_id"] for n in page] == [created[1], created[0]]  # الأقدم بعد since_id، الأحدث أولاً
+        rest = self._list(since_id=page[0]["id"])
+        assert [n["request_id"] for n in rest] == [created[2]]
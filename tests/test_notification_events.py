@@ -0,0 +1,162 @@
+"""
+اختبار الإشعارات بنمط fan-out-on-read (NOTIFICATIONS_MODE=events)
+"""
+
+import pytest
+from werkzeug.security import generate_password_hash
+from tests.conftest import login, auth_header, create_request
+
+
+class TestNotificationEvents:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client, monkeypatch):
+        from backend import config
+        monkeypatch.setattr(config, "NOTIFICATIONS_MODE", "events")
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    @pytest.fixture
+    def finance_user(self):
+        """مستخدم بدور finance — يصله الإشعار عبر جمهور الدور لا عبر صف خاص به"""
+        from backend.database import SessionLocal
+        from backend.models import User
+        from backend.services.user_directory import invalidate_users
+
+        db = SessionLocal()
+        try:
+            db.add(User(username="finance_events", password_hash=generate_password_hash("Fin@Events1"),
+                        full_name="محاسب", role="finance", department="مالية"))
+            invalidate_users(db)
+            db.commit()
+            yield login(self.client, "finance_events", "Fin@Events1")
+        finally:
+            db.query(User).filter(User.username == "finance_events").delete()
+            invalidate_users(db)
+            db.commit()
+            db.close()
+
+    def _create_and_approve(self, order_number):
+        req_id = create_request(self.client, self.requester_token, order_number)
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "signature": "sig"},
+            headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        return req_id
+
+    def _list(self, token):
+        res = self.client.get("/api/notifications", headers=auth_header(token))
+        assert res.status_code == 200
+        return res.get_json()
+
+    def test_one_event_per_change_with_read_markers(self, finance_user):
+        from backend.database import SessionLocal
+        from backend.models import Notification, NotificationEvent
+
+        req_id = self._create_and_approve("PR-EVT-001")
+        db = SessionLocal()
+        try:
+            assert db.query(NotificationEvent).filter(NotificationEvent.request_id == req_id).count() == 1
+            assert db.query(Notification).filter(Notification.request_id == req_id).count() == 0
+        finally:
+            db.close()
+
+        mine = [n for n in self._list(self.requester_token) if n["request_id"] == req_id]
+        assert len(mine) == 1 and mine[0]["is_read"] is False
+        assert set(mine[0]) >= {"id", "title", "message", "action_type", "actor_username", "created_at"}
+        # دور المالية يُحل عند القراءة
+        assert any(n["request_id"] == req_id for n in self._list(finance_user))
+
+        event_id = mine[0]["id"]
+        read = self.client.post(f"/api/notifications/{event_id}/read", headers=auth_header(self.requester_token))
+        assert read.status_code == 200
+        assert next(n for n in self._list(self.requester_token) if n["id"] == event_id)["is_read"] is True
+        # القراءة لكل مستخدم على حدة
+        assert next(n for n in self._list(finance_user) if n["id"] == event_id)["is_read"] is False
+
+        outsider = login(self.client, "procurement_user", "Procure@24")
+        res = self.client.post(f"/api/notifications/{event_id}/read", headers=auth_header(outsider))
+        assert res.status_code == 404
+
+        self._create_and_approve("PR-EVT-002")
+        res = self.client.post("/api/notifications/read-all", headers=auth_header(finance_user))
+        assert res.status_code == 200
+        assert all(n["is_read"] for n in self._list(finance_user))
+
+    def test_role_events_before_user_are_hidden_and_uncounted(self):
+        """حدث لدور finance قبل إنشاء المستخدم: لا يظهر في قائمته ولا يُحسب في عدّاده"""
+        from backend.database import SessionLocal
+        from backend.models import User
+        from backend.services.user_directory import invalidate_users
+
+        self._create_and_approve("PR-EVT-003")
+        db = SessionLocal()
+        try:
+            db.add(User(username="finance_late", password_hash=generate_password_hash("Fin@Late1"),
+                        full_name="محاسب", role="finance", department="مالية"))
+            invalidate_users(db)
+            db.commit()
+            token = login(self.client, "finance_late", "Fin@Late1")
+            unread = lambda: self.client.get("/api/notifications/unread-count", headers=auth_header(token)).get_json()["unread"]
+
+            assert self._list(token) == []
+            assert unread() == 0
+
+            self._create_and_approve("PR-EVT-004")
+            assert unread() == 1
+            fresh, = self._list(token)
+            assert self.client.post(f"/api/notifications/{fresh['id']}/read", headers=auth_header(token)).status_code == 200
+            assert unread() == 0
+        finally:
+            db.query(User).filter(User.username == "finance_late").delete()
+            invalidate_users(db)
+            db.commit()
+            db.close()
+
+    def test_migrate_rows_to_events(self, monkeypatch):
+        from backend import config
+        from backend.database import SessionLocal
+        from backend.models import Notification, NotificationEvent, NotificationReadMark
+        from backend.services.counters import clear_counter, read_counters, unread_counter_key
+        from backend.services.notification_events import count_unread_events, migrate_rows_to_events
+        from backend.utils.notifications import create_notification
+
+        monkeypatch.setattr(config, "NOTIFICATIONS_MODE", "rows")
+        db = SessionLocal()
+        try:
+            for i in range(3):
+                create_notification(
+                    db, request_id=None, recipients=["requester_hr", "manager_hr"],
+                    title=f"ترحيل {i}", message="رسالة", action_type="info",
+                )
+            db.commit()
+            db.query(Notification).filter(
+                Notification.title == "ترحيل 0", Notification.recipient_username == "manager_hr",
+            ).update({"is_read": True})
+            clear_counter(db, unread_counter_key("requester_hr"))  # عدّاد منحرف قبل التحويل
+            db.commit()
+
+            stats = migrate_rows_to_events(db, batch_size=3)
+            assert stats["rows"] >= 6
+            assert db.query(Notification).count() == 0
+
+            events = db.query(NotificationEvent).filter(NotificationEvent.title.like("ترحيل %")).all()
+            assert len(events) == 3
+            first = next(e for e in events if e.title == "ترحيل 0")
+            assert {(a.kind, a.value) for a in first.audience} == {("user", "requester_hr"), ("user", "manager_hr")}
+            marks = db.query(NotificationReadMark).filter(NotificationReadMark.event_id == first.id).all()
+            assert [m.username for m in marks] == ["manager_hr"]
+
+            # العدّادات أُعيد بناؤها من الأحداث وقراءاتها رغم أن الوضع ما زال rows
+            for username, role in (("requester_hr", "requester"), ("manager_hr", "manager")):
+                key = unread_counter_key(username)
+                assert read_counters(db, [key])[key] == count_unread_events(db, username, role) > 0
+        finally:
+            db.close()
+
+        monkeypatch.setattr(config, "NOTIFICATIONS_MODE", "events")
+        listed = [n for n in self._list(self.manager_token) if n["title"] == "ترحيل 0"]
+        assert len(listed) == 1 and listed[0]["is_read"] is True
@@ -0,0 +1,128 @@
+"""
+اختبار أرشفة الإشعارات المقروءة القديمة — دفعات قصيرة وتقرير بالصفوف المنقولة
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from tests.conftest import login, auth_header
+
+
+class TestNotificationRetention:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client, monkeypatch):
+        from backend import config
+        monkeypatch.setattr(config, "NOTIFICATION_ARCHIVE_BATCH", 2)
+        monkeypatch.setattr(config, "NOTIFICATION_ARCHIVE_PAUSE", 0)
+        self.client = seeded_client
+        self.admin_token = login(seeded_client, "admin", "Admin@2024")
+
+    def _seed(self):
+        from backend.database import SessionLocal
+        from backend.models import Notification
+
+        now = datetime.now(timezone.utc)
+        rows = (
+            [("old-read", True, 200)] * 5
+            + [("old-unread", False, 200)] * 2
+            + [("recent-read", True, 1)] * 2
+        )
+        db = SessionLocal()
+        try:
+            db.add_all(
+                Notification(
+                    recipient_username="retention_user", title=title, message="رسالة",
+                    action_type="info", is_read=is_read, created_at=now - timedelta(days=age),
+                )
+                for title, is_read, age in rows
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _archive(self, **body):
+        return self.client.post(
+            "/api/admin/notifications/archive", json=body, headers=auth_header(self.admin_token),
+        )
+
+    def test_moves_old_read_rows_in_bounded_batches(self):
+        from backend.database import SessionLocal
+        from backend.models import Notification, NotificationArchive
+
+        self._seed()
+        first = self._archive(days=30, max_batches=1).get_json()
+        assert (first["rows"], first["batches"], first["done"]) == (2, 1, False)
+        assert "seconds" in first
+
+        rest = self._archive(days=30).get_json()
+        assert (rest["rows"], rest["done"]) == (3, True)
+
+        db = SessionLocal()
+        try:
+            left = [t for (t,) in db.query(Notification.title).filter(Notification.recipient_username == "retention_user")]
+            archived = db.query(NotificationArchive).filter(NotificationArchive.recipient_username == "retention_user").all()
+        finally:
+            db.close()
+        assert sorted(left) == ["old-unread", "old-unread", "recent-read", "recent-read"]
+        assert len(archived) == 5 and all(a.title == "old-read" and a.archived_at for a in archived)
+
+        assert self._archive(days=30).get_json()["rows"] == 0
+
+    def test_admin_only_and_validates_input(self):
+        requester = login(self.client, "requester_hr", "Hr2024!")
+        res = self.client.post("/api/admin/notifications/archive", json={}, headers=auth_header(requester))
+        assert res.status_code == 403
+        assert self._archive(days="abc").status_code == 400
+        assert self._archive(max_batches=0).status_code == 400
+
+    def test_events_mode_archives_events_read_by_their_audience(self, monkeypatch):
+        from backend import config
+        from backend.database import SessionLocal
+        from backend.models import (
+            NotificationAudience, NotificationEvent, NotificationEventArchive, NotificationReadMark, User,
+        )
+
+        monkeypatch.setattr(config, "NOTIFICATIONS_MODE", "events")
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.add(User(username="retention_proc", password_hash="x", full_name="مشتريات",
+                        role="procurement", department="المشتريات", created_at=now - timedelta(days=400)))
+            events = {}
+            for title, audience, age in (
+                ("ev-read", [("user", "requester_hr")], 200),
+                ("ev-unread", [("user", "requester_hr")], 200),
+                ("ev-role", [("role", "procurement")], 200),   # retention_proc لم يقرأه
+                ("ev-recent", [("user", "requester_hr")], 1),
+                ("ev-ghost", [("user", "no_such_user")], 200),  # لا أحد محسوب له
+            ):
+                events[title] = NotificationEvent(
+                    title=title, message="رسالة", action_type="info", created_at=now - timedelta(days=age),
+                    audience=[NotificationAudience(kind=k, value=v) for k, v in audience],
+                )
+            db.add_all(events.values())
+            db.flush()
+            ids = {title: e.id for title, e in events.items()}
+            db.add_all([
+                NotificationReadMark(username="requester_hr", event_id=ids["ev-read"]),
+                NotificationReadMark(username="requester_hr", event_id=ids["ev-recent"]),
+            ])
+            db.commit()
+
+            res = self._archive(days=30).get_json()
+            assert res["done"] and res["events"] >= 2
+            left = {t for (t,) in db.query(NotificationEvent.title).filter(NotificationEvent.title.like("ev-%"))}
+            assert left == {"ev-unread", "ev-role", "ev-recent"}
+            archived = db.query(NotificationEventArchive).filter(NotificationEventArchive.id == ids["ev-read"]).one()
+            assert archived.audience == "user:requester_hr" and archived.archived_at
+            assert db.query(NotificationAudience).filter(NotificationAudience.event_id == ids["ev-read"]).count() == 0
+            assert db.query(NotificationReadMark).filter(NotificationReadMark.event_id == ids["ev-read"]).count() == 0
+
+            db.add(NotificationReadMark(username="retention_proc", event_id=ids["ev-role"]))
+            db.commit()
+            assert self._archive(days=30).get_json()["events"] == 1
+        finally:
+            db.query(User).filter(User.username == "retention_proc").delete()
+            db.commit()
+            db.close()
@@ -0,0 +1,104 @@
+"""
+اختبار البث الحي /api/notifications/stream (SSE)
+"""
+
+import os
+import time
+
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+
+class TestNotificationStream:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client, monkeypatch, tmp_path):
+        from backend import config
+        monkeypatch.setattr(config, "LIVE_HEARTBEAT_SECONDS", 0.2)
+        monkeypatch.setattr(config, "LIVE_STREAM_SECONDS", 5)
+        monkeypatch.setattr(config, "LIVE_POLL_SECONDS", 0.05)
+        monkeypatch.setattr(config, "LIVE_SIGNAL_DIR", str(tmp_path))
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    def _stream_token(self, token):
+        res = self.client.post("/api/notifications/stream-token", headers=auth_header(token))
+        assert res.status_code == 200
+        return res.get_json()["token"]
+
+    @staticmethod
+    def _read_until(chunks, predicate, seconds=3):
+        received = ""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not predicate(received):
+            received += next(chunks).decode()
+        return received
+
+    def test_pushes_notification_and_queue_hint_after_commit(self):
+        req_id = create_request(self.client, self.requester_token, "PR-SSE-001")
+        res = self.client.get(
+            f"/api/notifications/stream?token={self._stream_token(self.requester_token)}", buffered=False,
+        )
+        assert res.status_code == 200
+        assert res.mimetype == "text/event-stream"
+        chunks = iter(res.response)
+        try:
+            assert next(chunks).decode().startswith("retry:")
+
+            approved = self.client.patch(
+                f"/api/requests/{req_id}/status",
+                json={"action": "approve", "signature": "sig"},
+                headers=auth_header(self.manager_token),
+            )
+            assert approved.status_code == 200
+
+            received = self._read_until(
+                chunks, lambda text: "event: queue" in text and f'"request_id": {req_id}' in text,
+            )
+            assert "event: queue" in received
+            assert "event: notification" in received
+            assert f'"request_id": {req_id}' in received
+        finally:
+            res.close()
+
+    def test_requires_stream_scoped_token(self):
+        assert self.client.get("/api/notifications/stream").status_code == 401
+        assert self.client.get("/api/notifications/stream?token=bad").status_code == 401
+        # توكن الجلسة لا يُقبل في الرابط، وتوكن البث لا يُقبل لغير البث
+        assert self.client.get(f"/api/notifications/stream?token={self.manager_token}").status_code == 401
+        stream_token = self._stream_token(self.manager_token)
+        assert self.client.get("/api/notifications", headers=auth_header(stream_token)).status_code == 401
+        assert self.client.post("/api/notifications/stream-token", headers=auth_header(stream_token)).status_code == 401
+        # الـ header ما زال مقبولاً
+        res = self.client.get("/api/notifications/stream", headers=auth_header(self.manager_token), buffered=False)
+        assert res.status_code == 200
+        res.close()
+
+    def test_concurrent_streams_capped(self, monkeypatch):
+        from backend import config
+        monkeypatch.setattr(config, "LIVE_MAX_STREAMS", 1)
+
+        first = self.client.get("/api/notifications/stream", headers=auth_header(self.manager_token), buffered=False)
+        assert first.status_code == 200
+        busy = self.client.get("/api/notifications/stream", headers=auth_header(self.manager_token))
+        assert busy.status_code == 503 and busy.headers["Retry-After"]
+        first.close()  # الإغلاق يحرر المكان
+
+        again = self.client.get("/api/notifications/stream", headers=auth_header(self.manager_token), buffered=False)
+        assert again.status_code == 200
+        again.close()
+
+    def test_signal_file_wakes_other_processes(self, tmp_path):
+        from backend.utils import live_events
+
+        live_events.versions()
+        time.sleep(0.2)  # تجاوز أي تغيير سابق في ملفات المجلد المؤقت
+        seen = live_events.versions()
+        # عملية أخرى تنشر: ملف الإشارة يُستبدل دون المرور بـ Condition هذه العملية
+        other = tmp_path / "other.tmp"
+        other.write_text("other-process")
+        os.replace(other, tmp_path / "live-queue.signal")
+
+        _, changed = live_events.wait_for_change(seen, timeout=3)
+        assert "queue" in changed
@@ -0,0 +1,75 @@
+"""
+اختبار الترقيم بالمؤشر (?limit=&cursor=) لقوائم الطلبات
+"""
+
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+
+def _walk(client, url, token, limit):
+    """المرور على جميع الصفحات وإرجاع المعرفات بالترتيب"""
+    ids, cursor = [], None
+    while True:
+        q = f"{url}?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        res = client.get(q, headers=auth_header(token))
+        assert res.status_code == 200
+        body = res.get_json()
+        assert len(body["requests"]) <= limit
+        ids.extend(r["id"] for r in body["requests"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids
+
+
+class TestKeysetPagination:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    def test_pages_match_full_list(self):
+        """صفحات متتالية = القائمة الكاملة بنفس الترتيب وبلا تكرار"""
+        for i in range(5):
+            create_request(self.client, self.requester_token, f"PR-PAGE-{i:03d}")
+
+        full = self.client.get("/api/my/requests", headers=auth_header(self.requester_token))
+        assert isinstance(full.get_json(), list)
+        full_ids = [r["id"] for r in full.get_json()]
+
+        assert _walk(self.client, "/api/my/requests", self.requester_token, 2) == full_ids
+
+    def test_queue_and_list_paging(self):
+        """طابور المدير وقائمة الطلبات تدعمان الترقيم"""
+        for url in ("/api/my/queue", "/api/requests"):
+            full = self.client.get(url, headers=auth_header(self.manager_token)).get_json()
+            paged = _walk(self.client, url, self.manager_token, 3)
+            assert paged == [r["id"] for r in full]
+
+    def test_actioned_paging_uses_action_time(self):
+        """قائمة المعتمدة تُرقّم بالمؤشر (action_at, id)"""
+        for i in range(3):
+            req_id = create_request(self.client, self.requester_token, f"PR-PAGE-APR-{i}")
+            res = self.client.patch(
+                f"/api/requests/{req_id}/status",
+                json={"action": "approve", "signature": "sig"},
+                headers=auth_header(self.manager_token),
+            )
+            assert res.status_code == 200
+
+        full = self.client.get("/api/my/approved", headers=auth_header(self.manager_token)).get_json()
+        paged = _walk(self.client, "/api/my/approved", self.manager_token, 1)
+        assert paged == [r["id"] for r in full]
+
+    def test_invalid_cursor_rejected(self):
+        res = self.client.get(
+            "/api/my/requests?cursor=not-a-cursor",
+            headers=auth_header(self.requester_token),
+        )
+        assert res.status_code == 400
+        res = self.client.get(
+            "/api/my/requests?limit=0",
+            headers=auth_header(self.requester_token),
+        )
+        assert res.status_code == 400
@@ -0,0 +1,50 @@
+"""
+اختبار عدد استعلامات SQL في طابور العمل — يجب ألا يتغير مع طول الطابور (بلا N+1)
+"""
+
+import pytest
+
+from tests.conftest import login, auth_header, count_statements, create_request
+
+
+class TestQueueQueryCount:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_finance", "Fin2024!")
+        self.finance_token = login(seeded_client, "manager_finance", "Finance@24")
+
+    def _queue(self):
+        with count_statements() as statements:
+            res = self.client.get("/api/my/queue", headers=auth_header(self.finance_token))
+        assert res.status_code == 200
+        return res.get_json(), len(statements)
+
+    def test_constant_statements_regardless_of_queue_length(self):
+        create_request(self.client, self.requester_token, "PR-N1-000", department="مالية", lines=2)
+        small, small_count = self._queue()
+
+        for i in range(1, 6):
+            create_request(self.client, self.requester_token, f"PR-N1-{i:03d}", department="مالية", lines=3)
+        large, large_count = self._queue()
+
+        assert len(large) == len(small) + 5
+        assert large_count == small_count
+        # كل طلب في الطابور يحمل أصنافه
+        assert all(r["items"] for r in large if r["order_number"].startswith("PR-N1-"))
+
+    def test_items_loaded_in_bounded_chunks(self, monkeypatch):
+        from backend.database import SessionLocal
+        from backend.services import request_projections
+
+        req_id = create_request(self.client, self.requester_token, "PR-N1-CHUNK", department="مالية", lines=2)
+        monkeypatch.setattr(request_projections, "IN_CHUNK_SIZE", 3)
+        db = SessionLocal()
+        try:
+            with count_statements() as statements:
+                grouped = request_projections.load_items_by_request(db, [req_id, *range(10**6, 10**6 + 6)])
+        finally:
+            db.close()
+        assert len([s for s in statements if "FROM purchase_items" in s]) == 3
+        assert [row.item_name for row in grouped[req_id]] == ["صنف 0", "صنف 1"]
@@ -0,0 +1,101 @@
+"""
+اختبار النسخ المجمّدة للطلبات المنتهية (completed / rejected)
+"""
+
+import gzip
+import json
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+
+class TestRequestSnapshots:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_finance", "Fin2024!")
+        self.finance_token = login(seeded_client, "manager_finance", "Finance@24")
+        self.exec_token = login(seeded_client, "manager_exec", "Exec@2024")
+        self.procurement_token = login(seeded_client, "procurement_user", "Procure@24")
+
+    def _act(self, req_id, token, **body):
+        res = self.client.patch(f"/api/requests/{req_id}/status", json=body, headers=auth_header(token))
+        assert res.status_code == 200
+        return res.get_json()
+
+    def _has_snapshot(self, req_id):
+        from backend.database import SessionLocal
+        from backend.services.request_details import snapshot_etag
+        db = SessionLocal()
+        try:
+            return snapshot_etag(db, req_id) is not None
+        finally:
+            db.close()
+
+    def test_rejected_request_served_from_snapshot(self):
+        req_id = create_request(self.client, self.requester_token, "PR-SNAP-REJ", department="مالية")
+        assert not self._has_snapshot(req_id)
+        live = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token))
+        assert live.headers["Cache-Control"] == "private, no-cache"
+
+        self._act(req_id, self.finance_token, action="reject", note="مكرر")
+        assert self._has_snapshot(req_id)
+
+        res = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token))
+        assert res.status_code == 200
+        assert res.headers["Cache-Control"] == "private, no-cache"  # إعادة الفتح ممكنة — لا max-age
+        data = res.get_json()
+        assert data["status"] == "rejected"
+        assert data["items"][0]["item_name"] == "صنف 0"
+
+        # العميل الذي يقبل gzip يستلم المحتوى المضغوط كما هو
+        headers = {**auth_header(self.requester_token), "Accept-Encoding": "gzip"}
+        zipped = self.client.get(f"/api/requests/{req_id}", headers=headers)
+        assert zipped.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(zipped.data)) == data
+
+        etag = res.headers["ETag"].strip('"')
+        headers = {**auth_header(self.requester_token), "If-None-Match": f'"{etag}"'}
+        assert self.client.get(f"/api/requests/{req_id}", headers=headers).status_code == 304
+
+    def test_procurement_reopen_drops_snapshot(self):
+        req_id = create_request(self.client, self.requester_token, "PR-SNAP-DONE", department="مالية")
+        self._act(req_id, self.finance_token, action="approve", signature="fm_sig")
+        self._act(req_id, self.exec_token, action="approve", signature="exec_sig")
+
+        url = f"/api/procurement/requests/{req_id}"
+        res = self.client.patch(url, json={"mark_completed": True}, headers=auth_header(self.procurement_token))
+        assert res.get_json()["status"] == "completed"
+        assert self._has_snapshot(req_id)
+        frozen = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token)).get_json()
+        assert frozen["approval_dates"]
+
+        res = self.client.patch(url, json={"procurement_status": "adjusted"}, headers=auth_header(self.procurement_token))
+        assert res.get_json()["status"] == "pending_procurement"
+        assert not self._has_snapshot(req_id)
+        live = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token))
+        assert live.get_json()["status"] == "pending_procurement"
+        assert live.headers["Cache-Control"] == "private, no-cache"
+
+    def test_legacy_terminal_request_frozen_by_migration_not_on_read(self):
+        from backend.database import SessionLocal
+        from backend.migrate_db import _migration_freeze_terminal
+        from backend.models import RequestSnapshot
+
+        req_id = create_request(self.client, self.requester_token, "PR-SNAP-LEGACY", department="مالية")
+        self._act(req_id, self.finance_token, action="reject", note="قديم")
+        db = SessionLocal()
+        try:  # كطلب أُنهي قبل وجود النسخ
+            db.query(RequestSnapshot).delete()
+            db.commit()
+        finally:
+            db.close()
+
+        res = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token))
+        assert res.get_json()["status"] == "rejected"
+        assert not self._has_snapshot(req_id)  # القراءة لا تكتب
+
+        _migration_freeze_terminal()
+        assert self._has_snapshot(req_id)
+        res = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token))
+        assert res.get_json()["status"] == "rejected"
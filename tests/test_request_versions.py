@@ -0,0 +1,132 @@
+"""
+اختبار التحكم المتفائل بالتزامن — رقم نسخة الطلب و 409 مع الحالة الحالية
+"""
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+from tests.conftest import login, auth_header, create_request
+
+
+class TestRequestVersions:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    def _create(self, order_number):
+        req_id = create_request(self.client, self.requester_token, order_number, lines=2, price=10)
+        details = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.manager_token)).get_json()
+        return req_id, details
+
+    def _history_count(self, req_id):
+        from backend.database import SessionLocal
+        from backend.models import ApprovalHistory
+
+        db = SessionLocal()
+        try:
+            return db.query(ApprovalHistory).filter(ApprovalHistory.request_id == req_id).count()
+        finally:
+            db.close()
+
+    def test_stale_approval_gets_409_with_current_state(self):
+        req_id, details = self._create("PR-VER-001")
+        seen = details["version"]
+        item_id = details["items"][0]["id"]
+
+        # مستخدم آخر يرفض بنداً بعد أن فُتح الطلب
+        res = self.client.post(
+            f"/api/requests/{req_id}/items/{item_id}/action",
+            json={"action": "reject", "reason": "مكرر", "version": seen},
+            headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        assert res.get_json()["request"]["version"] == seen + 1
+
+        history_before = self._history_count(req_id)
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "version": seen}, headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 409
+        current = res.get_json()["current"]
+        assert current["version"] == seen + 1
+        assert current["status"] == "pending_manager"
+        assert current["total_amount"] == 10
+        assert self._history_count(req_id) == history_before  # لا سجل موافقة مكرر
+
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "version": current["version"]}, headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        assert res.get_json()["version"] > current["version"]
+
+    def test_item_actions_then_approve_with_returned_version(self):
+        """مسار صفحة المدير: قرارات على البنود ثم موافقة بالنسخة التي أعادها آخر قرار"""
+        req_id, details = self._create("PR-VER-004")
+        version = details["version"]
+        for item, body in zip(details["items"], ({"action": "approve"}, {"action": "reject", "reason": "مكرر"})):
+            res = self.client.post(f"/api/requests/{req_id}/items/{item['id']}/action",
+                                   json=body, headers=auth_header(self.manager_token))
+            assert res.status_code == 200
+            assert res.get_json()["request"]["version"] > version
+            version = res.get_json()["request"]["version"]
+
+        res = self.client.patch(f"/api/requests/{req_id}/status", json={"action": "approve", "version": details["version"]},
+                                headers=auth_header(self.manager_token))
+        assert res.status_code == 409  # النسخة المعروضة عند فتح الطلب لم تعد صالحة
+
+        res = self.client.patch(f"/api/requests/{req_id}/status", json={"action": "approve", "version": version},
+                                headers=auth_header(self.manager_token))
+        assert res.status_code == 200
+
+    def test_if_match_header_and_validation(self):
+        req_id, details = self._create("PR-VER-002")
+        items = [{"id": it["id"], "action": "approve"} for it in details["items"]]
+
+        res = self.client.post(
+            f"/api/requests/{req_id}/items/bulk-action", json={"items": items},
+            headers={**auth_header(self.manager_token), "If-Match": f'"{details["version"] + 5}"'},
+        )
+        assert res.status_code == 409
+        res = self.client.post(
+            f"/api/requests/{req_id}/items/bulk-action", json={"items": items},
+            headers={**auth_header(self.manager_token), "If-Match": f'W/"{details["version"]}"'},
+        )
+        assert res.status_code == 200
+
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "version": "abc"}, headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 400
+
+        admin_token = login(self.client, "admin", "Admin@2024")
+        res = self.client.patch(
+            f"/api/procurement/requests/{req_id}", json={"version": 1}, headers=auth_header(admin_token),
+        )
+        assert res.status_code == 409
+
+    def test_orm_update_is_compare_and_swap(self):
+        from backend.database import SessionLocal
+        from backend.models import PurchaseRequest
+
+        req_id, _ = self._create("PR-VER-003")
+        db = SessionLocal()
+        try:
+            pr = db.get(PurchaseRequest, req_id)
+            # كاتب آخر يزيد النسخة بعد أن قرأنا الطلب
+            db.execute(
+                update(PurchaseRequest.__table__)
+                .where(PurchaseRequest.__table__.c.id == req_id)
+                .values(version=pr.version + 1)
+            )
+            pr.procurement_note = "تعديل متأخر"
+            with pytest.raises(StaleDataError):
+                db.flush()
+        finally:
+            db.rollback()
+            db.close()
@@ -0,0 +1,74 @@
+"""
+اختبار سجل ترحيلات المخطط — الإقلاع لا يفعل شيئاً حين يكون المخطط حديثاً
+"""
+
+import pytest
+
+
+@pytest.fixture
+def boot_calls(app, monkeypatch):
+    """تسجيل استدعاءات النسخ الاحتياطي وفحص السلامة و inspect أثناء run_migrations"""
+    from backend import migrate_db
+    from backend.utils import backup, integrity
+
+    calls = []
+    monkeypatch.setattr(backup, "backup_database", lambda reason="auto": calls.append(("backup", reason)))
+    monkeypatch.setattr(integrity, "verify_data_integrity", lambda: calls.append(("integrity",)))
+    monkeypatch.setattr(migrate_db, "inspect", lambda *a: calls.append(("inspect",)) or pytest.fail("inspect()"))
+    return calls
+
+
+def test_current_schema_boots_without_work(boot_calls):
+    from backend.migrate_db import SCHEMA_VERSION, current_schema_version, run_migrations
+
+    assert current_schema_version() == SCHEMA_VERSION  # create_app طبّق baseline وسجّله
+    result = run_migrations(force=False)
+    assert result["applied"] == [] and result["from"] == result["to"] == SCHEMA_VERSION
+    assert boot_calls == []
+
+
+def test_pending_step_runs_once_with_backup_and_checks(boot_calls, monkeypatch):
+    from backend import migrate_db
+    from backend.database import SessionLocal
+    from backend.models import SchemaVersion
+
+    steps = []
+    next_version = migrate_db.SCHEMA_VERSION + 1
+    monkeypatch.setattr(migrate_db, "MIGRATIONS", migrate_db.MIGRATIONS + (
+        (next_version, "اختبار", lambda: steps.append("ran")),
+    ))
+    monkeypatch.setattr(migrate_db, "SCHEMA_VERSION", next_version)
+    try:
+        result = migrate_db.run_migrations(force=False)
+        assert result["applied"] == ["اختبار"] and result["to"] == next_version
+        assert steps == ["ran"]
+        assert ("backup", "migration") in boot_calls and ("integrity",) in boot_calls
+
+        boot_calls.clear()
+        assert migrate_db.run_migrations(force=False)["applied"] == []
+        assert steps == ["ran"] and boot_calls == []
+    finally:
+        db = SessionLocal()
+        try:
+            db.query(SchemaVersion).filter(SchemaVersion.version == next_version).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def test_baseline_raises_when_schema_left_incomplete(app, monkeypatch):
+    """migrate_database يبتلع أخطاء الفهارس/الأعمدة — baseline يفحص المخطط قبل تسجيل النسخة"""
+    from sqlalchemy import text
+    from backend import migrate_db
+    from backend.database import engine
+
+    monkeypatch.setattr(migrate_db, "migrate_database", lambda: True)  # "نجح" دون إنشاء الفهرس
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_pr_created_by"))
+    try:
+        with pytest.raises(RuntimeError, match="ix_pr_created_by"):
+            migrate_db._migration_baseline()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pr_created_by ON purchase_requests (created_by)"))
+    migrate_db._migration_baseline()
@@ -0,0 +1,120 @@
+"""
+اختبار مخزن التواقيع بعنوان المحتوى (signature_blobs)
+"""
+
+import base64
+import hashlib
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"signature-pixels" * 64
+SIGNATURE = "data:image/png;base64," + base64.b64encode(PNG).decode()
+
+
+class TestSignatureStore:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_finance", "Fin2024!")
+        self.finance_token = login(seeded_client, "manager_finance", "Finance@24")
+
+    def test_rows_store_reference_and_details_resolve(self):
+        from backend.database import SessionLocal
+        from backend.models import PurchaseRequest, ApprovalHistory, SignatureBlob
+
+        req_id = create_request(self.client, self.requester_token, "PR-SIG-001", department="مالية")
+        # مدير المالية يوافق كمدير مباشر → تخطٍّ تلقائي للمالية بنفس التوقيع
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "signature": SIGNATURE},
+            headers=auth_header(self.finance_token),
+        )
+        assert res.get_json()["status"] == "pending_disbursement"
+
+        db = SessionLocal()
+        try:
+            pr = db.get(PurchaseRequest, req_id)
+            assert pr.manager_signature.startswith("sha256:")
+            assert pr.finance_signature == pr.manager_signature
+            stored = {
+                h.signature for h in db.query(ApprovalHistory).filter(
+                    ApprovalHistory.request_id == req_id, ApprovalHistory.signature.isnot(None)
+                )
+            }
+            assert stored == {pr.manager_signature}
+            digest = pr.manager_signature.split(":", 1)[1]
+            assert db.query(SignatureBlob).filter(SignatureBlob.hash == digest).count() == 1
+        finally:
+            db.close()
+
+        details = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token)).get_json()
+        assert "signatures" not in details  # الصورة من /api/signatures/<digest> لا داخل التفاصيل
+        assert details["signature_refs"] == {"manager": digest, "finance": digest, "disbursement": None}
+
+        image = self.client.get(f"/api/signatures/{digest}", headers=auth_header(self.requester_token))
+        assert image.status_code == 200
+        assert image.mimetype == "image/png"
+        assert image.data == PNG
+        assert "immutable" in image.headers["Cache-Control"]
+
+        headers = {**auth_header(self.requester_token), "If-None-Match": f'"{digest}"'}
+        assert self.client.get(f"/api/signatures/{digest}", headers=headers).status_code == 304
+        assert self.client.get("/api/signatures/deadbeef", headers=auth_header(self.requester_token)).status_code == 404
+        # If-None-Match لا يكفي وحده: توقيع غير موجود يبقى 404
+        missing = "0" * 64
+        for etag in (f'"{missing}"', "*"):
+            headers = {**auth_header(self.requester_token), "If-None-Match": etag}
+            assert self.client.get(f"/api/signatures/{missing}", headers=headers).status_code == 404
+
+    def test_migration_converts_inline_rows(self):
+        from backend.database import SessionLocal
+        from backend.models import PurchaseRequest
+        from backend.services.signatures import migrate_signatures
+
+        req_id = create_request(self.client, self.requester_token, "PR-SIG-LEGACY", department="مالية")
+        legacy = SIGNATURE + "legacy"
+        db = SessionLocal()
+        try:
+            pr = db.get(PurchaseRequest, req_id)
+            pr.manager_signature = legacy
+            pr.finance_signature = legacy
+            db.commit()
+
+            stats = migrate_signatures(db)
+            assert (stats["rows"], stats["blobs"]) == (2, 1)
+            # نسختان مضمّنتان → نسخة واحدة في المخزن + مرجعان قصيران
+            assert stats["reclaimed"] == len(legacy) - 2 * len("sha256:" + "0" * 64)
+
+            db.expire_all()
+            pr = db.get(PurchaseRequest, req_id)
+            assert pr.manager_signature.startswith("sha256:")
+            assert migrate_signatures(db)["rows"] == 0
+        finally:
+            db.close()
+
+        details = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token)).get_json()
+        digest = details["signature_refs"]["manager"]
+        assert digest == hashlib.sha256(legacy.encode("utf-8")).hexdigest()
+        assert self.client.get(f"/api/signatures/{digest}", headers=auth_header(self.requester_token)).status_code == 200
+
+    def test_snapshot_holds_refs_not_images(self):
+        import gzip
+        from backend.database import SessionLocal
+        from backend.services.request_details import snapshot_payload
+
+        req_id = create_request(self.client, self.requester_token, "PR-SIG-SNAP", department="مالية")
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "reject", "note": "مكرر", "signature": SIGNATURE},
+            headers=auth_header(self.finance_token),
+        )
+        assert res.get_json()["status"] == "rejected"
+
+        db = SessionLocal()
+        try:
+            payload = gzip.decompress(snapshot_payload(db, req_id)).decode("utf-8")
+        finally:
+            db.close()
+        assert "base64," not in payload and SIGNATURE.split(",", 1)[1][:40] not in payload
+        assert len(payload) < len(SIGNATURE)
@@ -0,0 +1,83 @@
+"""
+اختبار فحص تراجع الحالة — جدول مؤقت + join واحد + UPDATE ... FROM واحد
+"""
+
+from sqlalchemy import insert, text
+from tests.conftest import count_statements
+
+
+def _seed(db, statuses):
+    from backend.models import PurchaseRequest
+
+    ids = []
+    for n, status in enumerate(statuses):
+        result = db.execute(insert(PurchaseRequest).values(
+            requester="موظف", department="مالية", delivery_address="المكتب",
+            delivery_date="2026-03-01", project_code="REGRESS", order_number=f"REGRESS-{n}",
+            currency="SYP", total_amount=10.0, status=status, current_stage="x", next_role="x",
+            created_by="requester_finance",
+        ))
+        ids.append(result.inserted_primary_key[0])
+    db.commit()
+    return ids
+
+
+def _status(db, req_id):
+    return db.execute(text("SELECT status FROM purchase_requests WHERE id = :id"), {"id": req_id}).scalar()
+
+
+def _version(db, req_id):
+    return db.execute(text("SELECT version, updated_at FROM purchase_requests WHERE id = :id"), {"id": req_id}).one()
+
+
+def test_regressions_detected_and_repaired_in_constant_statements(seeded_app):
+    from backend.database import SessionLocal
+    from backend.utils.integrity import check_status_regression, protect_approved_requests
+
+    db = SessionLocal()
+    try:
+        statuses = ["pending_finance", "pending_disbursement", "completed", "pending_procurement"] * 30
+        ids = _seed(db, statuses)
+        snapshot = {k: v for k, v in protect_approved_requests().items() if k in ids}
+        assert len(snapshot) == len(ids)
+
+        # تراجع، تقدّم طبيعي، وحالة غير معروفة (-1)
+        db.execute(text("UPDATE purchase_requests SET status = 'pending_manager' WHERE id = :id"), {"id": ids[0]})
+        db.execute(text("UPDATE purchase_requests SET status = 'pending_finance' WHERE id = :id"), {"id": ids[2]})
+        db.execute(text("UPDATE purchase_requests SET status = 'completed' WHERE id = :id"), {"id": ids[1]})
+        db.execute(text("UPDATE purchase_requests SET status = 'mystery' WHERE id = :id"), {"id": ids[3]})
+        db.commit()
+        before = {req_id: _version(db, req_id) for req_id in ids[:4]}
+        db.commit()
+
+        with count_statements() as statements:
+            regressions = check_status_regression(snapshot)
+        data_statements = [s for s in statements if "status_snapshot" in s]
+        assert len(data_statements) == 6  # create, delete, insert (executemany), select, update, drop
+
+        assert regressions == [
+            {"id": ids[0], "old_status": "pending_finance", "new_status": "pending_manager"},
+            {"id": ids[2], "old_status": "completed", "new_status": "pending_finance"},
+            {"id": ids[3], "old_status": "pending_procurement", "new_status": "mystery"},
+        ]
+        db.expire_all()
+        assert _status(db, ids[0]) == "pending_finance"
+        assert _status(db, ids[2]) == "completed"
+        assert _status(db, ids[3]) == "pending_procurement"
+        assert _status(db, ids[1]) == "completed"  # تقدّم — لا يُمس
+        for req_id in (ids[0], ids[2], ids[3]):  # الإصلاح يرفع النسخة و updated_at
+            assert _version(db, req_id).version == before[req_id].version + 1
+            # نصاً كما تقارنها العلامة المائية: بصيغة ORM وأحدث من الكتابة السابقة
+            assert _version(db, req_id).updated_at > before[req_id].updated_at
+        assert _version(db, ids[1]) == before[ids[1]]
+        db.commit()
+
+        assert check_status_regression(snapshot) == []
+    finally:
+        from backend.services.work_queue import rebuild_work_queue
+
+        db.rollback()
+        db.execute(text("DELETE FROM purchase_requests WHERE project_code = 'REGRESS'"))
+        rebuild_work_queue(db)
+        db.commit()
+        db.close()
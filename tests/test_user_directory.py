@@ -0,0 +1,70 @@
+"""
+اختبار دليل المستخدمين — مسار الموافقة بلا استعلامات متكررة عن users
+"""
+
+import pytest
+from tests.conftest import login, auth_header, count_statements, create_request
+
+
+class TestUserDirectory:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+
+    def _approve(self, req_id):
+        res = self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "signature": "sig"},
+            headers=auth_header(self.manager_token),
+        )
+        assert res.status_code == 200
+        return res.get_json()
+
+    def test_approval_reads_users_once(self):
+        self._approve(create_request(self.client, self.requester_token, "PR-DIR-WARM"))  # تحميل الدليل مسبقاً
+        req_id = create_request(self.client, self.requester_token, "PR-DIR-001")
+        with count_statements() as statements:
+            self._approve(req_id)
+        user_reads = [s for s in statements if "FROM users" in s]
+        # استعلام النسخة فقط — لا بحث عن المستخدم ولا عن المتابعين
+        assert len(user_reads) == 1, user_reads
+
+    def test_details_read_statements_are_constant(self):
+        """قراءة التفاصيل الكاملة: أسماء المعتمدين من الدليل — لا FROM users، والعدد لا يتبع الأصناف"""
+        counts = []
+        for order_number, lines in (("PR-DIR-READ-1", 1), ("PR-DIR-READ-5", 5)):
+            req_id = create_request(self.client, self.requester_token, order_number, lines=lines)
+            self._approve(req_id)
+            with count_statements() as statements:
+                res = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token))
+            assert res.status_code == 200 and len(res.get_json()["items"]) == lines
+            assert not [s for s in statements if "FROM users" in s]
+            counts.append(len(statements))
+        assert counts[0] == counts[1] <= 6, counts
+
+    def test_directory_reloads_after_invalidation(self):
+        from backend.database import SessionLocal
+        from backend.models import User
+        from backend.services.user_directory import invalidate_users
+
+        def rename(full_name):
+            db = SessionLocal()
+            try:
+                db.query(User).filter(User.username == "manager_hr").update({User.full_name: full_name})
+                invalidate_users(db)
+                db.commit()
+            finally:
+                db.close()
+
+        self._approve(create_request(self.client, self.requester_token, "PR-DIR-OLD"))
+        rename("محمد السرحان (مُحدّث)")
+        try:
+            req_id = create_request(self.client, self.requester_token, "PR-DIR-NEW")
+            self._approve(req_id)
+            details = self.client.get(f"/api/requests/{req_id}", headers=auth_header(self.requester_token)).get_json()
+            assert details["approval_data"]["manager_name"] == "محمد السرحان (مُحدّث)"
+        finally:
+            rename("محمد السرحان")
@@ -0,0 +1,116 @@
+"""
+اختبار صندوق العمل (work_queue) — التحديث مع كل انتقال وإعادة البناء
+"""
+
+import pytest
+from tests.conftest import login, auth_header, create_request
+
+
+def _queue_ids(client, token):
+    res = client.get("/api/my/queue", headers=auth_header(token))
+    assert res.status_code == 200
+    return {r["id"] for r in res.get_json()}
+
+
+class TestWorkQueue:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.requester_token = login(seeded_client, "requester_hr", "Hr2024!")
+        self.manager_token = login(seeded_client, "manager_hr", "HumanR@24")
+        self.finance_token = login(seeded_client, "manager_finance", "Finance@24")
+        self.procurement_token = login(seeded_client, "procurement_user", "Procure@24")
+
+    def test_entry_follows_transitions(self):
+        req_id = create_request(self.client, self.requester_token, "PR-WQ-001")
+        assert req_id in _queue_ids(self.client, self.manager_token)
+        assert req_id not in _queue_ids(self.client, self.finance_token)
+
+        self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "approve", "signature": "sig"},
+            headers=auth_header(self.manager_token),
+        )
+        assert req_id not in _queue_ids(self.client, self.manager_token)
+        assert req_id in _queue_ids(self.client, self.finance_token)
+
+        self.client.patch(
+            f"/api/requests/{req_id}/status",
+            json={"action": "reject", "note": "خارج الميزانية"},
+            headers=auth_header(self.finance_token),
+        )
+        assert req_id not in _queue_ids(self.client, self.finance_token)
+
+    def test_rebuild_matches_incremental_state(self):
+        from backend.database import SessionLocal
+        from backend.models import WorkQueueEntry
+        from backend.services.work_queue import rebuild_work_queue
+
+        db = SessionLocal()
+        try:
+            def snapshot():
+                return sorted(
+                    (e.request_id, e.stage, e.department)
+                    for e in db.query(WorkQueueEntry).all()
+                )
+            before = snapshot()
+            assert before, "يجب أن يحوي الصندوق طلبات من الاختبارات السابقة"
+            rebuild_work_queue(db)
+            db.commit()
+            db.expire_all()
+            assert snapshot() == before
+        finally:
+            db.close()
+
+
+class TestCounters:
+    """عدّادات /api/my/counters تطابق أطوال القوائم الكاملة"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+
+    def _counters(self, token):
+        res = self.client.get("/api/my/counters", headers=auth_header(token))
+        assert res.status_code == 200
+        return res.get_json()
+
+    def _len(self, url, token):
+        return len(self.client.get(url, headers=auth_header(token)).get_json())
+
+    def _assert_consistent(self, token):
+        counters = self._counters(token)
+        assert counters["pending"] == self._len("/api/my/queue", token)
+        assert counters["approved"] == self._len("/api/my/approved", token)
+        assert counters["rejected"] == self._len("/api/my/rejected", token)
+        assert counters["created"] == self._len("/api/my/requests", token)
+        return counters
+
+    def test_counters_match_lists(self):
+        for username, password in (
+            ("manager_hr", "HumanR@24"),
+            ("manager_finance", "Finance@24"),
+            ("manager_exec", "Exec@2024"),
+        ):
+            self._assert_consistent(login(self.client, username, password))
+
+        requester = login(self.client, "requester_hr", "Hr2024!")
+        counters = self._counters(requester)
+        assert counters["created"] == self._len("/api/my/requests", requester)
+
+    def test_rebuild_preserves_counters(self):
+        from backend.database import SessionLocal
+        from backend.services.counters import rebuild_user_counters
+        from backend.services.work_queue import rebuild_work_queue
+
+        token = login(self.client, "manager_finance", "Finance@24")
+        before = self._counters(token)
+        db = SessionLocal()
+        try:
+            rebuild_work_queue(db)
+            rebuild_user_counters(db)
+            db.commit()
+        finally:
+            db.close()
+        assert self._counters(token) == before
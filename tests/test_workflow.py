@@ -176,9 +176,9 @@ class TestNormalWorkflow:
         assert data["status"] == "pending_procurement"
         assert data["current_stage"] == "procurement"
         # التحقق من التوقيعات
-        assert data.get("signatures", {}).get("manager") is not None or data.get("manager_signature") is not None
-        assert data.get("signatures", {}).get("finance") is not None or data.get("finance_signature") is not None
-        assert data.get("signatures", {}).get("disbursement") is not None or data.get("disbursement_signature") is not None
+        assert data["signature_refs"]["manager"] is not None
+        assert data["signature_refs"]["finance"] is not None
+        assert data["signature_refs"]["disbursement"] is not None
 
 
 # ==================== 3. اختبار الرفض ====================
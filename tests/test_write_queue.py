@@ -0,0 +1,131 @@
+"""
+اختبار تنسيق الكتابة — BEGIN IMMEDIATE مع إعادة المحاولة، commit جماعي، ومقاييس انتظار القفل
+"""
+
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from tests.conftest import login, auth_header
+
+
+@pytest.fixture
+def file_engine(tmp_path, monkeypatch):
+    """محرك على ملف مؤقت (قاعدة الاختبار في الذاكرة خاصة بكل thread)"""
+    from backend import config
+    from backend.utils import write_queue
+    from backend.utils.engine_profile import apply_engine_profile
+
+    monkeypatch.setattr(config, "SQLITE_BUSY_TIMEOUT_MS", 20)
+    monkeypatch.setattr(config, "WRITE_RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(config, "WRITE_RETRY_BACKOFF_MS", 1)
+    monkeypatch.setattr(write_queue, "_write_engine", write_queue._write_engine)  # يُستعاد بعد الاختبار
+
+    path = tmp_path / "writes.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    apply_engine_profile(engine)
+    write_engine = write_queue.install_write_coordination(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE marks (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    yield path, write_engine
+    engine.dispose()
+
+
+def test_busy_writer_retries_then_raises(file_engine):
+    from backend.utils.write_queue import WriteBusyError, metrics
+
+    path, write_engine = file_engine
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    before = metrics.snapshot()
+    try:
+        with pytest.raises(WriteBusyError):
+            with write_engine.begin() as conn:
+                conn.execute(text("INSERT INTO marks (name) VALUES ('x')"))
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+    after = metrics.snapshot()
+    assert after["failures"] == before["failures"] + 1
+    assert after["retries"] == before["retries"] + 2
+
+    # بعد تحرير القفل: تنجح الكتابة ويُسجَّل زمن الانتظار
+    with write_engine.begin() as conn:
+        conn.execute(text("INSERT INTO marks (name) VALUES ('x')"))
+    assert metrics.snapshot()["begins"] == after["begins"] + 1
+
+
+def test_writer_waits_for_lock_instead_of_failing(file_engine, monkeypatch):
+    from backend import config
+    from backend.utils.write_queue import metrics
+
+    monkeypatch.setattr(config, "WRITE_RETRY_ATTEMPTS", 20)
+    path, write_engine = file_engine
+    holder = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    release = threading.Timer(0.1, lambda: holder.execute("COMMIT"))
+    release.start()
+    try:
+        with write_engine.begin() as conn:
+            conn.execute(text("INSERT INTO marks (name) VALUES ('late')"))
+    finally:
+        release.join()
+        holder.close()
+    assert metrics.snapshot()["lock_wait_max_ms"] >= 50
+
+
+def test_group_commit_shares_one_transaction(file_engine):
+    from backend.utils.write_queue import GroupCommitter, metrics
+
+    _, write_engine = file_engine
+    factory = sessionmaker(bind=write_engine, autoflush=False)
+
+    def insert(name):
+        return lambda db: db.execute(text("INSERT INTO marks (name) VALUES (:n)"), {"n": name}).lastrowid
+
+    before = metrics.snapshot()
+    committer = GroupCommitter(factory, window=0.2)
+    futures = [committer.submit(insert(n)) for n in ("a", "b", "a", "c")]  # "a" الثانية تخالف UNIQUE
+
+    assert all(f.result(timeout=5) for f in (futures[0], futures[1], futures[3]))
+    with pytest.raises(Exception):
+        futures[2].result(timeout=5)
+    after = metrics.snapshot()
+    assert after["group_batches"] == before["group_batches"] + 1
+    assert after["group_ops"] == before["group_ops"] + 4
+
+    with write_engine.connect() as conn:
+        names = [n for (n,) in conn.execute(text("SELECT name FROM marks ORDER BY name"))]
+    assert names == ["a", "b", "c"]  # فشل عملية واحدة لم يُسقط الدفعة
+
+
+class TestWriteQueueApi:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, seeded_client):
+        self.client = seeded_client
+        self.admin_token = login(seeded_client, "admin", "Admin@2024")
+
+    def test_busy_database_returns_503(self, monkeypatch):
+        from backend.utils import write_queue
+
+        def busy(conn):
+            raise write_queue.WriteBusyError("قاعدة البيانات مشغولة")
+
+        monkeypatch.setattr(write_queue, "_begin_immediate", busy)
+        token = login(self.client, "requester_hr", "Hr2024!")
+        res = self.client.post("/api/notifications/read-all", headers=auth_header(token))
+        assert res.status_code == 503
+        assert res.headers["Retry-After"] == "1"
+        assert "error" in res.get_json()
+
+    def test_write_metrics_admin_only(self):
+        token = login(self.client, "requester_hr", "Hr2024!")
+        self.client.post("/api/notifications/read-all", headers=auth_header(token))
+
+        assert self.client.get("/api/admin/write-metrics", headers=auth_header(token)).status_code == 403
+        data = self.client.get("/api/admin/write-metrics", headers=auth_header(self.admin_token)).get_json()
+        assert data["begins"] >= 1
+        assert {"retries", "failures", "lock_wait_max_ms", "lock_wait_histogram", "group_ops"} <= data.keys()